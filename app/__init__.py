@@ -8,7 +8,7 @@ from flask_limiter.util import get_remote_address
 from flask_talisman import Talisman
 import cloudinary
 import os
-import os
+import tempfile
 from dotenv import load_dotenv
 from werkzeug.middleware.proxy_fix import ProxyFix
 
@@ -46,10 +46,51 @@ def create_app(config_name=None):
         api_secret=os.getenv('CLOUDINARY_API_SECRET')
     )
     
+    # Shared cache (M-Pesa tokens etc.); falls back to in-process when unset
+    app.config['REDIS_URL'] = os.getenv('REDIS_URL', '')
+    
     # Uploadcare configuration
     app.config['UPLOADCARE_PUBLIC_KEY'] = os.getenv('UPLOADCARE_PUBLIC_KEY', '')
     app.config['UPLOADCARE_SECRET_KEY'] = os.getenv('UPLOADCARE_SECRET_KEY', '')
     
+    # File storage backend: cloudinary, uploadcare or local (offline dev / benchmarks)
+    app.config['STORAGE_BACKEND'] = os.getenv('STORAGE_BACKEND', 'cloudinary')
+    app.config['STORAGE_BACKUP_BACKEND'] = os.getenv(
+        'STORAGE_BACKUP_BACKEND', 'uploadcare' if app.config['STORAGE_BACKEND'] == 'cloudinary' else ''
+    )
+    app.config['LOCAL_STORAGE_DIR'] = os.getenv('LOCAL_STORAGE_DIR', os.path.join(app.instance_path, 'storage'))
+    app.config['LOCAL_STORAGE_BASE_URL'] = os.getenv('LOCAL_STORAGE_BASE_URL', '')
+    # Local storage folders served without a login (listing images); everything else needs a JWT
+    app.config['LOCAL_PUBLIC_FOLDERS'] = os.getenv('LOCAL_PUBLIC_FOLDERS', 'property_images').split(',')
+    
+    # Hosts the download proxy may fetch from
+    app.config['DOWNLOAD_ALLOWED_HOSTS'] = os.getenv('DOWNLOAD_ALLOWED_HOSTS', 'ucarecdn.com,res.cloudinary.com,cloudinary.com').split(',')
+    
+    # Signed direct download links: lifetime and how local files are offloaded
+    # to the web server (x-accel for nginx, x-sendfile for Apache/lighttpd)
+    app.config['DOWNLOAD_LINK_TTL'] = int(os.getenv('DOWNLOAD_LINK_TTL', 300))  # 5 minutes
+    app.config['DOWNLOAD_OFFLOAD'] = os.getenv('DOWNLOAD_OFFLOAD', '')
+    app.config['USE_X_SENDFILE'] = app.config['DOWNLOAD_OFFLOAD'] == 'x-sendfile'
+    app.config['DOWNLOAD_ACCEL_CACHE_PREFIX'] = os.getenv('DOWNLOAD_ACCEL_CACHE_PREFIX', '/internal/download-cache/')
+    app.config['DOWNLOAD_ACCEL_STORAGE_PREFIX'] = os.getenv('DOWNLOAD_ACCEL_STORAGE_PREFIX', '/internal/storage/')
+    
+    # Seconds to wait for the primary CDN before racing the backup copy
+    app.config['DOWNLOAD_HEDGE_DELAY'] = float(os.getenv('DOWNLOAD_HEDGE_DELAY', 0.75))
+    
+    # On-disk LRU cache for the download proxy (set max bytes to 0 to disable)
+    app.config['DOWNLOAD_CACHE_DIR'] = os.getenv('DOWNLOAD_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'victorsprings_download_cache'))
+    app.config['DOWNLOAD_CACHE_MAX_BYTES'] = int(os.getenv('DOWNLOAD_CACHE_MAX_BYTES', 512 * 1024 * 1024))  # 512 MB
+    app.config['DOWNLOAD_CACHE_TTL'] = int(os.getenv('DOWNLOAD_CACHE_TTL', 3600))  # 1 hour
+    
+    # Resumable chunked uploads (staged on local disk until complete)
+    app.config['UPLOAD_STAGING_DIR'] = os.getenv('UPLOAD_STAGING_DIR', os.path.join(tempfile.gettempdir(), 'victorsprings_uploads'))
+    app.config['UPLOAD_SESSION_TTL'] = int(os.getenv('UPLOAD_SESSION_TTL', 86400))  # 24 hours
+    app.config['UPLOAD_MAX_SIZE'] = int(os.getenv('UPLOAD_MAX_SIZE', 25 * 1024 * 1024))  # 25 MB
+    
+    # Run queued background jobs (notifications) on a worker thread right after
+    # the request commits; `flask run-jobs` picks up retries and leftovers
+    app.config['JOBS_KICK'] = os.getenv('JOBS_KICK', 'true').lower() == 'true'
+    
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
@@ -60,8 +101,9 @@ def create_app(config_name=None):
     CORS(app, resources={
         r"/api/*": {
             "origins": os.getenv('FRONTEND_URL', 'http://localhost:5173').split(','),
-            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"]
+            "methods": ["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization", "Upload-Offset", "Upload-Length"],
+            "expose_headers": ["Location", "Upload-Offset", "Upload-Length"]
         }
     })
     
@@ -100,6 +142,19 @@ def create_app(config_name=None):
     from app.api.download import download_bp
     app.register_blueprint(download_bp, url_prefix='/api/download')
     
+    from app.api.uploads import uploads_bp
+    app.register_blueprint(uploads_bp, url_prefix='/api/uploads')
+    
+    from app.api.files import files_bp
+    app.register_blueprint(files_bp, url_prefix='/api/files')
+    
+    from app.api.rent import rent_bp
+    app.register_blueprint(rent_bp, url_prefix='/api/rent')
+    
+    # CLI commands
+    from app.commands import register_commands
+    register_commands(app)
+    
     # Error handlers
     @app.errorhandler(429)
     def ratelimit_handler(e):
@@ -1,62 +1,229 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User
 from app.models.payment import Payment
+from app.models.payment_daily_total import PaymentDailyTotal
+from app.models.property import Property
 from app.models.tenant_application import TenantApplication
 from app import db
-from sqlalchemy import func
+from sqlalchemy import func, case, and_, true, cast, literal, null
+from app.utils import metrics
+from app.utils.cache import get_cache
+from app.services import timeseries
+from datetime import date, datetime, timedelta
+import os
 
 admin_reports_bp = Blueprint('admin_reports', __name__)
 
+# Dashboard snapshot lifetime; ?fresh=1 rebuilds it immediately
+ADMIN_REPORTS_CACHE_TTL = int(os.getenv('ADMIN_REPORTS_CACHE_TTL', 60))
+SNAPSHOT_CACHE_KEY = 'admin_reports:snapshot'
+
+# Payments listed under recentTransactions
+RECENT_TRANSACTIONS = 10
+
+
+def _month_periods(today):
+    """(this month start, last month start, end of the same span last month).
+
+    Growth compares month-to-date with the same number of days of last
+    month, so it is not skewed by how far into the month we are.
+    """
+    this_start = today.replace(day=1)
+    last_start = (this_start - timedelta(days=1)).replace(day=1)
+    last_same_span_end = min(last_start + (today - this_start) + timedelta(days=1), this_start)
+    return this_start, last_start, last_same_span_end
+
+
+def _growth(current, previous):
+    if not previous:
+        return None
+    return round((float(current) - float(previous)) / float(previous) * 100, 1)
+
+
+def _count_where(condition):
+    return func.count(case((condition, 1)))
+
+
+def _sum_where(column, condition):
+    return func.coalesce(func.sum(case((condition, column), else_=0)), 0)
+
+
+def _detail_row(kind, payment_type=None, type_count=None, id=None, amount=None, status=None,
+                receipt=None, tenant_name=None, created_at=None):
+    """Columns shared by the distribution and recent-payment rows of the snapshot query"""
+    typed = lambda value, type_: value if value is not None else cast(null(), type_)
+    return (
+        literal(kind).label('kind'),
+        typed(payment_type, db.String).label('payment_type'),
+        typed(type_count, db.Integer).label('type_count'),
+        typed(id, db.Integer).label('id'),
+        typed(amount, db.Numeric(12, 2)).label('amount'),
+        typed(status, db.String).label('status'),
+        typed(receipt, db.String).label('receipt'),
+        typed(tenant_name, db.String).label('tenant_name'),
+        typed(created_at, db.DateTime).label('created_at'),
+    )
+
+
+def build_dashboard_snapshot(today=None):
+    """Every dashboard figure in one round trip.
+
+    The totals are conditional aggregates, one subquery per table,
+    cross-joined into a single row. The payment-type distribution and the
+    recent payments are UNION ALLed into detail rows, which are outer-joined
+    to the totals row, so the result is that row repeated once per detail.
+    """
+    today = today or datetime.utcnow().date()
+    this_start, last_start, last_end = _month_periods(today)
+    this_start_at, last_start_at, last_end_at = (
+        datetime.combine(d, datetime.min.time()) for d in (this_start, last_start, last_end)
+    )
+
+    in_this_month = lambda column: column >= this_start_at
+    in_last_span = lambda column: and_(column >= last_start_at, column < last_end_at)
+
+    users = db.select(
+        _count_where(and_(User.role == 'landlord', User.verification_status == 'verified')).label('active_landlords'),
+        _count_where(in_this_month(User.created_at)).label('signups_this'),
+        _count_where(in_last_span(User.created_at)).label('signups_last'),
+    ).subquery()
+    properties = db.select(
+        func.count(Property.id).label('total_properties'),
+        _count_where(in_this_month(Property.created_at)).label('listings_this'),
+        _count_where(in_last_span(Property.created_at)).label('listings_last'),
+    ).subquery()
+    applications = db.select(
+        _count_where(TenantApplication.status == 'approved').label('approved_applications'),
+    ).subquery()
+    revenue = db.select(
+        func.coalesce(func.sum(PaymentDailyTotal.total_amount), 0).label('total_revenue'),
+        _sum_where(PaymentDailyTotal.total_amount, PaymentDailyTotal.day >= this_start).label('revenue_this'),
+        _sum_where(PaymentDailyTotal.total_amount,
+                   and_(PaymentDailyTotal.day >= last_start, PaymentDailyTotal.day < last_end)).label('revenue_last'),
+    ).where(PaymentDailyTotal.status == 'completed').subquery()
+
+    recent = db.select(
+        Payment.id, Payment.amount, Payment.status, Payment.mpesa_receipt_number, Payment.payment_type,
+        Payment.created_at, User.name.label('tenant_name')
+    ).outerjoin(User, User.id == Payment.user_id).order_by(
+        Payment.created_at.desc(), Payment.id.desc()
+    ).limit(RECENT_TRANSACTIONS).subquery()
+    details = db.union_all(
+        db.select(*_detail_row(
+            'distribution', PaymentDailyTotal.payment_type, func.sum(PaymentDailyTotal.payment_count)
+        )).where(PaymentDailyTotal.status == 'completed').group_by(PaymentDailyTotal.payment_type),
+        db.select(*_detail_row(
+            'recent', recent.c.payment_type, None, recent.c.id, recent.c.amount, recent.c.status,
+            recent.c.mpesa_receipt_number, recent.c.tenant_name, recent.c.created_at
+        )),
+    ).subquery()
+
+    single_row = users.join(properties, true()).join(applications, true()).join(revenue, true())
+    rows = db.session.execute(
+        db.select(users, properties, applications, revenue, details)
+        .select_from(single_row.outerjoin(details, true()))
+    ).mappings().all()
+    totals = rows[0]
+
+    recent_rows = sorted((r for r in rows if r['kind'] == 'recent'),
+                         key=lambda r: (r['created_at'] or datetime.min, r['id']), reverse=True)
+    revenue_growth = _growth(totals['revenue_this'], totals['revenue_last'])
+
+    return {
+        'totalPayments': float(totals['total_revenue']),
+        'activeLandlords': totals['active_landlords'],
+        'totalProperties': totals['total_properties'],
+        'agreementConversions': totals['approved_applications'],
+        'recentTransactions': [
+            {
+                'id': r['id'],
+                'amount': float(r['amount']),
+                'status': r['status'],
+                'mpesa_receipt': r['receipt'],
+                'payment_type': r['payment_type'],
+                'tenant_name': r['tenant_name'] or 'Unknown',
+                'created_at': r['created_at'].isoformat() if r['created_at'] else None
+            } for r in recent_rows
+        ],
+        'distribution': {r['payment_type']: int(r['type_count']) for r in rows if r['kind'] == 'distribution'},
+        # Revenue, month-to-date vs the same days of last month; 0 without a baseline
+        'monthlyGrowth': revenue_growth if revenue_growth is not None else 0,
+        # The same comparisons per metric; None when last month had nothing to compare with
+        'growth': {
+            'revenue': revenue_growth,
+            'signups': _growth(totals['signups_this'], totals['signups_last']),
+            'listings': _growth(totals['listings_this'], totals['listings_last']),
+        },
+        'generatedAt': datetime.utcnow().isoformat(),
+    }
+
+
 @admin_reports_bp.route('/', methods=['GET'], strict_slashes=False)
 @jwt_required()
 def get_admin_reports():
+    """Admin dashboard figures, cached for ADMIN_REPORTS_CACHE_TTL seconds (?fresh=1 to rebuild)"""
     current_user_id = int(get_jwt_identity())
     user = User.query.get(current_user_id)
-    
+
+    if not user or user.role not in ['admin', 'super_admin']:
+        return jsonify({'message': 'Unauthorized access'}), 403
+
+    cache = get_cache()
+    fresh = request.args.get('fresh') in ('1', 'true')
+
+    snapshot = None if fresh else cache.get(SNAPSHOT_CACHE_KEY)
+    if snapshot is not None:
+        metrics.incr('admin_reports.cache.hit')
+        return jsonify(snapshot), 200
+
+    # Single flight: concurrent dashboard loads wait for one rebuild
+    with cache.lock(SNAPSHOT_CACHE_KEY + ':lock', timeout=30):
+        snapshot = None if fresh else cache.get(SNAPSHOT_CACHE_KEY)
+        if snapshot is None:
+            metrics.incr('admin_reports.cache.miss')
+            snapshot = build_dashboard_snapshot()
+            cache.set(SNAPSHOT_CACHE_KEY, snapshot, ttl=ADMIN_REPORTS_CACHE_TTL)
+
+    return jsonify(snapshot), 200
+
+@admin_reports_bp.route('/timeseries', methods=['GET'])
+@jwt_required()
+def get_timeseries():
+    """Chart data: ?metric=revenue|payments|signups|listings|applications&bucket=day|week|month&from=&to="""
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+
+    if not user or user.role not in ['admin', 'super_admin']:
+        return jsonify({'message': 'Unauthorized access'}), 403
+
+    try:
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else None
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'message': 'from and to must be YYYY-MM-DD dates'}), 400
+
+    try:
+        payload = timeseries.get_series(
+            request.args.get('metric', 'revenue'),
+            request.args.get('bucket', 'day'),
+            start,
+            end,
+            fresh=request.args.get('fresh') in ('1', 'true')
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    return jsonify(payload), 200
+
+@admin_reports_bp.route('/metrics', methods=['GET'])
+@jwt_required()
+def get_runtime_metrics():
+    """Per-worker runtime metrics (CDN latency, cache hit rates, ...)"""
+    current_user_id = int(get_jwt_identity())
+    user = User.query.get(current_user_id)
+
     if not user or user.role not in ['admin', 'super_admin']:
         return jsonify({'message': 'Unauthorized access'}), 403
 
-    # Total Payments
-    total_payments_result = db.session.query(func.sum(Payment.amount)).scalar()
-    total_payments = float(total_payments_result) if total_payments_result else 0.0
-
-    # Active Landlords
-    active_landlords_count = User.query.filter_by(role='landlord', verification_status='verified').count()
-
-    # Total Properties
-    total_properties = User.query.filter_by(role='landlord').count() # Simplified for now
-
-    # Agreement Conversions
-    approved_tenants_count = TenantApplication.query.filter_by(status='approved').count()
-
-    # Recent Transactions
-    recent_transactions_query = Payment.query.order_by(Payment.created_at.desc()).limit(10).all()
-    recent_transactions = [
-        {
-            'id': p.id,
-            'amount': float(p.amount),
-            'status': p.status,
-            'mpesa_receipt': p.mpesa_receipt_number,
-            'payment_type': p.payment_type,
-            'tenant_name': p.user.name if p.user else 'Unknown',
-            'created_at': p.created_at.isoformat() if p.created_at else None
-        } for p in recent_transactions_query
-    ]
-
-    # Payment Type Distribution
-    type_distribution = db.session.query(
-        Payment.payment_type, 
-        func.count(Payment.id)
-    ).group_by(Payment.payment_type).all()
-    
-    distribution = {t: c for t, c in type_distribution}
-
-    return jsonify({
-        'totalPayments': total_payments,
-        'activeLandlords': active_landlords_count,
-        'agreementConversions': approved_tenants_count,
-        'recentTransactions': recent_transactions,
-        'distribution': distribution,
-        'monthlyGrowth': 12.5  # Realistic placeholder for UI demo
-    }), 200
+    return jsonify(metrics.snapshot()), 200
@@ -1,21 +1,29 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
-from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.orm import joinedload
 from app.models.tenant_application import TenantApplication
 from app.models.property import Property
 from app.models.user import User
 from app.models.payment import Payment
 from app.models.audit_log import AuditLog
-from app.services.cloudinary_service import CloudinaryService
+from app.services.storage import get_storage
+from app.services.upload_staging import resolve_completed_upload
 from app.utils.decorators import admin_required
-from datetime import datetime
+from app.utils.idempotency import idempotent
+from app.utils.pagination import keyset_page, page_payload
+from datetime import datetime, timedelta
 import json
+import os
 
 applications_bp = Blueprint('applications', __name__)
 
+# Largest number of decisions one batch-status request may carry
+APPLICATION_BATCH_MAX = int(os.getenv('APPLICATION_BATCH_MAX', 200))
+
 @applications_bp.route('/', methods=['POST'], strict_slashes=False)
 @jwt_required()
+@idempotent
 def submit_application():
     """Submit a tenant application (with signed document and IDs)"""
     try:
@@ -40,25 +48,35 @@ def submit_application():
             payment_id = None
             
         # File uploads
-        cloudinary = CloudinaryService()
+        storage = get_storage()
         id_front = request.files.get('id_document_front')
         id_back = request.files.get('id_document_back')
         signed_agreement = request.files.get('signed_agreement')
-        
-        if not all([id_front, id_back, signed_agreement]):
+
+        # Files may instead have been sent earlier through the resumable /api/uploads flow
+        front_upload = None if id_front else resolve_completed_upload(user.id, request.form.get('id_document_front_upload_id'), 'id_document')
+        back_upload = None if id_back else resolve_completed_upload(user.id, request.form.get('id_document_back_upload_id'), 'id_document')
+        agreement_upload = None if signed_agreement else resolve_completed_upload(user.id, request.form.get('signed_agreement_upload_id'), 'signed_agreement')
+
+        if not all([id_front or front_upload, id_back or back_upload, signed_agreement or agreement_upload]):
+            db.session.rollback()  # release any upload claimed above
             return jsonify({'message': 'ID (front and back) and Signed Agreement are required'}), 400
-            
-        front_url = cloudinary.upload_image(id_front, folder='tenant_kyc')
-        back_url = cloudinary.upload_image(id_back, folder='tenant_kyc')
-        
-        # Dual upload: Uploadcare (primary) + Cloudinary (backup)
-        agreement_result = cloudinary.upload_document_dual(
-            signed_agreement,
-            folder='tenant_agreements',
-            filename=f"signed_agreement_{user.id}_{property_id}.pdf"
-        )
-        agreement_url = agreement_result['primary_url']
-        agreement_backup_url = agreement_result.get('backup_url')
+
+        front_url = front_upload.result_url if front_upload else storage.upload_image(id_front, folder='tenant_kyc')
+        back_url = back_upload.result_url if back_upload else storage.upload_image(id_back, folder='tenant_kyc')
+
+        if agreement_upload:
+            agreement_url = agreement_upload.result_url
+            agreement_backup_url = agreement_upload.backup_url
+        else:
+            # Dual upload: Uploadcare (primary) + Cloudinary (backup)
+            agreement_result = storage.upload_document_dual(
+                signed_agreement,
+                folder='tenant_agreements',
+                filename=f"signed_agreement_{user.id}_{property_id}.pdf"
+            )
+            agreement_url = agreement_result['primary_url']
+            agreement_backup_url = agreement_result.get('backup_url')
             
         app_record = TenantApplication(
             user_id=user.id,
@@ -70,6 +88,7 @@ def submit_application():
             id_document_front=front_url,
             id_document_back=back_url,
             signed_agreement_url=agreement_url,
+            signed_agreement_backup_url=agreement_backup_url,
             digital_consent=True,
             digital_consent_ip=request.remote_addr,
             payment_id=payment_id
@@ -129,15 +148,43 @@ def get_my_applications():
 @jwt_required()
 @admin_required
 def get_admin_applications():
-    """Admin endpoint to fetch ALL applications or filter by status"""
+    """Admin endpoint to page through applications, newest first.
+
+    Filters: status, property_id, date_from / date_to (created_at, ISO dates).
+    Paging: per_page (max 100) and the next_cursor of the previous page.
+    """
     try:
+        per_page = max(1, min(request.args.get('per_page', 50, type=int), 100))
         status = request.args.get('status')
-        query = TenantApplication.query
+        property_id = request.args.get('property_id', type=int)
+        date_from = request.args.get('date_from', '').strip()
+        date_to = request.args.get('date_to', '').strip()
+        
+        # Property (units, city, title) and reviewer come in the same query
+        query = TenantApplication.query.options(
+            joinedload(TenantApplication.property),
+            joinedload(TenantApplication.reviewer)
+        )
         
         if status and status != 'all':
-            query = query.filter_by(status=status)
-            
-        apps = query.order_by(TenantApplication.created_at.desc()).all()
+            query = query.filter(TenantApplication.status == status)
+        
+        if property_id:
+            query = query.filter(TenantApplication.property_id == property_id)
+        
+        try:
+            if date_from:
+                query = query.filter(TenantApplication.created_at >= datetime.fromisoformat(date_from))
+            if date_to:
+                if len(date_to) == 10:  # a bare date includes the whole day
+                    query = query.filter(TenantApplication.created_at < datetime.fromisoformat(date_to) + timedelta(days=1))
+                else:
+                    query = query.filter(TenantApplication.created_at <= datetime.fromisoformat(date_to))
+            apps, next_cursor = keyset_page(
+                query, (TenantApplication.created_at, TenantApplication.id), request.args.get('cursor'), per_page
+            )
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
         
         # For the approval modal, include property units data
         results = []
@@ -149,10 +196,29 @@ def get_admin_applications():
                 app_dict['property_city'] = app.property.city
             results.append(app_dict)
         
-        return jsonify({'applications': results}), 200
+        return jsonify({
+            'applications': results,
+            'pagination': page_payload(per_page, next_cursor)
+        }), 200
     except Exception as e:
         return jsonify({'message': 'Failed to fetch applications', 'error': str(e)}), 500
 
+def _decision_details(admin_user, app_record, property, new_status, assigned_unit, reason):
+    """Court-ready audit details for an approval/rejection"""
+    return {
+        'admin_name': admin_user.name if admin_user else 'Unknown',
+        'admin_id': admin_user.id if admin_user else None,
+        'tenant_name': f"{app_record.first_name} {app_record.last_name}",
+        'tenant_phone': app_record.phone,
+        'tenant_id_number': app_record.id_number,
+        'property_id': app_record.property_id,
+        'property_title': property.title if property else None,
+        'assigned_unit': assigned_unit if new_status == 'approved' else None,
+        'rejection_reason': reason if new_status == 'rejected' else None,
+        'decision_timestamp': datetime.utcnow().isoformat(),
+        'property_auto_rented': (property.status == 'rented') if property else False
+    }
+
 @applications_bp.route('/<int:app_id>/status', methods=['PUT'])
 @jwt_required()
 @admin_required
@@ -169,7 +235,15 @@ def update_application_status(app_id):
             return jsonify({'message': 'Invalid status'}), 400
             
         app_record = TenantApplication.query.get_or_404(app_id)
-        property = Property.query.get(app_record.property_id)
+        # Row locks, property then application as in the batch path, so concurrent
+        # decisions see each other's vacancy counts and status
+        property = db.session.get(Property, app_record.property_id, with_for_update=True)
+        app_record = db.session.get(TenantApplication, app_id, with_for_update=True, populate_existing=True)
+        
+        # A decided application already holds (or released) its vacancy
+        if app_record.status in ['approved', 'rejected']:
+            db.session.rollback()
+            return jsonify({'message': f'Application is already {app_record.status}'}), 409
         
         if new_status == 'approved':
             if not assigned_unit:
@@ -177,37 +251,13 @@ def update_application_status(app_id):
             
             app_record.assigned_unit = assigned_unit
             
-            # Decrement vacancy count for the assigned unit type
+            # Decrement vacancy count for the assigned unit type (marks the property rented when full)
             if property and property.units:
-                units = list(property.units)  # Make a mutable copy
-                unit_found = False
-                all_occupied = True
-                
-                for unit in units:
-                    if unit.get('type') == assigned_unit:
-                        current_count = unit.get('vacantCount', 0)
-                        if current_count <= 0:
-                            return jsonify({'message': f'No vacant units of type "{assigned_unit}" remaining'}), 400
-                        unit['vacantCount'] = current_count - 1
-                        unit_found = True
-                    
-                    # Check if any unit type still has vacancies
-                    if unit.get('vacantCount', 0) > 0:
-                        all_occupied = False
-                
-                if not unit_found:
-                    return jsonify({'message': f'Unit type "{assigned_unit}" not found on this property'}), 400
-                
-                # After decrementing, re-check if the assigned unit itself brought count to 0
-                # and if ALL units are now 0
-                all_occupied = all(u.get('vacantCount', 0) <= 0 for u in units)
-                
-                property.units = units
-                flag_modified(property, 'units')  # Force SQLAlchemy to detect JSON change
-                
-                # If all units are occupied, mark property as rented
-                if all_occupied:
-                    property.status = 'rented'
+                try:
+                    property.allocate_unit(assigned_unit)
+                except ValueError as e:
+                    db.session.rollback()
+                    return jsonify({'message': str(e)}), 400
                     
         else:
             app_record.rejection_reason = data.get('reason', '')
@@ -222,19 +272,7 @@ def update_application_status(app_id):
             user_id=admin_id,
             resource_type='application',
             resource_id=app_id,
-            details={
-                'admin_name': admin_user.name if admin_user else 'Unknown',
-                'admin_id': admin_id,
-                'tenant_name': f"{app_record.first_name} {app_record.last_name}",
-                'tenant_phone': app_record.phone,
-                'tenant_id_number': app_record.id_number,
-                'property_id': app_record.property_id,
-                'property_title': app_record.property.title if app_record.property else None,
-                'assigned_unit': assigned_unit if new_status == 'approved' else None,
-                'rejection_reason': data.get('reason', '') if new_status == 'rejected' else None,
-                'decision_timestamp': datetime.utcnow().isoformat(),
-                'property_auto_rented': (property.status == 'rented') if property else False
-            }
+            details=_decision_details(admin_user, app_record, property, new_status, assigned_unit, data.get('reason', ''))
         )
         
         db.session.commit()
@@ -254,3 +292,123 @@ def update_application_status(app_id):
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': 'Failed to update application', 'error': str(e)}), 500
+
+@applications_bp.route('/batch-status', methods=['POST'])
+@jwt_required()
+@admin_required
+def batch_update_application_status():
+    """Approve or reject many applications in one transaction.
+
+    Body: {"decisions": [{"id": 1, "status": "approved", "assigned_unit": "1BR"},
+                         {"id": 2, "status": "rejected", "reason": "..."}]}
+
+    Every affected property is locked once, in id order so concurrent batches
+    cannot deadlock, and vacancies are allocated against the locked rows.
+    Items that cannot be applied are reported and skipped; the rest commit
+    together. Returns one outcome per decision, in request order.
+    """
+    try:
+        admin_id = int(get_jwt_identity())
+        admin_user = User.query.get(admin_id)
+        decisions = (request.get_json(silent=True) or {}).get('decisions')
+
+        if not isinstance(decisions, list) or not decisions:
+            return jsonify({'message': 'decisions must be a non-empty list'}), 400
+        if len(decisions) > APPLICATION_BATCH_MAX:
+            return jsonify({'message': f'At most {APPLICATION_BATCH_MAX} decisions per batch'}), 400
+
+        results = [None] * len(decisions)
+        pending = {}  # application id -> index into decisions
+        for i, decision in enumerate(decisions):
+            decision = decision if isinstance(decision, dict) else {}
+            app_id = decision.get('id')
+            if not isinstance(app_id, int):
+                results[i] = {'id': app_id, 'ok': False, 'message': 'Application id is required'}
+            elif decision.get('status') not in ['approved', 'rejected']:
+                results[i] = {'id': app_id, 'ok': False, 'message': 'Invalid status'}
+            elif decision['status'] == 'approved' and not decision.get('assigned_unit'):
+                results[i] = {'id': app_id, 'ok': False, 'message': 'Assigned unit type is required for approval'}
+            elif app_id in pending:
+                results[i] = {'id': app_id, 'ok': False, 'message': 'Duplicate decision for this application'}
+            else:
+                pending[app_id] = i
+
+        # Lock properties, then applications, each in id order (same order as every other batch)
+        property_ids = [pid for (pid,) in db.session.query(TenantApplication.property_id).filter(
+            TenantApplication.id.in_(pending)
+        ).distinct()]
+        properties = {
+            p.id: p for p in Property.query.filter(Property.id.in_(property_ids))
+            .order_by(Property.id).with_for_update().populate_existing()
+        }
+        applications = {
+            a.id: a for a in TenantApplication.query.filter(TenantApplication.id.in_(pending))
+            .order_by(TenantApplication.id).with_for_update().populate_existing()
+        }
+
+        now = datetime.utcnow()
+        audit_rows = []
+        for app_id, i in pending.items():
+            decision = decisions[i]
+            new_status = decision['status']
+            assigned_unit = decision.get('assigned_unit')
+            reason = decision.get('reason', '')
+            app_record = applications.get(app_id)
+
+            if not app_record:
+                results[i] = {'id': app_id, 'ok': False, 'message': 'Application not found'}
+                continue
+            # A decided application already holds (or released) its vacancy
+            if app_record.status in ['approved', 'rejected']:
+                results[i] = {'id': app_id, 'ok': False, 'message': f'Application is already {app_record.status}'}
+                continue
+
+            property = properties.get(app_record.property_id)
+            if new_status == 'approved':
+                if property and property.units:
+                    try:
+                        property.allocate_unit(assigned_unit)
+                    except ValueError as e:
+                        results[i] = {'id': app_id, 'ok': False, 'message': str(e)}
+                        continue
+                app_record.assigned_unit = assigned_unit
+            else:
+                app_record.rejection_reason = reason
+
+            app_record.status = new_status
+            app_record.reviewed_by = admin_id
+            app_record.reviewed_at = now
+
+            audit_rows.append({
+                'action': f'application_{new_status}',
+                'user_id': admin_id,
+                'resource_type': 'application',
+                'resource_id': app_id,
+                'details': _decision_details(admin_user, app_record, property, new_status, assigned_unit, reason),
+                'ip_address': request.remote_addr,
+                'user_agent': request.user_agent.string if request.user_agent else None,
+                'created_at': now,
+            })
+            results[i] = {'id': app_id, 'ok': True, 'status': new_status,
+                          'assigned_unit': app_record.assigned_unit if new_status == 'approved' else None}
+
+        # One multi-row insert for the whole batch's audit trail
+        if audit_rows:
+            db.session.execute(db.insert(AuditLog), audit_rows)
+        db.session.commit()
+
+        applied = sum(1 for r in results if r['ok'])
+        return jsonify({
+            'message': f'{applied} of {len(decisions)} decisions applied',
+            'applied': applied,
+            'failed': len(decisions) - applied,
+            'results': results,
+            'properties': {
+                str(p.id): {'updated_units': p.units or [], 'property_status': p.status}
+                for p in properties.values()
+            }
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to update applications', 'error': str(e)}), 500
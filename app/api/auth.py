@@ -13,7 +13,9 @@ from app.utils.sanitizers import sanitize_string
 from app.utils.email import send_verification_email, send_password_reset_email
 from app.utils.sms import generate_otp, generate_otp_token, verify_otp_token, send_otp_sms
 from app.utils.signature import generate_signature_request
+from app.utils.idempotency import idempotent
 from app.models.document import Document
+from app.services.storage import get_storage
 from werkzeug.utils import secure_filename
 import uuid
 
@@ -435,6 +437,7 @@ def send_kyc_otp():
 
 @auth_bp.route('/kyc/submit', methods=['POST'])
 @jwt_required()
+@idempotent
 def submit_kyc():
     """Submit Landlord KYC verification details and ID document."""
     try:
@@ -483,7 +486,7 @@ def submit_kyc():
         user.phone = phone
         user.verification_status = 'pending'
             
-        import cloudinary.uploader
+        storage = get_storage()
         
         # 1. Validate and prep ID Documents
         if 'id_document_front' not in request.files or 'id_document_back' not in request.files:
@@ -506,18 +509,11 @@ def submit_kyc():
         id_front.seek(0)
         id_back.seek(0)
         
-        # 2. Upload ID Documents to Cloudinary
-        try:
-            front_upload = cloudinary.uploader.upload(
-                id_front, folder="victorsprings/kyc_documents", resource_type="auto"
-            )
-            back_upload = cloudinary.uploader.upload(
-                id_back, folder="victorsprings/kyc_documents", resource_type="auto"
-            )
-            id_front_url = front_upload.get("secure_url")
-            id_back_url = back_upload.get("secure_url")
-        except Exception as e:
-            return jsonify({'message': 'Failed to upload ID documents to cloud storage.', 'error': str(e)}), 500
+        # 2. Upload ID Documents to the configured storage backend
+        id_front_url = storage.upload_file(id_front, folder="victorsprings/kyc_documents", resource_type="auto")
+        id_back_url = storage.upload_file(id_back, folder="victorsprings/kyc_documents", resource_type="auto")
+        if not id_front_url or not id_back_url:
+            return jsonify({'message': 'Failed to upload ID documents to cloud storage.'}), 500
             
         # Create Document logs for ID Front and Back
         doc_front = Document(
@@ -577,13 +573,14 @@ The user has explicitly checked "I Consent" to these terms under penalty of perj
             consent_file_data = consent_text.encode('utf-8')
             consent_file = io.BytesIO(consent_file_data)
             
-            consent_upload_result = cloudinary.uploader.upload(
+            consent_file_url = storage.upload_file(
                 consent_file,
                 folder="victorsprings/kyc_documents",
                 resource_type="raw",
                 public_id=f"consent_{user.id}_{int(datetime.utcnow().timestamp())}.txt"
             )
-            consent_file_url = consent_upload_result.get("secure_url")
+            if not consent_file_url:
+                raise RuntimeError('Storage backend rejected the consent log')
         except Exception as e:
             return jsonify({'message': 'Failed to generate and upload digital consent log.', 'error': str(e)}), 500
             
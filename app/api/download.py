@@ -1,16 +1,70 @@
-from flask import Blueprint, request, jsonify, Response
-from flask_jwt_extended import jwt_required
+import os
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, Response, send_file, current_app, redirect, url_for
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_date, unquote_etag
+from app import db
+from app.services.storage import local_path_for_url, storage_for_url
+from app.services.download_cache import get_download_cache
+from app.services.hedged_fetch import hedged_get
+from app.models.upload_session import UploadSession
+from app.models.document import Document
+from app.models.tenant_application import TenantApplication
+from app.models.user import User
+from urllib.parse import urlparse
 import requests as http_requests
 
 download_bp = Blueprint('download', __name__)
 
+# Upstream headers relayed to the client on proxied (cache-miss) responses
+PASSTHROUGH_HEADERS = ('Content-Length', 'Content-Range', 'ETag', 'Last-Modified')
+
+# Let browsers and PDF viewers re-use fetched byte ranges briefly, but never in shared caches
+DOWNLOAD_CACHE_CONTROL = 'private, max-age=300'
+
+
+def _is_trusted_url(url):
+    """Only allow downloads from trusted CDNs"""
+    allowed_hosts = current_app.config['DOWNLOAD_ALLOWED_HOSTS']
+    hostname = urlparse(url).hostname or ''
+    return any(host in hostname for host in allowed_hosts)
+
+
+def _attachment_url(url):
+    """For Cloudinary image URLs: inject fl_attachment to force download.
+    Do NOT modify raw/ URLs — they don't support transformations.
+    """
+    if 'cloudinary.com' in url and '/image/upload/' in url and 'fl_attachment' not in url:
+        return url.replace('/image/upload/', '/image/upload/fl_attachment/')
+    return url
+
+
+def _find_backup_url(primary_url):
+    """Look up the redundant copy recorded when a document was dual-uploaded"""
+    backup_url = db.session.query(UploadSession.backup_url).filter(
+        UploadSession.result_url == primary_url,
+        UploadSession.backup_url.isnot(None)
+    ).limit(1).scalar()
+    if backup_url:
+        return backup_url
+
+    return db.session.query(TenantApplication.signed_agreement_backup_url).filter(
+        TenantApplication.signed_agreement_url == primary_url,
+        TenantApplication.signed_agreement_backup_url.isnot(None)
+    ).order_by(TenantApplication.id.desc()).limit(1).scalar()
+
 @download_bp.route('/', methods=['GET'], strict_slashes=False)
 @jwt_required()
 def proxy_download():
     """Proxy file download — fetches from CDN server-side and streams to client.
     Bypasses CORS and CDN URL issues. Forces Content-Disposition: attachment.
     
-    Usage: GET /api/download?url=https://...&filename=document.pdf
+    Usage: GET /api/download?url=https://...&filename=document.pdf[&backup_url=https://...]
+    
+    If the primary CDN is slow (no headers within DOWNLOAD_HEDGE_DELAY) or
+    fails, the backup copy is raced / used instead.
     """
     file_url = request.args.get('url')
     filename = request.args.get('filename', 'document.pdf')
@@ -18,23 +72,68 @@ def proxy_download():
     if not file_url:
         return jsonify({'message': 'Missing url parameter'}), 400
     
-    # Only allow downloads from trusted CDNs
-    allowed_hosts = ['ucarecdn.com', 'res.cloudinary.com', 'cloudinary.com']
-    from urllib.parse import urlparse
-    parsed = urlparse(file_url)
-    if not any(host in parsed.hostname for host in allowed_hosts):
+    # Files held by the local storage backend are sent straight from disk
+    local_path = local_path_for_url(file_url)
+    if local_path:
+        return send_file(local_path, as_attachment=True, download_name=filename, conditional=True)
+    
+    if not _is_trusted_url(file_url):
+        return jsonify({'message': 'Untrusted file source'}), 403
+    
+    backup_url = request.args.get('backup_url')
+    if backup_url and not _is_trusted_url(backup_url):
         return jsonify({'message': 'Untrusted file source'}), 403
     
     try:
-        # For Cloudinary image URLs: inject fl_attachment to force download
-        # Do NOT modify raw/ URLs — they don't support transformations
-        if 'cloudinary.com' in file_url and '/image/upload/' in file_url and 'fl_attachment' not in file_url:
-            file_url = file_url.replace('/image/upload/', '/image/upload/fl_attachment/')
+        primary_url = file_url
+        file_url = _attachment_url(file_url)
         
-        resp = http_requests.get(file_url, stream=True, timeout=30)
+        # Serve repeat downloads from the local disk cache (kernel does the copy)
+        cache = get_download_cache()
+        cached = cache.get(file_url)
+        if cached:
+            # conditional=True answers Range / If-Range locally with 206 / 416
+            etag = cached.meta.get('etag')
+            last_modified = cached.meta.get('last_modified')
+            response = send_file(
+                cached.path,
+                mimetype='application/pdf' if filename.endswith('.pdf') else cached.content_type,
+                as_attachment=True,
+                download_name=filename,
+                conditional=True,
+                etag=unquote_etag(etag)[0] if etag else True,
+                last_modified=parse_date(last_modified) if last_modified else None
+            )
+            response.headers['Cache-Control'] = DOWNLOAD_CACHE_CONTROL
+            return response
         
-        if resp.status_code != 200:
-            # If Uploadcare fails, try Cloudinary backup if URL is Uploadcare
+        # Only a cache miss goes upstream, so only then look for the backup copy
+        backup_url = backup_url or _find_backup_url(primary_url)
+        
+        # Pass Range / If-Range through so the CDN can answer partial requests
+        upstream_headers = {
+            name: request.headers[name]
+            for name in ('Range', 'If-Range')
+            if name in request.headers
+        }
+        # Ask for the raw bytes so relayed Content-Length / Content-Range stay valid
+        upstream_headers['Accept-Encoding'] = 'identity'
+        resp, _ = hedged_get(
+            file_url,
+            backup_url=_attachment_url(backup_url) if backup_url else None,
+            headers=upstream_headers,
+            hedge_after=current_app.config['DOWNLOAD_HEDGE_DELAY']
+        )
+        
+        if resp.status_code == 416:
+            resp.close()
+            return Response(status=416, headers={
+                'Content-Range': resp.headers.get('Content-Range', ''),
+                'Accept-Ranges': 'bytes'
+            })
+        
+        if resp.status_code not in (200, 206):
+            resp.close()
             return jsonify({
                 'message': 'File not found on CDN',
                 'status': resp.status_code
@@ -46,16 +145,165 @@ def proxy_download():
         if filename.endswith('.pdf'):
             content_type = 'application/pdf'
         
+        headers = {
+            name: resp.headers[name]
+            for name in PASSTHROUGH_HEADERS
+            if name in resp.headers
+        }
+        headers.update({
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Accept-Ranges': 'bytes',
+            'Cache-Control': DOWNLOAD_CACHE_CONTROL
+        })
+        
+        # Only complete bodies go into the cache; partial responses are relayed as-is
+        body = cache.fill(file_url, resp) if resp.status_code == 200 else resp.iter_content(chunk_size=8192)
+        
         return Response(
-            resp.iter_content(chunk_size=8192),
+            body,
+            status=resp.status_code,
             content_type=content_type,
-            headers={
-                'Content-Disposition': f'attachment; filename="{filename}"',
-                'Cache-Control': 'no-cache'
-            }
+            headers=headers
         )
         
+    except HTTPException:
+        raise
     except http_requests.Timeout:
         return jsonify({'message': 'Download timed out'}), 504
     except Exception as e:
         return jsonify({'message': 'Download failed', 'error': str(e)}), 500
+
+
+# TenantApplication columns a download link can be minted for
+APPLICATION_FILE_FIELDS = {
+    'id_document_front': 'id_document_front',
+    'id_document_back': 'id_document_back',
+    'signed_agreement': 'signed_agreement_url',
+}
+
+
+def get_link_serializer():
+    """Return URLSafeTimedSerializer (HMAC-SHA1) used for download link tokens."""
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='download-link')
+
+
+def _offloaded_file(path, root, accel_prefix, filename, mimetype=None):
+    """Send a file on disk without streaming it through Python.
+
+    DOWNLOAD_OFFLOAD=x-accel hands the transfer to nginx (X-Accel-Redirect to
+    an internal location mapped onto `root`); DOWNLOAD_OFFLOAD=x-sendfile
+    makes send_file emit X-Sendfile for Apache / lighttpd (USE_X_SENDFILE).
+    Otherwise send_file uses the WSGI file wrapper (sendfile under gunicorn).
+    """
+    if current_app.config['DOWNLOAD_OFFLOAD'] == 'x-accel':
+        relative = os.path.relpath(path, root).replace(os.sep, '/')
+        return Response(headers={
+            'X-Accel-Redirect': f"{accel_prefix.rstrip('/')}/{relative}",
+            'Content-Type': mimetype or 'application/octet-stream',
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Cache-Control': 'private, no-store'
+        })
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=filename, conditional=True)
+
+
+@download_bp.route('/links', methods=['POST'])
+@jwt_required()
+def create_download_link():
+    """Mint a short-lived signed download link for a Document or TenantApplication file.
+
+    Body: {"document_id": 1} or {"application_id": 1, "field": "signed_agreement"}
+    """
+    try:
+        user_id = int(get_jwt_identity())
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({'message': 'User not found'}), 404
+
+        data = request.get_json() or {}
+
+        if data.get('document_id'):
+            document = Document.query.get_or_404(data['document_id'])
+            if not user.is_admin() and not (document.user_id == user.id and document.is_accessible):
+                return jsonify({'message': 'Permission denied'}), 403
+            file_url = document.file_url
+            filename = document.name
+        elif data.get('application_id'):
+            field = data.get('field', 'signed_agreement')
+            if field not in APPLICATION_FILE_FIELDS:
+                return jsonify({'message': f'field must be one of: {", ".join(APPLICATION_FILE_FIELDS)}'}), 400
+            application = TenantApplication.query.get_or_404(data['application_id'])
+            is_landlord = application.property is not None and application.property.landlord_id == user.id
+            if not user.is_admin() and application.user_id != user.id and not is_landlord:
+                return jsonify({'message': 'Permission denied'}), 403
+            file_url = getattr(application, APPLICATION_FILE_FIELDS[field])
+            filename = f'{field}_{application.id}'
+        else:
+            return jsonify({'message': 'document_id or application_id is required'}), 400
+
+        if not file_url:
+            return jsonify({'message': 'No file stored for this record'}), 404
+
+        # Keep the original extension so the browser opens it with the right app
+        ext = os.path.splitext(urlparse(file_url).path)[1]
+        if ext and not filename.lower().endswith(ext.lower()):
+            filename = f'{filename}{ext}'
+
+        ttl = current_app.config['DOWNLOAD_LINK_TTL']
+        token = get_link_serializer().dumps({'url': file_url, 'filename': filename})
+
+        return jsonify({
+            'url': url_for('download.redeem_download_link', token=token, _external=True),
+            'expires_at': (datetime.utcnow() + timedelta(seconds=ttl)).isoformat()
+        }), 201
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        return jsonify({'message': 'Failed to create download link', 'error': str(e)}), 500
+
+
+@download_bp.route('/signed/<token>', methods=['GET'])
+def redeem_download_link(token):
+    """Redeem a signed download link without passing the bytes through a worker.
+
+    Local files are offloaded to the web server; remote files are redirected
+    to a provider-signed expiring URL when the provider supports it, or to
+    the CDN URL itself otherwise.
+    """
+    try:
+        payload = get_link_serializer().loads(token, max_age=current_app.config['DOWNLOAD_LINK_TTL'])
+    except SignatureExpired:
+        return jsonify({'message': 'Download link has expired'}), 410
+    except BadSignature:
+        return jsonify({'message': 'Invalid download link'}), 403
+
+    file_url = payload['url']
+    filename = payload.get('filename', 'document')
+    mimetype = 'application/pdf' if filename.endswith('.pdf') else None
+
+    local_path = local_path_for_url(file_url)
+    if local_path:
+        return _offloaded_file(
+            local_path,
+            current_app.config['LOCAL_STORAGE_DIR'],
+            current_app.config['DOWNLOAD_ACCEL_STORAGE_PREFIX'],
+            filename,
+            mimetype
+        )
+
+    file_url = _attachment_url(file_url)
+    cached = get_download_cache().get(file_url)
+    if cached:
+        return _offloaded_file(
+            cached.path,
+            current_app.config['DOWNLOAD_CACHE_DIR'],
+            current_app.config['DOWNLOAD_ACCEL_CACHE_PREFIX'],
+            filename,
+            mimetype or cached.content_type
+        )
+
+    storage = storage_for_url(file_url)
+    signed_url = storage.signed_url(file_url, current_app.config['DOWNLOAD_LINK_TTL'], filename) if storage else None
+    response = redirect(signed_url or file_url, code=302)
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
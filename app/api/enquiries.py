@@ -1,10 +1,12 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 from app import db
+from sqlalchemy.orm import joinedload
 from app.models.enquiry import Enquiry
 from app.models.property import Property
 from app.models.user import User
-from app.utils.decorators import admin_required
+from app.utils.decorators import admin_required, landlord_required
+from app.utils.pagination import keyset_page, page_payload
 
 enquiries_bp = Blueprint('enquiries', __name__)
 
@@ -55,16 +57,61 @@ def submit_enquiry():
         db.session.rollback()
         return jsonify({'message': 'Failed to submit enquiry', 'error': str(e)}), 500
 
+def _enquiry_page(query):
+    """One page of enquiries, newest first, as the listing response.
+
+    User, property and the property's landlord are joined into the same
+    query, so a page costs one SELECT. Filters: status (or 'all'),
+    property_id. Paging: per_page (max 100) and the previous page's
+    next_cursor. Raises ValueError for a bad cursor.
+    """
+    per_page = max(1, min(request.args.get('per_page', 50, type=int), 100))
+    status = request.args.get('status')
+    property_id = request.args.get('property_id', type=int)
+
+    query = query.options(
+        joinedload(Enquiry.user),
+        joinedload(Enquiry.property).joinedload(Property.landlord)
+    )
+    if status and status != 'all':
+        query = query.filter(Enquiry.status == status)
+    if property_id:
+        query = query.filter(Enquiry.property_id == property_id)
+
+    enquiries, next_cursor = keyset_page(
+        query, (Enquiry.created_at, Enquiry.id), request.args.get('cursor'), per_page
+    )
+    return {
+        'enquiries': [e.to_dict() for e in enquiries],
+        'pagination': page_payload(per_page, next_cursor)
+    }
+
 @enquiries_bp.route('/admin', methods=['GET'])
 @jwt_required()
 @admin_required
 def get_admin_enquiries():
-    """Get all enquiries (admin only)"""
+    """Page through all enquiries, newest first (admin only)"""
     try:
-        enquiries = Enquiry.query.order_by(Enquiry.created_at.desc()).all()
-        return jsonify({
-            'enquiries': [e.to_dict() for e in enquiries]
-        }), 200
+        try:
+            return jsonify(_enquiry_page(Enquiry.query)), 200
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to fetch enquiries', 'error': str(e)}), 500
+
+@enquiries_bp.route('/landlord', methods=['GET'])
+@jwt_required()
+@landlord_required
+def get_landlord_enquiries():
+    """Page through enquiries about the current user's own properties, newest first"""
+    try:
+        landlord_id = int(get_jwt_identity())
+        own_properties = db.select(Property.id).where(Property.landlord_id == landlord_id)
+        try:
+            return jsonify(_enquiry_page(Enquiry.query.filter(Enquiry.property_id.in_(own_properties)))), 200
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
         
     except Exception as e:
         return jsonify({'message': 'Failed to fetch enquiries', 'error': str(e)}), 500
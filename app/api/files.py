@@ -0,0 +1,91 @@
+from flask import Blueprint, jsonify, current_app, send_from_directory
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from sqlalchemy import or_
+from werkzeug.exceptions import NotFound
+from app import db
+from app.models.document import Document
+from app.models.property import Property
+from app.models.tenant_application import TenantApplication
+from app.models.upload_session import UploadSession
+from app.models.user import User
+from app.services.storage import LOCAL_FILES_ROUTE
+
+files_bp = Blueprint('files', __name__)
+
+# KYC scans and agreements must never be kept by a browser or shared cache
+PRIVATE_CACHE_CONTROL = 'private, no-store'
+
+
+def _exists(query):
+    return db.session.query(query.exists()).scalar()
+
+
+def _may_read(user, key):
+    """Same rules as create_download_link, keyed by the record that stores the file.
+
+    Stored URLs may carry a different host (LOCAL_STORAGE_BASE_URL or the
+    request host at upload time), so records are matched on the path.
+    """
+    if user.is_admin():
+        return True
+
+    def refers_to_file(column):
+        return column.endswith(f'{LOCAL_FILES_ROUTE}{key}', autoescape=True)
+
+    # Blank agreement templates are part of the public listing
+    if _exists(Property.query.filter(refers_to_file(Property.tenant_agreement_url))):
+        return True
+
+    if _exists(Document.query.filter(
+        refers_to_file(Document.file_url),
+        Document.user_id == user.id,
+        Document.is_accessible.is_(True)
+    )):
+        return True
+
+    # The uploader may look at a chunked upload before it is attached
+    if _exists(UploadSession.query.filter(
+        or_(refers_to_file(UploadSession.result_url), refers_to_file(UploadSession.backup_url)),
+        UploadSession.user_id == user.id
+    )):
+        return True
+
+    return _exists(TenantApplication.query.filter(
+        or_(*(refers_to_file(column) for column in (
+            TenantApplication.id_document_front, TenantApplication.id_document_back,
+            TenantApplication.signed_agreement_url, TenantApplication.signed_agreement_backup_url
+        ))),
+        or_(TenantApplication.user_id == user.id, TenantApplication.property.has(landlord_id=user.id))
+    ))
+
+
+@files_bp.route('/<path:key>', methods=['GET'])
+def serve_file(key):
+    """Serve a file stored by the local storage backend.
+
+    Folders in LOCAL_PUBLIC_FOLDERS (listing images) are public and cached
+    for an hour; any other file is only served to the users allowed to read
+    the record that stores it. send_from_directory hands the open file to
+    the WSGI server's file wrapper (sendfile under gunicorn) and answers
+    Range requests.
+    """
+    public = key.split('/', 1)[0] in current_app.config['LOCAL_PUBLIC_FOLDERS']
+    if not public:
+        verify_jwt_in_request()
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or not _may_read(user, key):
+            return jsonify({'message': 'Permission denied'}), 403
+
+    try:
+        response = send_from_directory(
+            current_app.config['LOCAL_STORAGE_DIR'],
+            key,
+            conditional=True,
+            max_age=3600 if public else None
+        )
+    except NotFound:
+        return jsonify({'message': 'File not found'}), 404
+
+    if not public:
+        response.headers['Cache-Control'] = PRIVATE_CACHE_CONTROL
+    return response
@@ -1,14 +1,27 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 from app import db
 from app.models.payment import Payment
+from app.models.mpesa_callback import MpesaCallback
+from app.models.audit_log import AuditLog
 from app.models.property import Property
 from app.models.user import User
 from app.services.mpesa import MpesaService
-from app.utils.sms import send_otp_sms
-from app.utils.email import send_payment_notification_email
-from app.models.setting import Setting
+from app.services.jobs import kick as kick_jobs
+from app.services.payment_callbacks import apply_stk_result, apply_early_callbacks
+from app.services.statement_import import reconcile_statement, StatementError, STATEMENT_MATCH_WINDOW_MINUTES
+from app.utils.decorators import admin_required
+from app.utils.pagination import keyset_page, page_payload
+from datetime import datetime, timedelta
+from decimal import Decimal
+import csv
+import io
+import json
 import os
+import re
+import tempfile
 
 payments_bp = Blueprint('payments', __name__)
 
@@ -76,6 +89,13 @@ def initiate_payment():
             payment.process()
             db.session.commit()
             
+            # Apply a callback that arrived before the checkout ID was saved
+            applied_early = apply_early_callbacks(payment)
+            db.session.commit()
+            if applied_early:
+                db.session.refresh(payment)
+                kick_jobs()
+            
             return jsonify({
                 'message': 'Payment initiated. Please check your phone to complete the transaction.',
                 'payment': payment.to_dict(),
@@ -97,7 +117,13 @@ def initiate_payment():
 
 @payments_bp.route('/callback', methods=['POST'])
 def mpesa_callback():
-    """Handle M-Pesa callback"""
+    """Handle M-Pesa callback.
+    
+    Every distinct callback is recorded in the MpesaCallback ledger; a
+    replay of one already recorded is acknowledged without touching the
+    payment. Status changes use conditional UPDATEs, so notifications are
+    queued at most once per payment.
+    """
     try:
         data = request.get_json()
         
@@ -107,55 +133,51 @@ def mpesa_callback():
         result_code = callback_data.get('ResultCode')
         result_desc = callback_data.get('ResultDesc')
         
+        if not checkout_request_id:
+            return jsonify({'message': 'CheckoutRequestID is required'}), 400
+        
+        # Replay of a callback we already recorded: count it and acknowledge
+        payload_hash = MpesaCallback.hash_payload(callback_data)
+        replayed = MpesaCallback.query.filter_by(
+            checkout_request_id=checkout_request_id,
+            payload_hash=payload_hash
+        ).update({'duplicate_count': MpesaCallback.duplicate_count + 1}, synchronize_session=False)
+        if replayed:
+            db.session.commit()
+            return jsonify({'message': 'Callback already processed'}), 200
+        
         # Find payment by checkout request ID
         payment = Payment.query.filter_by(mpesa_checkout_request_id=checkout_request_id).first()
         
+        ledger = MpesaCallback(
+            checkout_request_id=checkout_request_id,
+            payload_hash=payload_hash,
+            result_code=result_code,
+            payload=data,
+            payment_id=payment.id if payment else None,
+            # The callback can beat initiate_payment's commit; it is applied from there
+            outcome=None if payment else 'unmatched'
+        )
+        db.session.add(ledger)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # A concurrent delivery of the same callback got there first
+            db.session.rollback()
+            return jsonify({'message': 'Callback already processed'}), 200
+        
         if not payment:
-            return jsonify({'message': 'Payment not found'}), 404
+            db.session.commit()
+            return jsonify({'message': 'Callback recorded'}), 202
+        
+        applied = apply_stk_result(payment, ledger)
+        db.session.commit()
+        if applied and result_code == 0:
+            kick_jobs()
         
         if result_code == 0:
-            # Payment successful
-            callback_metadata = callback_data.get('CallbackMetadata', {}).get('Item', [])
-            receipt_number = None
-            
-            for item in callback_metadata:
-                if item.get('Name') == 'MpesaReceiptNumber':
-                    receipt_number = item.get('Value')
-                    break
-            
-            payment.complete(receipt_number)
-            
-            # Link property for context
-            property_title = "N/A"
-            if payment.property_id:
-                prop = Property.query.get(payment.property_id)
-                if prop:
-                    property_title = prop.title
-
-            # Notify Admin
-            admin_email_setting = Setting.query.filter_by(key='primary_admin_email').first()
-            if admin_email_setting and admin_email_setting.value:
-                send_payment_notification_email(admin_email_setting.value, {
-                    'payment_type': payment.payment_type.replace('_', ' ').capitalize(),
-                    'amount': str(payment.amount),
-                    'tenant_name': payment.user.name if payment.user else 'Unknown',
-                    'phone': payment.phone_number,
-                    'property_title': property_title,
-                    'receipt_number': receipt_number
-                })
-
-            # Notify Tenant via SMS
-            sms_message = f"Payment of KES {payment.amount} for {payment.payment_type.replace('_', ' ')} received successfully. Ref: {receipt_number}. Thank you!"
-            send_otp_sms(payment.phone_number, sms_message)
-
-            db.session.commit()
-            
             return jsonify({'message': 'Payment completed successfully'}), 200
         else:
-            # Payment failed
-            payment.fail(result_desc)
-            db.session.commit()
-            
             return jsonify({'message': 'Payment failed', 'error': result_desc}), 400
         
     except Exception as e:
@@ -200,10 +222,87 @@ def get_my_payments():
         return jsonify({'message': 'Failed to fetch payments', 'error': str(e)}), 500
 
 
+# M-Pesa receipt numbers: uppercase letters and digits, e.g. RJ4XK2L9PQ
+RECEIPT_PATTERN = re.compile(r'^[A-Z][A-Z0-9]{3,11}$')
+
+
+def _prefix_range(column, prefix):
+    """column LIKE 'prefix%' written as a range any b-tree index can serve"""
+    return db.and_(column >= prefix, column < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+
+
+def _search_payments(query, search):
+    """Restrict to payments matching `search`.
+
+    Receipt, phone and tenant name/email are each a separate SELECT in one
+    UNION, so that Postgres can serve every branch from an index. A
+    receipt-shaped term looks up receipts as a prefix range on the unique
+    receipt index; other terms are substring matches served by the pg_trgm
+    GIN indexes. SQLite (no trigram indexes) runs the same query as scans.
+    """
+    pattern = f'%{search}%'
+    digits = re.sub(r'\D', '', search)
+    # 0712..., +254712... and 712... all match the stored number by its last 9 digits
+    phone_pattern = f'%{digits[-9:]}%' if len(digits) >= 9 else pattern
+
+    if RECEIPT_PATTERN.match(search) and any(ch.isdigit() for ch in search):
+        receipt_match = _prefix_range(Payment.mpesa_receipt_number, search)
+    else:
+        receipt_match = Payment.mpesa_receipt_number.ilike(pattern)
+
+    matching_ids = db.union(
+        db.select(Payment.id).where(receipt_match),
+        db.select(Payment.id).where(Payment.phone_number.ilike(phone_pattern)),
+        db.select(Payment.id).join(User, User.id == Payment.user_id).where(
+            db.or_(User.name.ilike(pattern), User.email.ilike(pattern))
+        )
+    )
+    return query.filter(Payment.id.in_(db.select(matching_ids.subquery().c.id)))
+
+
+def _apply_payment_filters(query, args):
+    """Admin list filters (status, payment_type, search, date_from, date_to).
+
+    Works on ORM queries and select() statements alike; raises ValueError
+    for malformed dates.
+    """
+    status = args.get('status', '').strip()
+    payment_type = args.get('payment_type', '').strip()
+    search = args.get('search', '').strip()
+    date_from = args.get('date_from', '').strip()
+    date_to = args.get('date_to', '').strip()
+    
+    if status:
+        query = query.filter(Payment.status == status)
+    
+    if payment_type:
+        query = query.filter(Payment.payment_type == payment_type)
+        
+    if search:
+        query = _search_payments(query, search)
+    
+    try:
+        if date_from:
+            query = query.filter(Payment.created_at >= datetime.fromisoformat(date_from))
+        if date_to:
+            if len(date_to) == 10:  # a bare date includes the whole day
+                query = query.filter(Payment.created_at < datetime.fromisoformat(date_to) + timedelta(days=1))
+            else:
+                query = query.filter(Payment.created_at <= datetime.fromisoformat(date_to))
+    except ValueError:
+        raise ValueError('date_from and date_to must be ISO dates (YYYY-MM-DD)')
+    
+    return query
+
+
 @payments_bp.route('/all', methods=['GET'])
 @jwt_required()
 def get_all_payments():
-    """Get all payments (admin only)"""
+    """Get all payments (admin only).
+
+    Pass `cursor` (empty for the first page) for keyset paging on
+    (created_at, id); `page` keeps the older numbered pages with totals.
+    """
     try:
         user_id = int(get_jwt_identity())
         user = User.query.get(user_id)
@@ -212,42 +311,25 @@ def get_all_payments():
             return jsonify({'message': 'Permission denied'}), 403
         
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
-        status = request.args.get('status', '').strip()
-        payment_type = request.args.get('payment_type', '').strip()
-        search = request.args.get('search', '').strip()
-        date_from = request.args.get('date_from', '').strip()
-        date_to = request.args.get('date_to', '').strip()
-        
-        query = Payment.query.join(User)
+        per_page = max(1, min(request.args.get('per_page', 20, type=int), 100))
+        cursor = request.args.get('cursor')
         
-        if status:
-            query = query.filter(Payment.status == status)
+        try:
+            query = _apply_payment_filters(Payment.query.options(joinedload(Payment.user)), request.args)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
         
-        if payment_type:
-            query = query.filter(Payment.payment_type == payment_type)
-            
-        if search:
-            query = query.filter(
-                (User.name.ilike(f'%{search}%')) | 
-                (User.email.ilike(f'%{search}%')) | 
-                (Payment.mpesa_receipt_number.ilike(f'%{search}%')) |
-                (Payment.phone_number.ilike(f'%{search}%'))
-            )
-            
-        if date_from:
+        if cursor is not None:
             try:
-                df = datetime.fromisoformat(date_from)
-                query = query.filter(Payment.created_at >= df)
-            except: pass
-            
-        if date_to:
-            try:
-                dt = datetime.fromisoformat(date_to)
-                query = query.filter(Payment.created_at <= dt)
-            except: pass
+                payments, next_cursor = keyset_page(query, (Payment.created_at, Payment.id), cursor, per_page)
+            except ValueError as e:
+                return jsonify({'message': str(e)}), 400
+            return jsonify({
+                'payments': [p.to_dict(include_user=True) for p in payments],
+                'pagination': page_payload(per_page, next_cursor)
+            }), 200
         
-        pagination = query.order_by(Payment.created_at.desc()).paginate(
+        pagination = query.order_by(Payment.created_at.desc(), Payment.id.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
         
@@ -263,3 +345,146 @@ def get_all_payments():
         
     except Exception as e:
         return jsonify({'message': 'Failed to fetch payments', 'error': str(e)}), 500
+
+
+# Columns of /export, in output order; the user is joined in SQL
+EXPORT_COLUMNS = (
+    Payment.id, Payment.created_at, Payment.completed_at, Payment.status, Payment.payment_type,
+    Payment.amount, Payment.currency, Payment.mpesa_receipt_number, Payment.phone_number,
+    Payment.user_id, User.name.label('user_name'), User.email.label('user_email'),
+    Payment.property_id, Payment.description, Payment.failure_reason
+)
+
+# Rows fetched per round trip from the server-side cursor (and per response chunk)
+PAYMENT_EXPORT_BATCH_SIZE = int(os.getenv('PAYMENT_EXPORT_BATCH_SIZE', 2000))
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+@payments_bp.route('/export', methods=['GET'])
+@jwt_required()
+@admin_required
+def export_payments():
+    """Admin endpoint to stream payments as CSV (default) or NDJSON (?format=ndjson).
+
+    Accepts the same filters as /all. Rows come from a server-side cursor in
+    batches and are written out as they arrive, so memory stays flat
+    however many rows match.
+    """
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'message': 'format must be csv or ndjson'}), 400
+    
+    try:
+        statement = _apply_payment_filters(
+            db.select(*EXPORT_COLUMNS).outerjoin(User, User.id == Payment.user_id),
+            request.args
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    statement = statement.order_by(Payment.created_at.desc(), Payment.id.desc()).execution_options(
+        yield_per=PAYMENT_EXPORT_BATCH_SIZE
+    )
+    
+    try:
+        AuditLog.log(
+            action='payments_exported',
+            user_id=int(get_jwt_identity()),
+            resource_type='payment',
+            details={'format': export_format, 'filters': request.args.to_dict()}
+        )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to export payments', 'error': str(e)}), 500
+    
+    def generate():
+        result = db.session.execute(statement)
+        columns = list(result.keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if export_format == 'csv' else None
+        if writer:
+            writer.writerow(columns)
+        
+        for batch in result.partitions():
+            for row in batch:
+                values = [_export_value(value) for value in row]
+                if writer:
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(columns, values))))
+                    buffer.write('\n')
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    
+    extension, mimetype = ('csv', 'text/csv') if export_format == 'csv' else ('ndjson', 'application/x-ndjson')
+    filename = f"payments-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{extension}"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            # Let nginx pass chunks through instead of buffering the whole export
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+@payments_bp.route('/statements/import', methods=['POST'])
+@jwt_required()
+@admin_required
+def import_statement():
+    """Admin endpoint to match an M-Pesa statement (CSV/XLSX) against payments.
+
+    Multipart form: file, optional window_minutes. Returns discrepancy counts
+    with samples; use `flask import-statement --output` for the full list.
+    """
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'message': 'Statement file is required'}), 400
+
+    extension = os.path.splitext(upload.filename)[1].lower()
+    if extension not in ('.csv', '.xlsx'):
+        return jsonify({'message': 'Statement must be a .csv or .xlsx export'}), 400
+
+    fd, path = tempfile.mkstemp(suffix=extension, prefix='vs_statement_')
+    try:
+        os.close(fd)
+        upload.save(path)
+        report = reconcile_statement(
+            path,
+            filename=upload.filename,
+            window_minutes=request.form.get('window_minutes', STATEMENT_MATCH_WINDOW_MINUTES, type=int)
+        )
+
+        AuditLog.log(
+            action='payment_statement_imported',
+            user_id=int(get_jwt_identity()),
+            resource_type='payment',
+            details={
+                'filename': upload.filename,
+                'rows': report['rows'],
+                'period': report['period'],
+                'discrepancies': report['discrepancies']
+            }
+        )
+        db.session.commit()
+
+        return jsonify({'report': report}), 200
+
+    except StatementError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to import statement', 'error': str(e)}), 500
+    finally:
+        os.remove(path)
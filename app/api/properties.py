@@ -5,7 +5,8 @@ from app import db
 from app.models.property import Property
 from app.models.user import User
 from app.models.property_like import PropertyLike
-from app.services.cloudinary_service import CloudinaryService
+from app.services.storage import get_storage
+from app.services.portfolio import get_portfolio
 from app.utils.decorators import admin_required, landlord_required
 from app.utils.sanitizers import sanitize_string
 
@@ -215,10 +216,10 @@ def create_property():
         )
         
         # Handle Tenant Agreement Upload (dual: Uploadcare primary + Cloudinary backup)
-        cloudinary = CloudinaryService()
+        storage = get_storage()
         tenant_agreement = request.files.get('tenant_agreement_file')
         if tenant_agreement:
-            result = cloudinary.upload_document_dual(tenant_agreement, folder='tenant_agreements')
+            result = storage.upload_document_dual(tenant_agreement, folder='tenant_agreements')
             if result.get('primary_url'):
                 property.tenant_agreement_url = result['primary_url']
                 
@@ -228,7 +229,7 @@ def create_property():
         if image_files:
             for image_file in image_files:
                 if image_file.filename != '':
-                    img_url = cloudinary.upload_image(image_file, folder='property_images')
+                    img_url = storage.upload_image(image_file, folder='property_images')
                     if img_url:
                         uploaded_image_urls.append(img_url)
         
@@ -357,10 +358,10 @@ def update_property(property_id):
                 property.admin_edited_description = sanitize_string(data['admin_edited_description']).strip()
         
         # Handle New Tenant Agreement Upload (dual: Uploadcare primary + Cloudinary backup)
-        cloudinary = CloudinaryService()
+        storage = get_storage()
         tenant_agreement = request.files.get('tenant_agreement_file')
         if tenant_agreement:
-            result = cloudinary.upload_document_dual(tenant_agreement, folder='tenant_agreements')
+            result = storage.upload_document_dual(tenant_agreement, folder='tenant_agreements')
             if result.get('primary_url'):
                 property.tenant_agreement_url = result['primary_url']
                 
@@ -370,7 +371,7 @@ def update_property(property_id):
         if image_files:
             for image_file in image_files:
                 if image_file.filename != '':
-                    img_url = cloudinary.upload_image(image_file, folder='property_images')
+                    img_url = storage.upload_image(image_file, folder='property_images')
                     if img_url:
                         uploaded_image_urls.append(img_url)
         
@@ -556,6 +557,24 @@ def get_my_properties():
     except Exception as e:
         return jsonify({'message': 'Failed to fetch properties', 'error': str(e)}), 500
 
+@properties_bp.route('/my-portfolio', methods=['GET'])
+@jwt_required()
+@landlord_required
+def get_my_portfolio():
+    """Per-property views, clicks, likes, enquiries, applications and vacancies for the current landlord.
+
+    Cached per landlord (LANDLORD_PORTFOLIO_CACHE_TTL) and dropped whenever
+    one of their properties, enquiries, applications or likes changes;
+    ?fresh=1 rebuilds it.
+    """
+    try:
+        user_id = int(get_jwt_identity())
+        portfolio = get_portfolio(user_id, fresh=request.args.get('fresh') in ('1', 'true'))
+        return jsonify(portfolio), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to fetch portfolio', 'error': str(e)}), 500
+
 @properties_bp.route('/<int:property_id>/like', methods=['POST'])
 @jwt_required()
 def toggle_property_like(property_id):
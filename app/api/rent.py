@@ -0,0 +1,225 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app import db
+from app.models.rent_schedule import RentSchedule, RentCharge, first_due_date
+from app.models.tenant_application import TenantApplication
+from app.models.audit_log import AuditLog
+from app.models.user import User
+from app.utils.decorators import admin_required
+from datetime import date, datetime
+
+rent_bp = Blueprint('rent', __name__)
+
+
+def _parse_date(value, field):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be a YYYY-MM-DD date')
+
+
+@rent_bp.route('/schedules', methods=['POST'])
+@jwt_required()
+@admin_required
+def create_schedule():
+    """Admin endpoint to start monthly rent collection for an approved application"""
+    try:
+        admin_id = int(get_jwt_identity())
+        data = request.get_json() or {}
+
+        application = TenantApplication.query.get_or_404(data.get('application_id'))
+        if application.status != 'approved':
+            return jsonify({'message': 'Rent can only be scheduled for approved applications'}), 400
+        if RentSchedule.query.filter_by(application_id=application.id).first():
+            return jsonify({'message': 'This application already has a rent schedule'}), 409
+
+        amount = data.get('amount') or (application.property.price if application.property else None)
+        if not amount or float(amount) <= 0:
+            return jsonify({'message': 'Valid amount is required'}), 400
+
+        day_of_month = int(data.get('day_of_month', 1))
+        if not 1 <= day_of_month <= 28:
+            return jsonify({'message': 'day_of_month must be between 1 and 28'}), 400
+
+        start_date = _parse_date(data['start_date'], 'start_date') if data.get('start_date') else date.today()
+        end_date = _parse_date(data['end_date'], 'end_date') if data.get('end_date') else None
+
+        schedule = RentSchedule(
+            application_id=application.id,
+            user_id=application.user_id,
+            property_id=application.property_id,
+            amount=amount,
+            phone_number=data.get('phone_number') or application.phone,
+            day_of_month=day_of_month,
+            next_due_date=first_due_date(start_date, day_of_month),
+            end_date=end_date,
+            created_by=admin_id
+        )
+        db.session.add(schedule)
+        db.session.flush()
+
+        AuditLog.log(
+            action='rent_schedule_created',
+            user_id=admin_id,
+            resource_type='rent_schedule',
+            resource_id=schedule.id,
+            details=schedule.to_dict()
+        )
+        db.session.commit()
+
+        return jsonify({'message': 'Rent schedule created', 'schedule': schedule.to_dict()}), 201
+
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to create rent schedule', 'error': str(e)}), 500
+
+
+@rent_bp.route('/schedules', methods=['GET'])
+@jwt_required()
+def get_schedules():
+    """Admins see every schedule (optionally by status); tenants see their own"""
+    try:
+        user_id = int(get_jwt_identity())
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({'message': 'User not found'}), 404
+
+        query = RentSchedule.query
+        if not user.is_admin():
+            query = query.filter_by(user_id=user_id)
+
+        status = request.args.get('status')
+        if status and status != 'all':
+            query = query.filter_by(status=status)
+
+        schedules = query.order_by(RentSchedule.next_due_date).all()
+        return jsonify({'schedules': [s.to_dict() for s in schedules]}), 200
+    except Exception as e:
+        return jsonify({'message': 'Failed to fetch rent schedules', 'error': str(e)}), 500
+
+
+@rent_bp.route('/schedules/<int:schedule_id>', methods=['PATCH'])
+@jwt_required()
+@admin_required
+def update_schedule(schedule_id):
+    """Admin endpoint to pause, resume, cancel or change amount / due day"""
+    try:
+        admin_id = int(get_jwt_identity())
+        schedule = RentSchedule.query.get_or_404(schedule_id)
+        data = request.get_json() or {}
+
+        if 'status' in data:
+            if data['status'] not in ('active', 'paused', 'cancelled'):
+                return jsonify({'message': 'Invalid status'}), 400
+            if data['status'] == 'active' and schedule.status == 'paused':
+                # Resuming: skip the months that passed while paused
+                schedule.next_due_date = first_due_date(max(schedule.next_due_date, date.today()), schedule.day_of_month)
+            schedule.status = data['status']
+
+        if 'amount' in data:
+            if not data['amount'] or float(data['amount']) <= 0:
+                return jsonify({'message': 'Valid amount is required'}), 400
+            schedule.amount = data['amount']
+
+        if 'day_of_month' in data:
+            day_of_month = int(data['day_of_month'])
+            if not 1 <= day_of_month <= 28:
+                return jsonify({'message': 'day_of_month must be between 1 and 28'}), 400
+            schedule.day_of_month = day_of_month
+            schedule.next_due_date = first_due_date(schedule.next_due_date.replace(day=1), day_of_month)
+
+        if 'phone_number' in data:
+            schedule.phone_number = data['phone_number']
+
+        AuditLog.log(
+            action='rent_schedule_updated',
+            user_id=admin_id,
+            resource_type='rent_schedule',
+            resource_id=schedule.id,
+            details={'changes': data}
+        )
+        db.session.commit()
+
+        return jsonify({'message': 'Rent schedule updated', 'schedule': schedule.to_dict()}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to update rent schedule', 'error': str(e)}), 500
+
+
+@rent_bp.route('/charges', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_charges():
+    """Admin endpoint to list rent charges, e.g. ?status=uncertain for manual review"""
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 50, type=int)
+
+        query = RentCharge.query
+        status = request.args.get('status')
+        if status and status != 'all':
+            query = query.filter_by(status=status)
+        schedule_id = request.args.get('schedule_id', type=int)
+        if schedule_id:
+            query = query.filter_by(schedule_id=schedule_id)
+        period = request.args.get('period')
+        if period:
+            query = query.filter_by(period=period)
+
+        charges = query.order_by(RentCharge.updated_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+        return jsonify({
+            'charges': [c.to_dict() for c in charges.items],
+            'total': charges.total,
+            'page': charges.page,
+            'pages': charges.pages
+        }), 200
+    except Exception as e:
+        return jsonify({'message': 'Failed to fetch rent charges', 'error': str(e)}), 500
+
+
+@rent_bp.route('/charges/<int:charge_id>/retry', methods=['POST'])
+@jwt_required()
+@admin_required
+def retry_charge(charge_id):
+    """Admin endpoint to re-queue a charge after checking the M-Pesa statement.
+
+    Uncertain and failed charges can be retried, and so can a sent charge
+    whose payment failed (e.g. the tenant cancelled the STK prompt). A charge
+    whose payment completed or is still processing never is: the retry would
+    push a second payment.
+    """
+    try:
+        admin_id = int(get_jwt_identity())
+
+        charge = db.session.get(RentCharge, charge_id, with_for_update=True)
+        if not charge:
+            return jsonify({'message': 'Rent charge not found'}), 404
+
+        payment_status = charge.payment.status if charge.payment else None
+        if payment_status in ('completed', 'processing'):
+            db.session.rollback()
+            return jsonify({'message': f'The payment for this charge is {payment_status}'}), 409
+        if not (charge.status in ('uncertain', 'failed') or (charge.status == 'sent' and payment_status == 'failed')):
+            db.session.rollback()
+            return jsonify({'message': 'Only uncertain or failed charges can be retried'}), 409
+
+        charge.status = 'queued'
+        charge.attempts = 0
+        charge.next_attempt_at = datetime.utcnow()
+        charge.last_error = None
+
+        AuditLog.log(
+            action='rent_charge_requeued',
+            user_id=admin_id,
+            resource_type='rent_charge',
+            resource_id=charge_id
+        )
+        db.session.commit()
+
+        return jsonify({'message': 'Charge queued for the next collection run',
+                        'charge': charge.to_dict()}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to retry rent charge', 'error': str(e)}), 500
@@ -0,0 +1,148 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.utils import secure_filename
+from app import db
+from app.models.upload_session import UploadSession
+from app.services.upload_staging import (
+    UPLOAD_PURPOSES, UploadOffsetMismatch, UploadTooLarge,
+    create_upload_session, append_chunk, finalize_upload, discard_upload,
+    purge_stale_uploads
+)
+
+uploads_bp = Blueprint('uploads', __name__)
+
+
+def _offset_headers(session):
+    return {
+        'Upload-Offset': str(session.received_size),
+        'Upload-Length': str(session.total_size),
+        'Cache-Control': 'no-store'
+    }
+
+
+def _get_own_session(upload_id):
+    user_id = int(get_jwt_identity())
+    return UploadSession.query.filter_by(id=upload_id, user_id=user_id).first()
+
+
+@uploads_bp.route('/', methods=['POST'], strict_slashes=False)
+@jwt_required()
+def create_upload():
+    """Start a resumable (tus-style) chunked upload.
+
+    Body: {"filename": "...", "size": <bytes>, "purpose": "id_document|signed_agreement"}
+    The size may also be given in an Upload-Length header.
+    """
+    try:
+        user_id = int(get_jwt_identity())
+        data = request.get_json(silent=True) or {}
+
+        filename = secure_filename(data.get('filename', '')) or 'upload.bin'
+        purpose = data.get('purpose')
+        total_size = data.get('size') or request.headers.get('Upload-Length', type=int)
+
+        if purpose not in UPLOAD_PURPOSES:
+            return jsonify({'message': f'purpose must be one of: {", ".join(UPLOAD_PURPOSES)}'}), 400
+
+        try:
+            total_size = int(total_size)
+        except (TypeError, ValueError):
+            return jsonify({'message': 'Valid upload size is required'}), 400
+
+        if total_size <= 0:
+            return jsonify({'message': 'Valid upload size is required'}), 400
+
+        if total_size > current_app.config['UPLOAD_MAX_SIZE']:
+            return jsonify({'message': 'File exceeds maximum upload size'}), 413
+
+        # Opportunistic garbage collection of abandoned uploads
+        purge_stale_uploads()
+
+        session = create_upload_session(
+            user_id=user_id,
+            filename=filename,
+            total_size=total_size,
+            purpose=purpose,
+            content_type=data.get('content_type')
+        )
+        db.session.commit()
+
+        headers = _offset_headers(session)
+        headers['Location'] = f'{request.base_url.rstrip("/")}/{session.id}'
+        return jsonify({'upload': session.to_dict()}), 201, headers
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to start upload', 'error': str(e)}), 500
+
+
+@uploads_bp.route('/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload(upload_id):
+    """Report upload progress. HEAD returns only the Upload-Offset headers."""
+    session = _get_own_session(upload_id)
+    if not session or session.status == 'expired':
+        return jsonify({'message': 'Upload not found'}), 404
+
+    return jsonify({'upload': session.to_dict()}), 200, _offset_headers(session)
+
+
+@uploads_bp.route('/<upload_id>', methods=['PATCH'])
+@jwt_required()
+def upload_chunk(upload_id):
+    """Append a chunk at Upload-Offset. The final chunk triggers the Cloudinary hand-off."""
+    try:
+        session = _get_own_session(upload_id)
+        if not session or session.status == 'expired':
+            return jsonify({'message': 'Upload not found'}), 404
+
+        if session.is_complete():
+            return jsonify({'upload': session.to_dict()}), 200, _offset_headers(session)
+
+        offset = request.headers.get('Upload-Offset', type=int)
+        if offset is None:
+            return jsonify({'message': 'Upload-Offset header is required'}), 400
+
+        try:
+            append_chunk(session, offset, request.stream)
+        except UploadOffsetMismatch as e:
+            db.session.commit()
+            return jsonify({'message': 'Offset mismatch', 'expected_offset': e.expected}), 409, _offset_headers(session)
+        except UploadTooLarge:
+            db.session.commit()
+            return jsonify({'message': 'Chunk exceeds declared upload length'}), 413, _offset_headers(session)
+
+        if session.received_size < session.total_size:
+            db.session.commit()
+            return '', 204, _offset_headers(session)
+
+        if not finalize_upload(session):
+            db.session.commit()
+            return jsonify({'message': 'Upload received but storage hand-off failed. Retry with an empty PATCH.'}), 502, _offset_headers(session)
+
+        db.session.commit()
+        return jsonify({'upload': session.to_dict()}), 200, _offset_headers(session)
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to store chunk', 'error': str(e)}), 500
+
+
+@uploads_bp.route('/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_upload(upload_id):
+    """Abort an in-progress upload and discard its staged bytes"""
+    try:
+        session = _get_own_session(upload_id)
+        if not session:
+            return jsonify({'message': 'Upload not found'}), 404
+
+        if session.status == 'uploading':
+            discard_upload(session)
+            db.session.commit()
+
+        return '', 204
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to cancel upload', 'error': str(e)}), 500
@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.user import User
 from app.utils.decorators import admin_required
+from app.utils.pagination import keyset_page, page_payload
 from app.utils.sanitizers import sanitize_string
 
 users_bp = Blueprint('users', __name__)
@@ -163,24 +164,52 @@ def delete_user(user_id):
         db.session.rollback()
         return jsonify({'message': 'Failed to delete user', 'error': str(e)}), 500
 
+def _kyc_queue(user_filters, document_filters):
+    """One page of landlords with matching documents, plus those documents.
+
+    Two queries however many landlords there are: the page of users (only
+    those with at least one matching document, via EXISTS) and one IN
+    query for the page's documents. Paged by user id with ?per_page (max
+    100) and ?cursor (the previous page's next_cursor).
+    """
+    from app.models.document import Document
+    per_page = max(1, min(request.args.get('per_page', 50, type=int), 100))
+
+    has_documents = db.exists().where(Document.user_id == User.id, *document_filters)
+    users, next_cursor = keyset_page(
+        User.query.filter(*user_filters, has_documents), (User.id,), request.args.get('cursor'), per_page,
+        descending=False
+    )
+
+    documents = {}
+    if users:
+        for doc in Document.query.filter(Document.user_id.in_([u.id for u in users]), *document_filters).order_by(Document.id):
+            documents.setdefault(doc.user_id, []).append(doc)
+
+    return {
+        'requests': [
+            {
+                'user': user.to_dict(include_sensitive=True),
+                'documents': [d.to_dict(include_file_url=True) for d in documents.get(user.id, [])]
+            } for user in users
+        ],
+        'pagination': page_payload(per_page, next_cursor)
+    }
+
 @users_bp.route('/kyc/pending', methods=['GET'])
 @jwt_required()
 @admin_required
 def get_pending_kyc():
-    """Get all pending KYC verification requests (admin only)"""
+    """Get pending KYC verification requests, oldest account first (admin only)"""
     try:
         from app.models.document import Document
-        pending_users = User.query.filter(User.verification_status == 'pending', User.role == 'landlord').all()
-        results = []
-        for user in pending_users:
-            docs = Document.query.filter_by(user_id=user.id, status='pending').all()
-            if docs:
-                results.append({
-                    'user': user.to_dict(include_sensitive=True),
-                    'documents': [d.to_dict(include_file_url=True) for d in docs]
-                })
-                
-        return jsonify({'requests': results}), 200
+        try:
+            return jsonify(_kyc_queue(
+                (User.verification_status == 'pending', User.role == 'landlord'),
+                (Document.status == 'pending',)
+            )), 200
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
         
     except Exception as e:
         return jsonify({'message': 'Failed to fetch KYC requests', 'error': str(e)}), 500
@@ -192,18 +221,14 @@ def get_all_kyc():
     """Get all KYC verification requests (admin only)"""
     try:
         from app.models.document import Document
-        # Only fetch landlords who have at least started KYC (status not pending, or have documents)
-        kyc_users = User.query.filter(User.role == 'landlord', User.id_number.isnot(None)).all()
-        results = []
-        for user in kyc_users:
-            docs = Document.query.filter_by(user_id=user.id).filter(Document.document_type.in_(['id_document', 'legal_document'])).all()
-            if docs:
-                results.append({
-                    'user': user.to_dict(include_sensitive=True),
-                    'documents': [d.to_dict(include_file_url=True) for d in docs]
-                })
-                
-        return jsonify({'requests': results}), 200
+        # Only landlords who have at least started KYC (ID number given and an ID/legal document uploaded)
+        try:
+            return jsonify(_kyc_queue(
+                (User.role == 'landlord', User.id_number.isnot(None)),
+                (Document.document_type.in_(['id_document', 'legal_document']),)
+            )), 200
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
         
     except Exception as e:
         return jsonify({'message': 'Failed to fetch all KYC data', 'error': str(e)}), 500
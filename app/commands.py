@@ -0,0 +1,127 @@
+"""Flask CLI commands (run with `flask <command>`)"""
+import click
+
+
+def register_commands(app):
+
+    @app.cli.command('purge-uploads')
+    def purge_uploads_command():
+        """Expire abandoned chunked uploads and delete their staged files."""
+        from app.services.upload_staging import purge_stale_uploads
+        expired = purge_stale_uploads()
+        click.echo(f'Expired {expired} stale upload(s).')
+
+    @app.cli.command('purge-idempotency-keys')
+    def purge_idempotency_keys_command():
+        """Delete Idempotency-Key records past their replay window."""
+        from app.models.idempotency_record import IdempotencyRecord
+        deleted = IdempotencyRecord.purge_expired()
+        click.echo(f'Deleted {deleted} expired idempotency key(s).')
+
+    @app.cli.command('run-jobs')
+    @click.option('--loop', is_flag=True, help='Keep polling for due jobs instead of exiting.')
+    @click.option('--interval', default=5.0, show_default=True, help='Seconds between polls with --loop.')
+    def run_jobs_command(loop, interval):
+        """Run due background jobs (notification retries, leftovers)."""
+        import time
+        from app.services.jobs import run_pending
+        while True:
+            succeeded, failed = run_pending()
+            if succeeded or failed or not loop:
+                click.echo(f'Ran {succeeded + failed} job(s): {succeeded} succeeded, {failed} failed.')
+            if not loop:
+                break
+            time.sleep(interval)
+
+    @app.cli.command('reconcile-payments')
+    @click.option('--min-age', default=None, type=int, help='Only payments stuck in processing for this many seconds.')
+    @click.option('--limit', default=500, show_default=True, help='Maximum payments to check in this run.')
+    @click.option('--concurrency', default=None, type=int, help='Parallel STK status queries.')
+    @click.option('--rate', default=None, type=float, help='Maximum Daraja queries per second.')
+    def reconcile_payments_command(min_age, limit, concurrency, rate):
+        """Settle processing payments whose M-Pesa callback never arrived (run from cron)."""
+        from app.services import reconciler
+        summary = reconciler.reconcile_payments(
+            min_age=reconciler.RECONCILE_MIN_AGE if min_age is None else min_age,
+            limit=limit,
+            concurrency=concurrency or reconciler.RECONCILE_CONCURRENCY,
+            rate=rate or reconciler.RECONCILE_RATE
+        )
+        click.echo(
+            f"Checked {summary['checked']} payment(s): {summary['completed']} completed, "
+            f"{summary['failed']} failed, {summary['pending']} still pending."
+        )
+
+    @app.cli.command('collect-rent')
+    @click.option('--date', 'run_date', default=None, help='Treat this YYYY-MM-DD as today (backfills).')
+    @click.option('--limit', default=None, type=int, help='Maximum charges to push in this run.')
+    @click.option('--concurrency', default=None, type=int, help='Parallel STK pushes.')
+    @click.option('--rate', default=None, type=float, help='Maximum STK pushes per second per shortcode.')
+    def collect_rent_command(run_date, limit, concurrency, rate):
+        """Create due rent charges and send their STK pushes (run from cron)."""
+        from datetime import date
+        from app.services import rent_engine
+        summary = rent_engine.collect_rent(
+            today=date.fromisoformat(run_date) if run_date else None,
+            limit=limit,
+            concurrency=concurrency or rent_engine.RENT_CONCURRENCY,
+            rate=rate or rent_engine.RENT_PUSH_RATE
+        )
+        click.echo(
+            f"Materialized {summary['materialized']} charge(s); pushed {summary['claimed']}: "
+            f"{summary['sent']} sent, {summary['retrying']} retrying, {summary['uncertain']} uncertain, "
+            f"{summary['failed']} failed."
+        )
+
+    @app.cli.command('import-statement')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--output', default=None, type=click.Path(dir_okay=False), help='Write every discrepancy to this CSV file.')
+    @click.option('--window-minutes', default=None, type=int, help='Time window for phone/amount matches.')
+    def import_statement_command(path, output, window_minutes):
+        """Match an M-Pesa statement export (CSV/XLSX) against payments."""
+        from app.services import statement_import
+        try:
+            report = statement_import.reconcile_statement(
+                path,
+                window_minutes=statement_import.STATEMENT_MATCH_WINDOW_MINUTES if window_minutes is None else window_minutes,
+                report_path=output
+            )
+        except statement_import.StatementError as e:
+            raise click.ClickException(str(e))
+        click.echo(
+            f"{report['rows']} statement row(s) ({report['skipped']} skipped) from "
+            f"{report['period']['start']} to {report['period']['end']}; matched "
+            f"{report['matched']['receipt']} by receipt, {report['matched']['phone_amount_time']} by phone/amount/time."
+        )
+        for kind, count in report['discrepancies'].items():
+            click.echo(f'  {kind}: {count}')
+        if output:
+            click.echo(f'Discrepancies written to {output}')
+
+    @app.cli.command('rollup-payments')
+    @click.option('--since', default=None, help='Only rebuild days on or after this YYYY-MM-DD (default: all history).')
+    @click.option('--days', default=None, type=int, help='Only rebuild the last N days (nightly catch-up).')
+    def rollup_payments_command(since, days):
+        """Rebuild the daily payment totals used by admin reports."""
+        from datetime import date, timedelta
+        from app.services.payment_rollups import rebuild_payment_daily_totals
+        if days is not None:
+            start = date.today() - timedelta(days=days)
+        else:
+            start = date.fromisoformat(since) if since else None
+        written = rebuild_payment_daily_totals(since=start)
+        click.echo(f"Rebuilt {written} daily total row(s) since {start.isoformat() if start else 'the beginning'}.")
+
+    @app.cli.command('rollup-metrics')
+    @click.option('--since', default=None, help='Only rebuild days on or after this YYYY-MM-DD (default: all history).')
+    @click.option('--days', default=None, type=int, help='Only rebuild the last N days (nightly catch-up).')
+    def rollup_metrics_command(since, days):
+        """Rebuild the daily signup / listing / application counts used by report charts."""
+        from datetime import date, timedelta
+        from app.services.timeseries import rebuild_metric_rollups
+        if days is not None:
+            start = date.today() - timedelta(days=days)
+        else:
+            start = date.fromisoformat(since) if since else None
+        written = rebuild_metric_rollups(since=start)
+        click.echo(f"Rebuilt {written} daily metric row(s) since {start.isoformat() if start else 'the beginning'}.")
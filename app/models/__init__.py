@@ -8,5 +8,12 @@ from .enquiry import Enquiry
 from .setting import Setting
 from .property_like import PropertyLike
 from .tenant_application import TenantApplication
+from .upload_session import UploadSession
+from .background_job import BackgroundJob
+from .mpesa_callback import MpesaCallback
+from .rent_schedule import RentSchedule, RentCharge
+from .payment_daily_total import PaymentDailyTotal
+from .metric_daily_rollup import MetricDailyRollup
+from .idempotency_record import IdempotencyRecord
 
-__all__ = ['User', 'Property', 'Payment', 'Document', 'Identity', 'Enquiry', 'Setting', 'PropertyLike', 'TenantApplication']
+__all__ = ['User', 'Property', 'Payment', 'Document', 'Identity', 'Enquiry', 'Setting', 'PropertyLike', 'TenantApplication', 'UploadSession', 'BackgroundJob', 'MpesaCallback', 'RentSchedule', 'RentCharge', 'PaymentDailyTotal', 'MetricDailyRollup', 'IdempotencyRecord']
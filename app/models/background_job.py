@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from app import db
+
+class BackgroundJob(db.Model):
+    """Outbox row for work done after the request commits (emails, SMS...).
+
+    Jobs are inserted in the same transaction as the change that triggers
+    them, so a notification is never lost nor sent for a rolled-back change.
+    """
+    __tablename__ = 'background_jobs'
+    __table_args__ = (
+        db.Index('ix_background_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, default=dict)
+
+    # Status: pending, running, succeeded, failed
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    last_error = db.Column(db.Text, nullable=True)
+
+    # Timestamps
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    def succeed(self):
+        """Mark job as done"""
+        self.status = 'succeeded'
+        self.completed_at = datetime.utcnow()
+        self.locked_at = None
+
+    def retry_later(self, error, backoff_seconds):
+        """Record a failed attempt; schedule a retry or give up after max_attempts"""
+        self.last_error = str(error)[:2000]
+        self.locked_at = None
+        if self.attempts >= self.max_attempts:
+            self.status = 'failed'
+            self.completed_at = datetime.utcnow()
+        else:
+            self.status = 'pending'
+            self.run_at = datetime.utcnow() + timedelta(seconds=backoff_seconds)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'payload': self.payload,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'last_error': self.last_error,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+        }
+
+    def __repr__(self):
+        return f'<BackgroundJob {self.id} {self.job_type} {self.status}>'
@@ -3,6 +3,10 @@ from app import db
 
 class Document(db.Model):
     __tablename__ = 'documents'
+    __table_args__ = (
+        # KYC queues: a user's documents by status / type
+        db.Index('ix_documents_user_status_type', 'user_id', 'status', 'document_type'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
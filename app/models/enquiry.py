@@ -3,9 +3,14 @@ from datetime import datetime
 
 class Enquiry(db.Model):
     __tablename__ = 'enquiries'
+    __table_args__ = (
+        # Inbox listings, newest first (keyset on created_at, id): per property and per status
+        db.Index('ix_enquiries_property_created_at', 'property_id', 'created_at'),
+        db.Index('ix_enquiries_status_created_at', 'status', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True) # Could be from anonymous
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True) # Could be from anonymous
     property_id = db.Column(db.Integer, db.ForeignKey('properties.id'), nullable=False)
     
     # In case of non-registered users enquiring
@@ -27,7 +32,7 @@ class Enquiry(db.Model):
         if self.user:
             user_data = {
                 'id': self.user.id,
-                'name': self.user.name or f"{self.user.firstName} {self.user.lastName}",
+                'name': self.user.name or self.user.email,
                 'email': self.user.email,
                 'phone': self.user.phone
             }
@@ -44,7 +49,7 @@ class Enquiry(db.Model):
             'property': {
                 'id': self.property.id,
                 'title': self.property.title,
-                'location': self.property.location or self.property.city,
+                'location': self.property.city,
                 'landlord': {
                     'id': self.property.landlord.id if self.property.landlord else None,
                     'name': self.property.landlord.name if self.property.landlord else 'Unknown'
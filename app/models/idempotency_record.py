@@ -0,0 +1,46 @@
+from datetime import datetime
+from app import db
+
+class IdempotencyRecord(db.Model):
+    """A client's Idempotency-Key and the response it produced.
+
+    The (user_id, key) pair is unique, so when a timed-out request is
+    retried the second attempt finds the first one's row instead of
+    re-running uploads and inserts. A row is `in_progress` while the
+    original request runs and `completed` once its response is stored.
+    Rows are reusable after `expires_at` and removed by
+    `flask purge-idempotency-keys`.
+    """
+    __tablename__ = 'idempotency_records'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_records_user_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    endpoint = db.Column(db.String(100), nullable=False)
+    # SHA-256 of the request (fields and file contents); a reused key must carry the same request
+    request_hash = db.Column(db.String(64), nullable=False)
+
+    # Status: in_progress, completed
+    status = db.Column(db.String(20), nullable=False, default='in_progress')
+    response_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.JSON, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def is_expired(self, now=None):
+        return self.expires_at < (now or datetime.utcnow())
+
+    @classmethod
+    def purge_expired(cls, now=None):
+        """Delete expired rows; returns how many were removed"""
+        deleted = cls.query.filter(cls.expires_at < (now or datetime.utcnow())).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+    def __repr__(self):
+        return f'<IdempotencyRecord {self.user_id}:{self.key} {self.status}>'
@@ -0,0 +1,51 @@
+from datetime import datetime
+from sqlalchemy import event
+from app import db
+from app.models.user import User
+from app.models.property import Property
+from app.models.tenant_application import TenantApplication
+from app.utils.upsert import upsert_increment
+
+
+class MetricDailyRollup(db.Model):
+    """Daily counts of new rows (signups, listings, applications) for report charts.
+
+    Incremented by the insert listeners below in the same flush as the row
+    itself, and rebuilt from the source tables by `flask rollup-metrics`.
+    Payment metrics come from PaymentDailyTotal instead.
+    """
+    __tablename__ = 'metric_daily_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('metric', 'day', name='uq_metric_daily_rollups_metric_day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(50), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def increment(cls, connection, metric, day, amount=1):
+        """Atomic upsert of (metric, day) on the given connection"""
+        upsert_increment(connection, cls.__table__, {'metric': metric, 'day': day}, {'value': amount})
+
+    def __repr__(self):
+        return f'<MetricDailyRollup {self.metric} {self.day} {self.value}>'
+
+
+# Source model -> metric counted when one of its rows is inserted (by created_at day)
+TRACKED_MODELS = {
+    User: 'signups',
+    Property: 'listings',
+    TenantApplication: 'applications',
+}
+
+
+def _count_insert(metric):
+    def after_insert(mapper, connection, target):
+        MetricDailyRollup.increment(connection, metric, (target.created_at or datetime.utcnow()).date())
+    return after_insert
+
+
+for _model, _metric in TRACKED_MODELS.items():
+    event.listen(_model, 'after_insert', _count_insert(_metric))
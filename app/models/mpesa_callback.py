@@ -0,0 +1,50 @@
+import hashlib
+import json
+from datetime import datetime
+from app import db
+
+class MpesaCallback(db.Model):
+    """Ledger of every distinct STK callback Daraja delivered.
+
+    Daraja retries callbacks, so the same CheckoutRequestID can arrive more
+    than once. The (checkout_request_id, payload_hash) pair is unique: a
+    replay of an already-seen result is found with one index lookup, and
+    two concurrent deliveries cannot both be recorded.
+    """
+    __tablename__ = 'mpesa_callbacks'
+    __table_args__ = (
+        db.UniqueConstraint('checkout_request_id', 'payload_hash', name='uq_mpesa_callbacks_checkout_hash'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    checkout_request_id = db.Column(db.String(100), nullable=False)
+    payload_hash = db.Column(db.String(64), nullable=False)
+    result_code = db.Column(db.Integer, nullable=True)
+    payload = db.Column(db.JSON, nullable=False)
+    payment_id = db.Column(db.Integer, db.ForeignKey('payments.id'), nullable=True, index=True)
+
+    # Outcome: applied (changed the payment), ignored (payment already final)
+    outcome = db.Column(db.String(20), nullable=True)
+    duplicate_count = db.Column(db.Integer, nullable=False, default=0)
+
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @staticmethod
+    def hash_payload(callback_data):
+        """Stable SHA-256 of the stkCallback body (key order independent)"""
+        canonical = json.dumps(callback_data, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'checkout_request_id': self.checkout_request_id,
+            'result_code': self.result_code,
+            'payment_id': self.payment_id,
+            'outcome': self.outcome,
+            'duplicate_count': self.duplicate_count,
+            'received_at': self.received_at.isoformat() if self.received_at else None,
+        }
+
+    def __repr__(self):
+        return f'<MpesaCallback {self.checkout_request_id} {self.outcome}>'
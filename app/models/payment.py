@@ -1,8 +1,16 @@
 from datetime import datetime
 from app import db
+from app.models.payment_daily_total import PaymentDailyTotal
 
 class Payment(db.Model):
     __tablename__ = 'payments'
+    __table_args__ = (
+        # Reconciler scans for payments stuck in processing the longest
+        db.Index('ix_payments_status_updated_at', 'status', 'updated_at'),
+        # Admin list: keyset paging and date ranges on (created_at, id).
+        # Search uses pg_trgm GIN indexes created by migration b8e4f1a2c957 (Postgres only)
+        db.Index('ix_payments_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -42,15 +50,67 @@ class Payment(db.Model):
     
     def complete(self, receipt_number):
         """Mark payment as completed"""
+        previous = self.status
         self.status = 'completed'
         self.mpesa_receipt_number = receipt_number
         self.completed_at = datetime.utcnow()
+        if previous != 'completed':
+            PaymentDailyTotal.record(self.completed_at.date(), self.payment_type, 'completed', self.amount)
     
     def fail(self, reason):
         """Mark payment as failed"""
+        previous = self.status
         self.status = 'failed'
         self.failure_reason = reason
         self.failed_at = datetime.utcnow()
+        if previous != 'failed':
+            PaymentDailyTotal.record(self.failed_at.date(), self.payment_type, 'failed', self.amount)
+    
+    # Statuses a callback may still move to completed / failed
+    OPEN_STATUSES = ('pending', 'processing')
+    
+    @classmethod
+    def mark_completed_if_open(cls, payment_id, receipt_number):
+        """Complete the payment with a conditional UPDATE.
+        
+        Returns True only for the caller that actually moved it out of an
+        open status, so replays and races never complete it twice.
+        """
+        now = datetime.utcnow()
+        updated = cls.query.filter(
+            cls.id == payment_id,
+            cls.status.in_(cls.OPEN_STATUSES)
+        ).update({
+            'status': 'completed',
+            'mpesa_receipt_number': receipt_number,
+            'completed_at': now,
+            'updated_at': now
+        }, synchronize_session=False)
+        if updated:
+            cls._record_daily_total(payment_id, now, 'completed')
+        return updated == 1
+    
+    @classmethod
+    def mark_failed_if_open(cls, payment_id, reason):
+        """Fail the payment with a conditional UPDATE (see mark_completed_if_open)"""
+        now = datetime.utcnow()
+        updated = cls.query.filter(
+            cls.id == payment_id,
+            cls.status.in_(cls.OPEN_STATUSES)
+        ).update({
+            'status': 'failed',
+            'failure_reason': reason,
+            'failed_at': now,
+            'updated_at': now
+        }, synchronize_session=False)
+        if updated:
+            cls._record_daily_total(payment_id, now, 'failed')
+        return updated == 1
+    
+    @classmethod
+    def _record_daily_total(cls, payment_id, settled_at, status):
+        payment_type, amount = db.session.query(cls.payment_type, cls.amount).filter(cls.id == payment_id).one()
+        PaymentDailyTotal.record(settled_at.date(), payment_type, status, amount)
     
     def process(self):
         """Mark payment as processing"""
@@ -0,0 +1,50 @@
+from datetime import datetime
+from app import db
+from app.utils.upsert import upsert_increment
+
+
+class PaymentDailyTotal(db.Model):
+    """Settled payments per (day, payment_type, status) for admin reports.
+
+    Kept current by Payment as payments complete or fail, inside the same
+    transaction as the status change, and rebuilt from the payments table
+    by `flask rollup-payments`. `day` is the UTC date of completed_at /
+    failed_at.
+    """
+    __tablename__ = 'payment_daily_totals'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'payment_type', 'status', name='uq_payment_daily_totals_day_type_status'),
+    )
+
+    # Statuses that are rolled up; pending / processing payments are not settled yet
+    STATUSES = ('completed', 'failed')
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    payment_type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    payment_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @classmethod
+    def record(cls, day, payment_type, status, amount, count=1):
+        """Add settled payments to a day's totals in one atomic upsert (caller commits)"""
+        upsert_increment(
+            db.session.connection(), cls.__table__,
+            {'day': day, 'payment_type': payment_type, 'status': status},
+            {'payment_count': count, 'total_amount': amount},
+            {'updated_at': datetime.utcnow()}
+        )
+
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat(),
+            'payment_type': self.payment_type,
+            'status': self.status,
+            'count': self.payment_count,
+            'amount': float(self.total_amount),
+        }
+
+    def __repr__(self):
+        return f'<PaymentDailyTotal {self.day} {self.payment_type} {self.status}>'
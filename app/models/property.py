@@ -120,6 +120,24 @@ class Property(db.Model):
         self.partnership_fee_paid_at = datetime.utcnow()
         self.status = 'pending_review'
     
+    def allocate_unit(self, unit_type):
+        """Take one vacancy of `unit_type`; marks the property rented once none remain.
+
+        Raises ValueError if the type is unknown or full. Callers that can
+        race (application approval) must hold a row lock on the property.
+        """
+        units = [dict(unit) for unit in self.units or []]
+        unit = next((u for u in units if u.get('type') == unit_type), None)
+        if unit is None:
+            raise ValueError(f'Unit type "{unit_type}" not found on this property')
+        if unit.get('vacantCount', 0) <= 0:
+            raise ValueError(f'No vacant units of type "{unit_type}" remaining')
+
+        unit['vacantCount'] = unit.get('vacantCount', 0) - 1
+        self.units = units
+        if all(u.get('vacantCount', 0) <= 0 for u in units):
+            self.status = 'rented'
+
     def increment_views(self):
         """Increment view counter"""
         self.view_count += 1
@@ -0,0 +1,123 @@
+import calendar
+from datetime import datetime, date
+from app import db
+
+
+def add_month(day, day_of_month):
+    """Same day_of_month in the month after `day` (clamped to the month's length)"""
+    year, month = (day.year + 1, 1) if day.month == 12 else (day.year, day.month + 1)
+    return date(year, month, min(day_of_month, calendar.monthrange(year, month)[1]))
+
+
+def first_due_date(start, day_of_month):
+    """First date on or after `start` that falls on day_of_month"""
+    due = date(start.year, start.month, min(day_of_month, calendar.monthrange(start.year, start.month)[1]))
+    return due if due >= start else add_month(due, day_of_month)
+
+
+class RentSchedule(db.Model):
+    """Monthly rent collected by STK push for an approved TenantApplication"""
+    __tablename__ = 'rent_schedules'
+    __table_args__ = (
+        db.Index('ix_rent_schedules_status_next_due_date', 'status', 'next_due_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    application_id = db.Column(db.Integer, db.ForeignKey('tenant_applications.id'), nullable=False, unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    property_id = db.Column(db.Integer, db.ForeignKey('properties.id'), nullable=False)
+
+    amount = db.Column(db.Numeric(12, 2), nullable=False)
+    phone_number = db.Column(db.String(20), nullable=False)
+    day_of_month = db.Column(db.Integer, nullable=False, default=1)  # 1-28
+    next_due_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=True)
+
+    # Status: active, paused, cancelled
+    status = db.Column(db.String(20), nullable=False, default='active')
+
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    application = db.relationship('TenantApplication', backref=db.backref('rent_schedule', uselist=False))
+    charges = db.relationship('RentCharge', backref='schedule', lazy='dynamic', cascade='all, delete-orphan')
+
+    @property
+    def current_period(self):
+        return self.next_due_date.strftime('%Y-%m')
+
+    def advance(self):
+        """Move to the next month's due date; stop after end_date"""
+        self.next_due_date = add_month(self.next_due_date, self.day_of_month)
+        if self.end_date and self.next_due_date > self.end_date:
+            self.status = 'cancelled'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'application_id': self.application_id,
+            'user_id': self.user_id,
+            'property_id': self.property_id,
+            'amount': float(self.amount),
+            'phone_number': self.phone_number,
+            'day_of_month': self.day_of_month,
+            'next_due_date': self.next_due_date.isoformat() if self.next_due_date else None,
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+    def __repr__(self):
+        return f'<RentSchedule {self.id} {self.status}>'
+
+
+class RentCharge(db.Model):
+    """One month's rent for a schedule; the checkpoint of the collection engine.
+
+    (schedule_id, period) is unique, so a period is charged at most once
+    however many times the engine runs. Status moves queued -> pushing ->
+    sent. A charge left in pushing by a crashed run becomes `uncertain`
+    (the push may have reached Daraja) and is never retried automatically.
+    """
+    __tablename__ = 'rent_charges'
+    __table_args__ = (
+        db.UniqueConstraint('schedule_id', 'period', name='uq_rent_charges_schedule_period'),
+        db.Index('ix_rent_charges_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    schedule_id = db.Column(db.Integer, db.ForeignKey('rent_schedules.id'), nullable=False)
+    period = db.Column(db.String(7), nullable=False)  # YYYY-MM
+    amount = db.Column(db.Numeric(12, 2), nullable=False)
+    payment_id = db.Column(db.Integer, db.ForeignKey('payments.id'), nullable=True)
+
+    # Status: queued, pushing, sent, uncertain, failed
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    payment = db.relationship('Payment')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'schedule_id': self.schedule_id,
+            'period': self.period,
+            'amount': float(self.amount),
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'payment_id': self.payment_id,
+            'payment_status': self.payment.status if self.payment else None,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    def __repr__(self):
+        return f'<RentCharge {self.schedule_id} {self.period} {self.status}>'
@@ -3,6 +3,10 @@ from datetime import datetime
 
 class TenantApplication(db.Model):
     __tablename__ = 'tenant_applications'
+    __table_args__ = (
+        # Admin queue: status filter, newest first (keyset on created_at, id)
+        db.Index('ix_tenant_applications_status_created_at', 'status', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -17,7 +21,8 @@ class TenantApplication(db.Model):
     # Documents
     id_document_front = db.Column(db.String(500), nullable=False)
     id_document_back = db.Column(db.String(500), nullable=False)
-    signed_agreement_url = db.Column(db.String(500), nullable=False)
+    signed_agreement_url = db.Column(db.String(500), nullable=False, index=True)
+    signed_agreement_backup_url = db.Column(db.String(500), nullable=True)  # dual-upload copy
     
     # Legal tracking
     digital_consent = db.Column(db.Boolean, nullable=False, default=False)
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+from app import db
+
+class UploadSession(db.Model):
+    __tablename__ = 'upload_sessions'
+
+    # Opaque token handed to the client (uuid4 hex)
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+
+    # What is being uploaded
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(100), nullable=True)
+    kind = db.Column(db.String(20), nullable=False, default='document')  # image, document
+    folder = db.Column(db.String(100), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_size = db.Column(db.BigInteger, nullable=False, default=0)
+
+    # Status: uploading, completed, consumed (attached to a record), expired
+    status = db.Column(db.String(20), default='uploading', index=True)
+    result_url = db.Column(db.String(500), nullable=True, index=True)
+    backup_url = db.Column(db.String(500), nullable=True)
+    failure_reason = db.Column(db.Text, nullable=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    def touch(self, ttl_seconds):
+        """Push the expiry forward after a chunk arrives"""
+        self.expires_at = datetime.utcnow() + timedelta(seconds=ttl_seconds)
+
+    def complete(self, result_url, backup_url=None):
+        """Mark upload as assembled and handed off to storage"""
+        self.status = 'completed'
+        self.result_url = result_url
+        self.backup_url = backup_url
+        self.completed_at = datetime.utcnow()
+
+    def is_complete(self):
+        return self.status in ('completed', 'consumed')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'content_type': self.content_type,
+            'kind': self.kind,
+            'total_size': self.total_size,
+            'received_size': self.received_size,
+            'status': self.status,
+            'result_url': self.result_url,
+            'backup_url': self.backup_url,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+        }
+
+    def __repr__(self):
+        return f'<UploadSession {self.id}>'
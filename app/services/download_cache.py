@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from flask import current_app
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """Canonical form of a CDN URL used as the cache key.
+
+    Lower-cases scheme and host, drops default ports and fragments and sorts
+    query parameters so equivalent links share one cache entry.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parts.port}'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
+
+
+class CacheEntry:
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+
+    @property
+    def content_type(self):
+        return self.meta.get('content_type') or 'application/octet-stream'
+
+    @property
+    def size(self):
+        return self.meta.get('size')
+
+
+class DownloadCache:
+    """Size-bounded on-disk LRU cache for files fetched from the CDNs.
+
+    Each entry is a `<sha256>.bin` body plus a `<sha256>.json` sidecar with
+    the upstream headers. Recency is tracked through the body's mtime, which
+    is bumped on every hit, so eviction is a directory scan that removes the
+    least recently used bodies until the cache fits in `max_bytes`.
+
+    Entries expire `ttl` seconds after they were stored, however often they
+    are hit: age is the sidecar's mtime, which is written once and never
+    touched again.
+    """
+
+    def __init__(self, directory, max_bytes, ttl):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _paths(self, url):
+        key = hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key)
+        return f'{base}.bin', f'{base}.json'
+
+    def _expired(self, meta_path, now):
+        return now - os.stat(meta_path).st_mtime > self.ttl
+
+    def get(self, url):
+        """Return a fresh CacheEntry for `url`, or None on a miss"""
+        if not self.enabled:
+            return None
+        body_path, meta_path = self._paths(url)
+        try:
+            if self._expired(meta_path, time.time()):
+                self._discard(body_path, meta_path)
+                return None
+            with open(meta_path) as fh:
+                meta = json.load(fh)
+            os.utime(body_path, None)  # mark as most recently used
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(body_path, meta)
+
+    def fill(self, url, response, chunk_size=8192):
+        """Stream an upstream `requests` response to the client while writing it to the cache.
+
+        The body only becomes visible once it has been received in full; an
+        aborted transfer leaves nothing behind.
+        """
+        length = response.headers.get('Content-Length')
+        if not self.enabled or (length and length.isdigit() and int(length) > self.max_bytes):
+            yield from response.iter_content(chunk_size=chunk_size)
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        body_path, meta_path = self._paths(url)
+        tmp_path = f'{body_path}.{os.getpid()}.{uuid.uuid4().hex}.tmp'
+        size = 0
+        complete = False
+        try:
+            with open(tmp_path, 'wb') as out:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    out.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            complete = True
+        finally:
+            if complete and size <= self.max_bytes:
+                self._commit(tmp_path, body_path, meta_path, {
+                    'url': normalize_url(url),
+                    'content_type': response.headers.get('Content-Type'),
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'size': size,
+                    'stored_at': time.time(),
+                })
+                self.evict()
+            else:
+                self._discard(tmp_path)
+
+    def _commit(self, tmp_path, body_path, meta_path, meta):
+        tmp_meta = f'{tmp_path}.json'
+        try:
+            with open(tmp_meta, 'w') as fh:
+                json.dump(meta, fh)
+            os.replace(tmp_path, body_path)
+            os.replace(tmp_meta, meta_path)
+        except OSError:
+            self._discard(tmp_path, tmp_meta)
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        entries = []
+        total = 0
+        now = time.time()
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith('.bin'):
+                continue
+            body_path = os.path.join(self.directory, name)
+            meta_path = body_path[:-4] + '.json'
+            try:
+                stat = os.stat(body_path)
+            except FileNotFoundError:
+                continue
+            try:
+                expired = self._expired(meta_path, now)
+            except FileNotFoundError:
+                expired = False  # sidecar not written yet; left to LRU
+            if expired:
+                self._discard(body_path, meta_path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, body_path, meta_path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, body_path, meta_path in entries:
+            if total <= self.max_bytes:
+                break
+            self._discard(body_path, meta_path)
+            total -= size
+
+    @staticmethod
+    def _discard(*paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def get_download_cache():
+    """Return the download cache configured for the current app"""
+    return DownloadCache(
+        directory=current_app.config['DOWNLOAD_CACHE_DIR'],
+        max_bytes=current_app.config['DOWNLOAD_CACHE_MAX_BYTES'],
+        ttl=current_app.config['DOWNLOAD_CACHE_TTL'],
+    )
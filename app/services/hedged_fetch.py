@@ -0,0 +1,101 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+from app.utils import metrics
+from app.utils.http_client import get_session
+
+# Shared pool for CDN fetches; each hedged download uses at most two threads
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='cdn-fetch')
+
+# Upstream statuses that count as a usable answer
+USABLE_STATUSES = (200, 206, 416)
+
+
+def cdn_label(url):
+    """Short metric label for a CDN URL"""
+    host = urlparse(url).hostname or 'unknown'
+    if 'cloudinary' in host:
+        return 'cloudinary'
+    if 'ucarecdn' in host or 'uploadcare' in host:
+        return 'uploadcare'
+    return host
+
+
+def _timed_get(url, headers, timeout):
+    label = cdn_label(url)
+    started = time.monotonic()
+    try:
+        resp = get_session().get(url, stream=True, timeout=timeout, headers=headers)
+    except Exception:
+        metrics.incr(f'download.cdn.{label}.errors')
+        raise
+    metrics.observe(f'download.cdn.{label}.latency', time.monotonic() - started)
+    if resp.status_code not in USABLE_STATUSES:
+        metrics.incr(f'download.cdn.{label}.errors')
+    return resp
+
+
+def _close_when_done(future):
+    """Release the connection of a response that lost the race"""
+    def _close(f):
+        if not f.cancelled() and f.exception() is None:
+            f.result().close()
+    future.add_done_callback(_close)
+
+
+def hedged_get(primary_url, backup_url=None, headers=None, hedge_after=0.75, timeout=None):
+    """GET `primary_url`, racing `backup_url` if the primary is slow or fails.
+
+    The backup request is started when the primary has not returned headers
+    within `hedge_after` seconds, or immediately when the primary errors or
+    answers with an unusable status. The first usable response wins and the
+    other one is closed.
+
+    Returns (response, url_used). If every attempt fails, the last upstream
+    response is returned with the URL that produced it, or the last
+    exception re-raised.
+    """
+    pending = {_executor.submit(_timed_get, primary_url, headers, timeout): primary_url}
+    backup_started = backup_url is None
+    last_response = last_url = None
+    last_error = None
+
+    while pending:
+        wait_for = None if backup_started else hedge_after
+        done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+        if not done:
+            # Primary is slow: hedge with the backup
+            metrics.incr('download.hedge.fired')
+            pending[_executor.submit(_timed_get, backup_url, headers, timeout)] = backup_url
+            backup_started = True
+            continue
+
+        for future in done:
+            url = pending.pop(future)
+            try:
+                resp = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+
+            if resp.status_code in USABLE_STATUSES:
+                for loser in pending:
+                    _close_when_done(loser)
+                if url != primary_url:
+                    metrics.incr('download.failover.won_by_backup')
+                return resp, url
+
+            if last_response is not None:
+                last_response.close()
+            last_response, last_url = resp, url
+
+        if not backup_started:
+            # Primary failed outright: fail over without waiting out the budget
+            metrics.incr('download.failover.primary_failed')
+            pending[_executor.submit(_timed_get, backup_url, headers, timeout)] = backup_url
+            backup_started = True
+
+    if last_response is not None:
+        return last_response, last_url
+    raise last_error
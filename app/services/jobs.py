@@ -0,0 +1,137 @@
+"""Database-backed background job queue (transactional outbox).
+
+Request handlers call `enqueue()` before committing, then `kick()` after
+the commit to run the new jobs on a background thread of the same worker.
+`flask run-jobs` drains anything left behind (crashed workers, retries
+that are not due yet) and can run as a standalone worker.
+"""
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models.background_job import BackgroundJob
+from app.utils import metrics
+
+# job_type -> callable(payload); raise to have the job retried
+JOB_HANDLERS = {}
+
+# Retry backoff: JOB_BACKOFF_BASE * 2^(attempt-1) seconds, capped at JOB_BACKOFF_MAX
+JOB_BACKOFF_BASE = int(os.getenv('JOB_BACKOFF_BASE', 30))
+JOB_BACKOFF_MAX = int(os.getenv('JOB_BACKOFF_MAX', 3600))
+
+# A running job whose worker has not reported back after this long is re-queued
+JOB_LOCK_TIMEOUT = int(os.getenv('JOB_LOCK_TIMEOUT', 600))
+
+# One thread per process so kicked jobs never compete with request threads
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='jobs')
+
+
+class JobFailed(Exception):
+    """Raised by handlers when a provider reports failure without raising"""
+    pass
+
+
+def job_handler(job_type):
+    """Register a function as the handler for `job_type`"""
+    def decorator(fn):
+        JOB_HANDLERS[job_type] = fn
+        return fn
+    return decorator
+
+
+def enqueue(job_type, payload, max_attempts=5):
+    """Add a job to the current session; it becomes visible when the caller commits"""
+    job = BackgroundJob(job_type=job_type, payload=payload, max_attempts=max_attempts)
+    db.session.add(job)
+    return job
+
+
+def kick():
+    """Run due jobs on this worker's background thread (call after commit)"""
+    if not current_app.config.get('JOBS_KICK', True):
+        return
+    _executor.submit(_run_in_context, current_app._get_current_object())
+
+
+def _run_in_context(app):
+    with app.app_context():
+        try:
+            run_pending()
+        except Exception as e:
+            app.logger.error(f'Background jobs failed: {str(e)}')
+        finally:
+            db.session.remove()
+
+
+def backoff_seconds(attempts):
+    delay = min(JOB_BACKOFF_BASE * 2 ** max(attempts - 1, 0), JOB_BACKOFF_MAX)
+    return delay * random.uniform(1.0, 1.25)  # jitter so retries don't line up
+
+
+def _claim_due_jobs(limit):
+    """Move up to `limit` due jobs to running. Each claim is a conditional
+    UPDATE, so concurrent workers never run the same job twice."""
+    now = datetime.utcnow()
+
+    BackgroundJob.query.filter(
+        BackgroundJob.status == 'running',
+        BackgroundJob.locked_at < now - timedelta(seconds=JOB_LOCK_TIMEOUT)
+    ).update({'status': 'pending', 'locked_at': None}, synchronize_session=False)
+
+    due_ids = [job_id for (job_id,) in db.session.query(BackgroundJob.id).filter(
+        BackgroundJob.status == 'pending',
+        BackgroundJob.run_at <= now
+    ).order_by(BackgroundJob.run_at).limit(limit)]
+
+    claimed = []
+    for job_id in due_ids:
+        updated = BackgroundJob.query.filter_by(id=job_id, status='pending').update({
+            'status': 'running',
+            'locked_at': now,
+            'attempts': BackgroundJob.attempts + 1
+        }, synchronize_session=False)
+        if updated:
+            claimed.append(job_id)
+    db.session.commit()
+    return claimed
+
+
+def run_job(job):
+    """Execute one claimed job and record the outcome"""
+    handler = JOB_HANDLERS.get(job.job_type)
+    try:
+        if handler is None:
+            raise JobFailed(f'No handler registered for {job.job_type}')
+        handler(job.payload or {})
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(BackgroundJob, job.id)
+        job.retry_later(e, backoff_seconds(job.attempts))
+        db.session.commit()
+        metrics.incr(f'jobs.{job.job_type}.{"failed" if job.status == "failed" else "retried"}')
+        current_app.logger.warning(f'Job {job.id} ({job.job_type}) attempt {job.attempts} failed: {str(e)}')
+        return False
+
+    job.succeed()
+    db.session.commit()
+    metrics.incr(f'jobs.{job.job_type}.succeeded')
+    return True
+
+
+def run_pending(limit=50):
+    """Claim and run due jobs until none are left. Returns (succeeded, failed)."""
+    from app.services import notifications  # noqa: F401 - registers handlers
+
+    succeeded = failed = 0
+    while True:
+        claimed = _claim_due_jobs(limit)
+        if not claimed:
+            return succeeded, failed
+        for job_id in claimed:
+            job = db.session.get(BackgroundJob, job_id)
+            if run_job(job):
+                succeeded += 1
+            else:
+                failed += 1
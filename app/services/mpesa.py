@@ -1,9 +1,26 @@
-import requests
 import base64
+import hashlib
+import requests
 import json
+import time
 from datetime import datetime
 from flask import current_app
+from app.utils import metrics, http_client
+from app.utils.cache import get_cache
 import os
+from urllib3.exceptions import NewConnectionError
+
+# Refresh cached OAuth tokens this many seconds before Daraja expires them
+TOKEN_REFRESH_MARGIN = int(os.getenv('MPESA_TOKEN_REFRESH_MARGIN', 300))
+
+# Longest a worker waits for another one to finish fetching a token
+TOKEN_LOCK_TIMEOUT = 10
+
+def _never_sent(error):
+    """True if a requests error happened before the request left this host"""
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.exceptions.ConnectionError) and isinstance(reason, NewConnectionError)
+
 
 class MpesaService:
     """M-Pesa Daraja API Service"""
@@ -15,15 +32,20 @@ class MpesaService:
         self.shortcode = os.getenv('MPESA_SHORTCODE', '174379')  # Test shortcode
         self.env = os.getenv('MPESA_ENV', 'sandbox')
         
-        # Base URLs
-        # Base URLs (Kenyan M-Pesa API)
-        if self.env == 'production':
+        # Base URLs (Kenyan M-Pesa API); MPESA_BASE_URL points at a local simulator
+        if os.getenv('MPESA_BASE_URL'):
+            self.base_url = os.getenv('MPESA_BASE_URL').rstrip('/')
+        elif self.env == 'production':
             self.base_url = 'https://api.safaricom.co.ke'
         else:
             self.base_url = 'https://sandbox.safaricom.co.ke'
     
-    def get_access_token(self):
-        """Get M-Pesa access token"""
+    def _token_cache_key(self):
+        consumer = hashlib.sha256(f'{self.base_url}|{self.consumer_key}'.encode()).hexdigest()[:16]
+        return f'mpesa:token:{self.env}:{consumer}'
+    
+    def _request_access_token(self):
+        """Fetch a fresh token from Daraja. Returns (token, expires_in) or (None, None)"""
         try:
             url = f'{self.base_url}/oauth/v1/generate?grant_type=client_credentials'
             
@@ -35,17 +57,65 @@ class MpesaService:
                 'Authorization': f'Basic {credentials}'
             }
             
-            response = requests.get(url, headers=headers, timeout=30)
+            response = http_client.get(url, headers=headers)
             
             if response.status_code == 200:
-                return response.json().get('access_token')
+                data = response.json()
+                return data.get('access_token'), int(data.get('expires_in') or 3599)
             else:
                 current_app.logger.error(f'M-Pesa token error: {response.status_code} - {response.text}')
-                return None
+                return None, None
                 
         except Exception as e:
             current_app.logger.error(f'M-Pesa token exception: {str(e)}')
-            return None
+            return None, None
+    
+    def _refresh_access_token(self, cache, key):
+        token, expires_in = self._request_access_token()
+        if token:
+            cache.set(key, {'token': token, 'expires_at': time.time() + expires_in}, ttl=expires_in)
+        return token
+    
+    def get_access_token(self):
+        """Get M-Pesa access token.
+        
+        Tokens are cached (Redis, or per worker without REDIS_URL) and
+        refreshed TOKEN_REFRESH_MARGIN seconds before they expire. Only one
+        caller refreshes at a time; the rest keep using the current token or
+        wait for the refreshed one.
+        """
+        cache = get_cache()
+        key = self._token_cache_key()
+        cached = cache.get(key)
+        now = time.time()
+        
+        if cached and cached['expires_at'] - now > TOKEN_REFRESH_MARGIN:
+            metrics.incr('mpesa.token.hit')
+            return cached['token']
+        
+        if cached and cached['expires_at'] > now:
+            # Still valid but close to expiry: refresh once, don't block anyone
+            with cache.lock(key, blocking=False) as acquired:
+                if acquired:
+                    metrics.incr('mpesa.token.refresh')
+                    token = self._refresh_access_token(cache, key)
+                    if token:
+                        return token
+            metrics.incr('mpesa.token.hit')
+            return cached['token']
+        
+        with cache.lock(key, timeout=TOKEN_LOCK_TIMEOUT):
+            # Another worker may have fetched it while we waited for the lock
+            cached = cache.get(key)
+            if cached and cached['expires_at'] > time.time():
+                metrics.incr('mpesa.token.hit')
+                return cached['token']
+            metrics.incr('mpesa.token.miss')
+            return self._refresh_access_token(cache, key)
+    
+    def invalidate_access_token(self):
+        """Drop the cached token (e.g. after Daraja rejects it)"""
+        get_cache().delete(self._token_cache_key())
     
     def generate_password(self, timestamp):
         """Generate M-Pesa password"""
@@ -80,7 +150,7 @@ class MpesaService:
             access_token = self.get_access_token()
             
             if not access_token:
-                return {'success': False, 'error': 'Failed to get access token'}
+                return {'success': False, 'error': 'Failed to get access token', 'retryable': True}
             
             # Generate timestamp
             timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
@@ -113,7 +183,7 @@ class MpesaService:
                 'TransactionDesc': str(transaction_desc)[:12]  # Max 12 chars
             }
             
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            response = http_client.post(url, json=payload, headers=headers)
             
             if response.status_code == 200:
                 result = response.json()
@@ -131,9 +201,25 @@ class MpesaService:
                         'error': result.get('ResponseDescription', 'Unknown error')
                     }
             else:
+                if response.status_code == 401:
+                    self.invalidate_access_token()
                 current_app.logger.error(f'M-Pesa STK push error: {response.text}')
-                return {'success': False, 'error': 'Failed to initiate payment'}
+                # Throttling / "system busy" answers mean the push was not started
+                return {
+                    'success': False,
+                    'error': 'Failed to initiate payment',
+                    'retryable': response.status_code in (401, 429) or response.status_code >= 500
+                }
                 
+        except requests.exceptions.ConnectTimeout as e:
+            current_app.logger.error(f'M-Pesa STK push exception: {str(e)}')
+            return {'success': False, 'error': str(e), 'retryable': True}
+        except requests.exceptions.RequestException as e:
+            # The request may have reached Daraja (e.g. read timeout): the
+            # customer could still get the prompt, so it must not be re-sent blindly
+            current_app.logger.error(f'M-Pesa STK push exception: {str(e)}')
+            never_sent = _never_sent(e)
+            return {'success': False, 'error': str(e), 'retryable': never_sent, 'uncertain': not never_sent}
         except Exception as e:
             current_app.logger.error(f'M-Pesa STK push exception: {str(e)}')
             return {'success': False, 'error': str(e)}
@@ -163,11 +249,13 @@ class MpesaService:
                 'CheckoutRequestID': checkout_request_id
             }
             
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            response = http_client.post(url, json=payload, headers=headers)
             
             if response.status_code == 200:
                 return {'success': True, 'data': response.json()}
             else:
+                if response.status_code == 401:
+                    self.invalidate_access_token()
                 return {'success': False, 'error': 'Failed to query status'}
                 
         except Exception as e:
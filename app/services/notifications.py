@@ -0,0 +1,75 @@
+"""Background job handlers for notifications sent after a request commits"""
+import os
+from flask import current_app
+from app import db
+from app.models.payment import Payment
+from app.models.property import Property
+from app.models.setting import Setting
+from app.services.jobs import job_handler, enqueue, JobFailed
+from app.utils.email import send_payment_notification_email
+from app.utils.sms import send_otp_sms
+
+
+def enqueue_payment_notifications(payment):
+    """Queue the admin email and tenant SMS for a completed payment.
+
+    They are separate jobs so a Twilio failure never re-sends the email
+    (and vice versa) when the job is retried.
+    """
+    enqueue('payment_admin_email', {'payment_id': payment.id})
+    enqueue('payment_sms', {'payment_id': payment.id})
+
+
+def _get_payment(payload):
+    payment = db.session.get(Payment, payload['payment_id'])
+    if not payment:
+        raise JobFailed(f"Payment {payload['payment_id']} not found")
+    return payment
+
+
+@job_handler('payment_admin_email')
+def send_payment_admin_email(payload):
+    payment = _get_payment(payload)
+
+    admin_email_setting = Setting.query.filter_by(key='primary_admin_email').first()
+    if not admin_email_setting or not admin_email_setting.value:
+        return
+
+    # Email is not configured (dev / staging): nothing to retry
+    if not os.environ.get('RESEND_API_KEY'):
+        current_app.logger.info(f'RESEND_API_KEY is not set; skipping payment email for payment {payment.id}')
+        return
+
+    # Link property for context
+    property_title = "N/A"
+    if payment.property_id:
+        prop = db.session.get(Property, payment.property_id)
+        if prop:
+            property_title = prop.title
+
+    sent = send_payment_notification_email(admin_email_setting.value, {
+        'payment_type': payment.payment_type.replace('_', ' ').capitalize(),
+        'amount': str(payment.amount),
+        'tenant_name': payment.user.name if payment.user else 'Unknown',
+        'phone': payment.phone_number,
+        'property_title': property_title,
+        'receipt_number': payment.mpesa_receipt_number
+    })
+    if not sent:
+        raise JobFailed('Payment notification email was not sent')
+
+
+def payment_sms_message(payment):
+    # Payments settled by a status query have no receipt number; leave the Ref out
+    reference = f" Ref: {payment.mpesa_receipt_number}." if payment.mpesa_receipt_number else ''
+    return (f"Payment of KES {payment.amount} for {payment.payment_type.replace('_', ' ')} "
+            f"received successfully.{reference} Thank you!")
+
+
+@job_handler('payment_sms')
+def send_payment_sms(payload):
+    payment = _get_payment(payload)
+
+    sent, detail = send_otp_sms(payment.phone_number, payment_sms_message(payment))
+    if not sent:
+        raise JobFailed(f'Payment SMS was not sent: {detail}')
@@ -0,0 +1,48 @@
+"""Applying recorded M-Pesa STK callbacks (MpesaCallback ledger rows) to payments"""
+from app.models.payment import Payment
+from app.models.mpesa_callback import MpesaCallback
+from app.services.notifications import enqueue_payment_notifications
+
+
+def apply_stk_result(payment, ledger):
+    """Apply a recorded STK callback to its payment (caller commits).
+    
+    Returns True if this callback changed the payment's status.
+    """
+    callback_data = (ledger.payload or {}).get('Body', {}).get('stkCallback', {})
+    
+    if ledger.result_code == 0:
+        # Payment successful
+        callback_metadata = callback_data.get('CallbackMetadata', {}).get('Item', [])
+        receipt_number = None
+        
+        for item in callback_metadata:
+            if item.get('Name') == 'MpesaReceiptNumber':
+                receipt_number = item.get('Value')
+                break
+        
+        applied = Payment.mark_completed_if_open(payment.id, receipt_number)
+        
+        # Notify admin (email) and tenant (SMS) after the commit, off the request thread
+        if applied:
+            enqueue_payment_notifications(payment)
+    else:
+        # Payment failed
+        applied = Payment.mark_failed_if_open(payment.id, callback_data.get('ResultDesc'))
+    
+    ledger.payment_id = payment.id
+    ledger.outcome = 'applied' if applied else 'ignored'
+    return applied
+
+
+def apply_early_callbacks(payment):
+    """Apply callbacks recorded as unmatched because they arrived before the
+    payment's CheckoutRequestID was committed (caller commits).
+
+    Returns True if any of them changed the payment's status.
+    """
+    early_callbacks = MpesaCallback.query.filter_by(
+        checkout_request_id=payment.mpesa_checkout_request_id,
+        outcome='unmatched'
+    ).order_by(MpesaCallback.received_at).all()
+    return any([apply_stk_result(payment, ledger) for ledger in early_callbacks])
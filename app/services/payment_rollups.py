@@ -0,0 +1,59 @@
+"""Rebuilding PaymentDailyTotal from the payments table.
+
+Payment keeps the rollup current as payments settle; this recomputes it
+for backfills (existing history) and as a catch-up job for anything
+changed outside the model, e.g. a manual SQL fix.
+"""
+from datetime import date, datetime
+from sqlalchemy import func
+from app import db
+from app.models.payment import Payment
+from app.models.payment_daily_total import PaymentDailyTotal
+
+# Status -> the timestamp that decides a payment's day
+SETTLED_AT = {
+    'completed': Payment.completed_at,
+    'failed': Payment.failed_at,
+}
+
+
+def _as_date(value):
+    # SQLite's date() returns 'YYYY-MM-DD' strings
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def rebuild_payment_daily_totals(since=None):
+    """Recompute totals for every day on or after `since` (all history if None).
+
+    Runs as one transaction that replaces the affected rows. Run it at a
+    quiet time: payments settling during the rebuild may be counted in
+    neither or both of the old and new rows. Returns the number of rows written.
+    """
+    deleted = PaymentDailyTotal.query
+    if since:
+        deleted = deleted.filter(PaymentDailyTotal.day >= since)
+    deleted.delete(synchronize_session=False)
+
+    written = 0
+    for status, settled_at in SETTLED_AT.items():
+        day = func.date(settled_at)
+        query = db.session.query(
+            day, Payment.payment_type, func.count(Payment.id), func.coalesce(func.sum(Payment.amount), 0)
+        ).filter(
+            Payment.status == status,
+            settled_at.isnot(None)
+        )
+        if since:
+            query = query.filter(settled_at >= datetime.combine(since, datetime.min.time()))
+
+        rows = [
+            {'day': _as_date(row_day), 'payment_type': payment_type, 'status': status,
+             'payment_count': count, 'total_amount': amount, 'updated_at': datetime.utcnow()}
+            for row_day, payment_type, count, amount in query.group_by(day, Payment.payment_type)
+        ]
+        if rows:
+            db.session.execute(PaymentDailyTotal.__table__.insert(), rows)
+        written += len(rows)
+
+    db.session.commit()
+    return written
@@ -0,0 +1,168 @@
+"""Landlord portfolio: per-property engagement, enquiry and application figures.
+
+Built in one round trip: the landlord's properties outer-joined to
+grouped subqueries over enquiries and applications (each restricted to
+the landlord's properties). Cached per landlord for
+LANDLORD_PORTFOLIO_CACHE_TTL seconds.
+
+The cache entry is dropped after any commit that inserts, updates or
+deletes one of the landlord's properties, enquiries, applications or
+likes. View and contact-click counters are the exception: they change
+on every property page view, so they are left to refresh with the TTL.
+"""
+import os
+from datetime import datetime
+from flask import has_app_context
+from sqlalchemy import case, event, func, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models.enquiry import Enquiry
+from app.models.property import Property
+from app.models.property_like import PropertyLike
+from app.models.tenant_application import TenantApplication
+from app.utils.cache import get_cache
+
+LANDLORD_PORTFOLIO_CACHE_TTL = int(os.getenv('LANDLORD_PORTFOLIO_CACHE_TTL', 300))
+
+# Property columns bumped by anonymous traffic; changing only these does not invalidate
+ENGAGEMENT_COLUMNS = {'view_count', 'whatsapp_clicks', 'call_clicks', 'map_clicks', 'updated_at'}
+
+
+def portfolio_cache_key(landlord_id):
+    return f'landlord_portfolio:{landlord_id}'
+
+
+def _vacancy_summary(units):
+    by_type = {u.get('type'): u.get('vacantCount', 0) for u in units or [] if u.get('type')}
+    return {
+        'vacant_units': sum(by_type.values()),
+        'by_type': by_type,
+        'fully_let': bool(by_type) and all(count <= 0 for count in by_type.values()),
+    }
+
+
+def build_portfolio(landlord_id):
+    """Every figure for the landlord's properties in a single SELECT"""
+    own = db.select(Property.id).where(Property.landlord_id == landlord_id)
+
+    enquiries = db.select(
+        Enquiry.property_id,
+        func.count(Enquiry.id).label('enquiries'),
+        func.count(case((Enquiry.status == 'new', 1))).label('new_enquiries'),
+    ).where(Enquiry.property_id.in_(own)).group_by(Enquiry.property_id).subquery()
+
+    applications = db.select(
+        TenantApplication.property_id,
+        func.count(case((TenantApplication.status == 'pending_approval', 1))).label('pending_applications'),
+        func.count(case((TenantApplication.status == 'approved', 1))).label('approved_applications'),
+    ).where(TenantApplication.property_id.in_(own)).group_by(TenantApplication.property_id).subquery()
+
+    rows = db.session.execute(
+        db.select(
+            Property.id, Property.title, Property.admin_edited_title, Property.status, Property.city,
+            Property.units, Property.view_count, Property.like_count,
+            Property.whatsapp_clicks, Property.call_clicks, Property.map_clicks,
+            func.coalesce(enquiries.c.enquiries, 0).label('enquiries'),
+            func.coalesce(enquiries.c.new_enquiries, 0).label('new_enquiries'),
+            func.coalesce(applications.c.pending_applications, 0).label('pending_applications'),
+            func.coalesce(applications.c.approved_applications, 0).label('approved_applications'),
+        )
+        .outerjoin(enquiries, enquiries.c.property_id == Property.id)
+        .outerjoin(applications, applications.c.property_id == Property.id)
+        .where(Property.landlord_id == landlord_id)
+        .order_by(Property.created_at.desc(), Property.id.desc())
+    ).mappings().all()
+
+    properties = [
+        {
+            'id': row['id'],
+            'title': row['admin_edited_title'] or row['title'],
+            'status': row['status'],
+            'city': row['city'],
+            'views': row['view_count'] or 0,
+            'clicks': {
+                'whatsapp': row['whatsapp_clicks'] or 0,
+                'call': row['call_clicks'] or 0,
+                'map': row['map_clicks'] or 0,
+            },
+            'likes': row['like_count'] or 0,
+            'enquiries': row['enquiries'],
+            'new_enquiries': row['new_enquiries'],
+            'pending_applications': row['pending_applications'],
+            'approved_applications': row['approved_applications'],
+            'vacancy': _vacancy_summary(row['units']),
+        } for row in rows
+    ]
+
+    totals = {
+        field: sum(p[field] for p in properties)
+        for field in ('views', 'likes', 'enquiries', 'new_enquiries', 'pending_applications', 'approved_applications')
+    }
+    totals['clicks'] = sum(sum(p['clicks'].values()) for p in properties)
+    totals['vacant_units'] = sum(p['vacancy']['vacant_units'] for p in properties)
+    totals['properties'] = len(properties)
+
+    return {'properties': properties, 'totals': totals, 'generatedAt': datetime.utcnow().isoformat()}
+
+
+def get_portfolio(landlord_id, fresh=False):
+    """Cached portfolio for the landlord (?fresh=1 rebuilds it)"""
+    cache = get_cache()
+    key = portfolio_cache_key(landlord_id)
+    portfolio = None if fresh else cache.get(key)
+    if portfolio is None:
+        portfolio = build_portfolio(landlord_id)
+        cache.set(key, portfolio, ttl=LANDLORD_PORTFOLIO_CACHE_TTL)
+    return portfolio
+
+
+def invalidate_portfolio(*landlord_ids):
+    cache = get_cache()
+    for landlord_id in landlord_ids:
+        cache.delete(portfolio_cache_key(landlord_id))
+
+
+# --- invalidation ---------------------------------------------------------
+# Affected landlords are collected at flush time and their entries dropped
+# only after the commit, so a concurrent rebuild cannot re-cache the
+# pre-commit figures.
+
+def _affected_landlords(session):
+    landlords, property_ids = set(), set()
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, Property):
+            if obj in session.dirty and obj not in session.deleted:
+                state = inspect(obj)
+                changed = {c.key for c in state.mapper.column_attrs if state.attrs[c.key].history.has_changes()}
+                if not changed - ENGAGEMENT_COLUMNS:
+                    continue
+            landlords.add(obj.landlord_id)
+        elif isinstance(obj, (Enquiry, TenantApplication, PropertyLike)):
+            property_ids.add(obj.property_id)
+
+    property_ids.discard(None)
+    if property_ids:
+        landlords.update(session.execute(
+            db.select(Property.landlord_id).where(Property.id.in_(property_ids))
+        ).scalars())
+    landlords.discard(None)
+    return landlords
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_portfolio_changes(session, flush_context):
+    landlords = _affected_landlords(session)
+    if landlords:
+        session.info.setdefault('portfolio_landlords', set()).update(landlords)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    landlords = session.info.pop('portfolio_landlords', None)
+    if landlords and has_app_context():
+        invalidate_portfolio(*landlords)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_rollback(session):
+    session.info.pop('portfolio_landlords', None)
@@ -0,0 +1,130 @@
+"""Reconcile payments stuck in `processing` whose M-Pesa callback never arrived.
+
+Stale payments are found through the (status, updated_at) index, queried
+against Daraja's STK push query API on a bounded thread pool under a token
+bucket, and the results applied in batched transactions with the same
+conditional updates the callback uses.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models.payment import Payment
+from app.services.mpesa import MpesaService
+from app.services.jobs import kick as kick_jobs
+from app.services.notifications import enqueue_payment_notifications
+from app.utils import metrics
+from app.utils.rate_limit import TokenBucket
+
+# Only payments untouched for this long are queried (the callback may still come)
+RECONCILE_MIN_AGE = int(os.getenv('RECONCILE_MIN_AGE', 300))
+
+# Parallel STK queries and the Daraja query quota (requests per second)
+RECONCILE_CONCURRENCY = int(os.getenv('RECONCILE_CONCURRENCY', 8))
+RECONCILE_RATE = float(os.getenv('RECONCILE_RATE', 5))
+
+# Payments updated per transaction
+RECONCILE_BATCH_SIZE = int(os.getenv('RECONCILE_BATCH_SIZE', 100))
+
+
+def find_stale_payments(min_age=RECONCILE_MIN_AGE, limit=500):
+    """Processing payments with a checkout request, oldest first"""
+    cutoff = datetime.utcnow() - timedelta(seconds=min_age)
+    return db.session.query(Payment.id, Payment.mpesa_checkout_request_id).filter(
+        Payment.status == 'processing',
+        Payment.updated_at < cutoff,
+        Payment.mpesa_checkout_request_id.isnot(None)
+    ).order_by(Payment.updated_at).limit(limit).all()
+
+
+def classify_query_result(result):
+    """Map a query_stk_status() result to (outcome, reason).
+
+    outcome is 'completed', 'failed' or 'pending' (unknown yet / query failed).
+    """
+    if not result.get('success'):
+        return 'pending', result.get('error')
+
+    data = result.get('data') or {}
+    result_code = data.get('ResultCode')
+    if result_code is None:
+        return 'pending', data.get('errorMessage') or data.get('ResponseDescription')
+
+    if str(result_code) == '0':
+        return 'completed', data.get('ResultDesc')
+    return 'failed', data.get('ResultDesc') or f'M-Pesa result code {result_code}'
+
+
+def _query(app, bucket, checkout_request_id):
+    with app.app_context():
+        bucket.acquire()
+        metrics.incr('reconcile.queries')
+        return classify_query_result(MpesaService().query_stk_status(checkout_request_id))
+
+
+def _apply_batch(batch):
+    """Apply one batch of (payment_id, outcome, reason) in a single transaction"""
+    completed = failed = 0
+    for payment_id, outcome, reason in batch:
+        if outcome == 'completed' and Payment.mark_completed_if_open(payment_id, None):
+            enqueue_payment_notifications(db.session.get(Payment, payment_id))
+            completed += 1
+        elif outcome == 'failed' and Payment.mark_failed_if_open(payment_id, reason):
+            failed += 1
+    db.session.commit()
+    return completed, failed
+
+
+def reconcile_payments(min_age=RECONCILE_MIN_AGE, limit=500, concurrency=RECONCILE_CONCURRENCY,
+                       rate=RECONCILE_RATE, batch_size=RECONCILE_BATCH_SIZE):
+    """Query Daraja for stale processing payments and settle the ones it has an answer for.
+
+    Returns a summary dict with checked / completed / failed / pending counts.
+    Payments the query cannot settle yet keep their status and are retried
+    on the next run.
+    """
+    stale = find_stale_payments(min_age=min_age, limit=limit)
+    summary = {'checked': len(stale), 'completed': 0, 'failed': 0, 'pending': 0}
+    if not stale:
+        return summary
+
+    app = current_app._get_current_object()
+    bucket = TokenBucket(rate, capacity=min(concurrency, max(1, rate)))
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='reconcile') as executor:
+        futures = [
+            (payment_id, executor.submit(_query, app, bucket, checkout_request_id))
+            for payment_id, checkout_request_id in stale
+        ]
+
+        batch = []
+        for payment_id, future in futures:
+            try:
+                outcome, reason = future.result()
+            except Exception as e:
+                current_app.logger.error(f'Reconcile query for payment {payment_id} failed: {str(e)}')
+                outcome, reason = 'pending', str(e)
+
+            if outcome == 'pending':
+                summary['pending'] += 1
+                continue
+
+            batch.append((payment_id, outcome, reason))
+            if len(batch) >= batch_size:
+                completed, failed = _apply_batch(batch)
+                summary['completed'] += completed
+                summary['failed'] += failed
+                batch = []
+
+        if batch:
+            completed, failed = _apply_batch(batch)
+            summary['completed'] += completed
+            summary['failed'] += failed
+
+    if summary['completed']:
+        kick_jobs()
+
+    metrics.incr('reconcile.completed', summary['completed'])
+    metrics.incr('reconcile.failed', summary['failed'])
+    return summary
@@ -0,0 +1,245 @@
+"""Batched recurring rent collection.
+
+A run (`flask collect-rent`, from cron) does three things:
+
+1. Materialize: every active RentSchedule that is due gets a RentCharge
+   for the period. (schedule_id, period) is unique, so re-running never
+   creates a second charge for the same month.
+2. Recover: charges a crashed run left in `pushing` become `sent` if their
+   payment already has a CheckoutRequestID, otherwise `uncertain`. The push
+   may have reached Daraja, so an uncertain charge is never re-sent
+   automatically; an admin retries it after checking the statement.
+3. Push: due `queued` charges are claimed with conditional UPDATEs, get a
+   pending Payment (committed before any push), and are pushed on a bounded
+   thread pool under a per-shortcode token bucket. Failures Daraja reports
+   before starting the push are retried with exponential backoff.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.payment import Payment
+from app.models.rent_schedule import RentSchedule, RentCharge
+from app.services.jobs import kick as kick_jobs
+from app.services.mpesa import MpesaService
+from app.services.payment_callbacks import apply_early_callbacks
+from app.utils import metrics
+from app.utils.rate_limit import TokenBucket
+
+# Parallel STK pushes and pushes per second per M-Pesa shortcode
+RENT_CONCURRENCY = int(os.getenv('RENT_CONCURRENCY', 8))
+RENT_PUSH_RATE = float(os.getenv('RENT_PUSH_RATE', 5))
+
+# Retries for pushes Daraja rejected before starting (busy, throttled, token errors)
+RENT_MAX_ATTEMPTS = int(os.getenv('RENT_MAX_ATTEMPTS', 4))
+RENT_BACKOFF_BASE = int(os.getenv('RENT_BACKOFF_BASE', 300))
+
+# A charge in `pushing` for longer than this belongs to a crashed run
+RENT_LOCK_TIMEOUT = int(os.getenv('RENT_LOCK_TIMEOUT', 900))
+
+# Charges claimed (and schedules materialized) per transaction
+RENT_BATCH_SIZE = int(os.getenv('RENT_BATCH_SIZE', 100))
+
+# Token buckets shared by every run in this process, keyed by shortcode
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def shortcode_bucket(shortcode, rate=RENT_PUSH_RATE):
+    with _buckets_lock:
+        bucket = _buckets.get(shortcode)
+        if bucket is None or bucket.rate != rate:
+            bucket = _buckets[shortcode] = TokenBucket(rate)
+        return bucket
+
+
+def materialize_due_charges(today=None, batch_size=RENT_BATCH_SIZE):
+    """Create RentCharges for every due period of active schedules. Returns the count created."""
+    today = today or date.today()
+    created = 0
+    while True:
+        schedules = RentSchedule.query.filter(
+            RentSchedule.status == 'active',
+            RentSchedule.next_due_date <= today
+        ).order_by(RentSchedule.id).limit(batch_size).all()
+        if not schedules:
+            return created
+
+        # One query for the periods already charged in this batch
+        existing = set(db.session.query(RentCharge.schedule_id, RentCharge.period).filter(
+            RentCharge.schedule_id.in_([s.id for s in schedules])
+        ).all())
+
+        for schedule in schedules:
+            while schedule.status == 'active' and schedule.next_due_date <= today:
+                if (schedule.id, schedule.current_period) not in existing:
+                    db.session.add(RentCharge(
+                        schedule_id=schedule.id,
+                        period=schedule.current_period,
+                        amount=schedule.amount
+                    ))
+                    created += 1
+                schedule.advance()
+
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another run materialized the same schedules concurrently
+            db.session.rollback()
+            return created
+
+
+def recover_interrupted_charges(now=None):
+    """Resolve charges a crashed run left in `pushing` (see module docstring)"""
+    now = now or datetime.utcnow()
+    stale = RentCharge.query.filter(
+        RentCharge.status == 'pushing',
+        RentCharge.locked_at < now - timedelta(seconds=RENT_LOCK_TIMEOUT)
+    ).all()
+    for charge in stale:
+        charge.locked_at = None
+        if charge.payment and charge.payment.mpesa_checkout_request_id:
+            charge.status = 'sent'
+        else:
+            charge.status = 'uncertain'
+            charge.last_error = 'Collection run was interrupted while pushing'
+    db.session.commit()
+    return len(stale)
+
+
+def _claim_charges(limit, now):
+    due_ids = [charge_id for (charge_id,) in db.session.query(RentCharge.id).filter(
+        RentCharge.status == 'queued',
+        RentCharge.next_attempt_at <= now
+    ).order_by(RentCharge.next_attempt_at).limit(limit)]
+
+    claimed = []
+    for charge_id in due_ids:
+        updated = RentCharge.query.filter_by(id=charge_id, status='queued').update({
+            'status': 'pushing',
+            'locked_at': now,
+            'attempts': RentCharge.attempts + 1
+        }, synchronize_session=False)
+        if updated:
+            claimed.append(charge_id)
+    db.session.commit()
+    return claimed
+
+
+def _prepare_payment(charge):
+    """Pending Payment for this charge, reused across retries"""
+    if charge.payment and charge.payment.status == 'pending':
+        return charge.payment
+    schedule = charge.schedule
+    payment = Payment(
+        user_id=schedule.user_id,
+        amount=charge.amount,
+        payment_type='rent',
+        property_id=schedule.property_id,
+        phone_number=schedule.phone_number,
+        description=f'Rent {charge.period}',
+        status='pending',
+        extra_data={'rent_charge_id': charge.id, 'rent_schedule_id': schedule.id}
+    )
+    db.session.add(payment)
+    db.session.flush()
+    charge.payment_id = payment.id
+    charge.payment = payment
+    return payment
+
+
+def _push(app, bucket, payment_id, phone_number, amount, description):
+    with app.app_context():
+        bucket.acquire()
+        metrics.incr('rent.pushes')
+        return MpesaService().initiate_stk_push(
+            phone_number=phone_number,
+            amount=amount,
+            account_reference=f'VS{payment_id}',
+            transaction_desc=description
+        )
+
+
+def _apply_push_result(charge, result, now, summary):
+    payment = charge.payment
+    charge.locked_at = None
+
+    if result.get('success'):
+        payment.mpesa_checkout_request_id = result.get('checkout_request_id')
+        payment.process()
+        charge.status = 'sent'
+        charge.last_error = None
+        summary['sent'] += 1
+        return
+
+    charge.last_error = result.get('error')
+    if result.get('uncertain'):
+        charge.status = 'uncertain'
+        summary['uncertain'] += 1
+    elif result.get('retryable') and charge.attempts < RENT_MAX_ATTEMPTS:
+        charge.status = 'queued'
+        charge.next_attempt_at = now + timedelta(seconds=RENT_BACKOFF_BASE * 2 ** (charge.attempts - 1))
+        summary['retrying'] += 1
+    else:
+        charge.status = 'failed'
+        payment.fail(result.get('error', 'Failed to initiate payment'))
+        summary['failed'] += 1
+
+
+def push_due_charges(limit=None, concurrency=RENT_CONCURRENCY, rate=RENT_PUSH_RATE, batch_size=RENT_BATCH_SIZE):
+    """Push queued charges until none are due (or `limit` were claimed)"""
+    app = current_app._get_current_object()
+    bucket = shortcode_bucket(MpesaService().shortcode, rate)
+    summary = {'claimed': 0, 'sent': 0, 'retrying': 0, 'uncertain': 0, 'failed': 0, 'settled_early': 0}
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='rent-push') as executor:
+        while limit is None or summary['claimed'] < limit:
+            now = datetime.utcnow()
+            size = batch_size if limit is None else min(batch_size, limit - summary['claimed'])
+            claimed = _claim_charges(size, now)
+            if not claimed:
+                break
+            summary['claimed'] += len(claimed)
+
+            # Checkpoint: every charge has its payment row before anything is pushed
+            charges = RentCharge.query.filter(RentCharge.id.in_(claimed)).all()
+            pushes = [(charge, _prepare_payment(charge)) for charge in charges]
+            db.session.commit()
+
+            futures = [
+                (charge, executor.submit(
+                    _push, app, bucket, payment.id, payment.phone_number,
+                    charge.amount, f'Rent {charge.period}'
+                ))
+                for charge, payment in pushes
+            ]
+            for charge, future in futures:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'success': False, 'error': str(e), 'uncertain': True}
+                _apply_push_result(charge, result, datetime.utcnow(), summary)
+                # Commit each checkout ID as soon as it is known so its callback can find the payment
+                db.session.commit()
+
+                # Apply a callback that arrived before the checkout ID was saved
+                if charge.status == 'sent' and apply_early_callbacks(charge.payment):
+                    summary['settled_early'] += 1
+                db.session.commit()
+
+    if summary['settled_early']:
+        kick_jobs()
+    return summary
+
+
+def collect_rent(today=None, limit=None, concurrency=RENT_CONCURRENCY, rate=RENT_PUSH_RATE):
+    """Run one full collection cycle. Returns a summary dict."""
+    materialized = materialize_due_charges(today)
+    recovered = recover_interrupted_charges()
+    summary = push_due_charges(limit=limit, concurrency=concurrency, rate=rate)
+    summary.update({'materialized': materialized, 'recovered': recovered})
+    current_app.logger.info(f'Rent collection: {summary}')
+    return summary
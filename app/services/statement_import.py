@@ -0,0 +1,415 @@
+"""Match M-Pesa statement exports against our payments table.
+
+A statement is streamed (CSV with the csv module, XLSX with openpyxl in
+read-only mode) into a scratch SQLite file in chunks, together with the
+payments from the same period. Matching then runs as a handful of
+set-based joins inside SQLite instead of one query per statement row, so
+a 1M-row statement needs a few MB of Python memory and a temp file:
+
+1. Receipt number: statement receipt = Payment.mpesa_receipt_number.
+2. Phone + amount + time window: for rows still unmatched, the closest
+   payment with the same amount and phone (statement phones are often
+   masked, e.g. 254712***678) whose time is within the window. Each
+   payment is matched to at most one row.
+
+Discrepancies reported:
+
+    duplicate              receipt repeated in the statement, or a row whose
+                           only matching payment went to another row
+    amount_mismatch        matched by receipt but the amounts differ
+    status_mismatch        money received but the payment is not completed
+    missing_in_payments    statement row with no payment
+    missing_in_statement   completed payment in the statement period that
+                           the statement does not contain
+"""
+import calendar
+import csv
+import os
+import re
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from app import db
+from app.models.payment import Payment
+
+# Rows inserted (and payments fetched) per batch
+STATEMENT_CHUNK_SIZE = int(os.getenv('STATEMENT_CHUNK_SIZE', 5000))
+
+# Statement times are local (EAT); payments are stored in UTC
+STATEMENT_UTC_OFFSET_HOURS = float(os.getenv('MPESA_STATEMENT_UTC_OFFSET', 3))
+
+# How far apart a statement row and a payment may be for a phone/amount match
+STATEMENT_MATCH_WINDOW_MINUTES = int(os.getenv('STATEMENT_MATCH_WINDOW_MINUTES', 10))
+
+# Discrepancies per kind returned inline; the full list goes to report_path
+STATEMENT_SAMPLE_SIZE = int(os.getenv('STATEMENT_SAMPLE_SIZE', 100))
+
+DISCREPANCY_KINDS = ('duplicate', 'amount_mismatch', 'status_mismatch', 'missing_in_payments', 'missing_in_statement')
+
+# Normalized header -> field, covering the M-Pesa org portal and common exports
+COLUMN_ALIASES = {
+    'receipt': ('receipt no', 'receipt', 'receipt number', 'mpesa receipt', 'transaction id', 'trans id'),
+    'time': ('completion time', 'transaction date', 'trans time', 'date', 'initiation time'),
+    'amount': ('paid in', 'amount', 'credit'),
+    'party': ('other party info', 'phone', 'phone number', 'msisdn', 'sender'),
+    'status': ('transaction status', 'status'),
+}
+
+TIME_FORMATS = ('%Y-%m-%d %H:%M:%S', '%d-%m-%Y %H:%M:%S', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M',
+                '%Y-%m-%dT%H:%M:%S', '%Y%m%d%H%M%S', '%Y-%m-%d %H:%M')
+
+PHONE_PATTERN = re.compile(r'[0-9*xX]{9,}')
+
+SCHEMA = """
+CREATE TABLE statement (line INTEGER PRIMARY KEY, receipt TEXT, phone TEXT, amount INTEGER, ts INTEGER, dup INTEGER DEFAULT 0);
+CREATE TABLE payments (id INTEGER PRIMARY KEY, receipt TEXT, phone TEXT, amount INTEGER, ts INTEGER, status TEXT);
+CREATE INDEX ix_payments_receipt ON payments (receipt);
+CREATE TABLE matches (line INTEGER PRIMARY KEY, payment_id INTEGER, method TEXT);
+CREATE TABLE discrepancies (kind TEXT, line INTEGER, receipt TEXT, payment_id INTEGER,
+                            statement_amount INTEGER, payment_amount INTEGER, detail TEXT);
+"""
+
+
+class StatementError(ValueError):
+    """The file is not a statement we can read"""
+
+
+def _normalize_header(value):
+    return str(value or '').strip().lower().rstrip('.').strip()
+
+
+def _find_columns(row):
+    headers = [_normalize_header(cell) for cell in row]
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in headers:
+                columns[field] = headers.index(alias)
+                break
+    return columns if 'receipt' in columns and 'amount' in columns else None
+
+
+def _phone_key(value):
+    """National 9-digit form; masked digits become LIKE wildcards (_)"""
+    match = PHONE_PATTERN.search(str(value or '').replace(' ', ''))
+    if not match:
+        return None
+    digits = re.sub(r'[*xX]', '_', match.group())
+    if digits.startswith('254'):
+        digits = digits[3:]
+    elif digits.startswith('0'):
+        digits = digits[1:]
+    return digits[-9:]
+
+
+def _cents(value):
+    if value is None or value == '':
+        return None
+    try:
+        amount = Decimal(str(value).replace(',', '').strip())
+    except InvalidOperation:
+        return None
+    return int((amount * 100).to_integral_value())
+
+
+def _epoch(value):
+    return calendar.timegm(value.timetuple())
+
+
+def _statement_ts(value):
+    """Epoch seconds (UTC) of a local statement time"""
+    if isinstance(value, datetime):
+        local = value
+    else:
+        text = str(value or '').strip()
+        for fmt in TIME_FORMATS:
+            try:
+                local = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+    return _epoch(local - timedelta(hours=STATEMENT_UTC_OFFSET_HOURS))
+
+
+def _iter_raw_rows(path, filename):
+    if filename.lower().endswith('.xlsx'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise StatementError('XLSX statements need openpyxl (pip install openpyxl); export as CSV instead')
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield row
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline='', encoding='utf-8-sig', errors='replace') as f:
+            yield from csv.reader(f)
+
+
+def iter_statement_rows(path, filename=None):
+    """Yield (receipt, phone_key, amount_cents, ts) for every completed credit.
+
+    Statement exports start with a preamble (organisation, period, ...);
+    the first row naming a receipt and an amount column is the header.
+    Rows that are not completed money-in transactions yield None.
+    """
+    rows = _iter_raw_rows(path, filename or path)
+    columns = None
+    for scanned, row in enumerate(rows):
+        columns = _find_columns(row)
+        if columns:
+            break
+        if scanned >= 50:
+            break
+    if not columns:
+        raise StatementError('Could not find the statement header (Receipt No. / Paid In columns)')
+
+    width = max(columns.values()) + 1
+    for row in rows:
+        if len(row) < width:
+            yield None
+            continue
+        status = str(row[columns['status']]).strip().lower() if 'status' in columns else 'completed'
+        amount = _cents(row[columns['amount']])
+        if status != 'completed' or not amount or amount <= 0:
+            yield None
+            continue
+        receipt = str(row[columns['receipt']] or '').strip().upper() or None
+        phone = _phone_key(row[columns['party']]) if 'party' in columns else None
+        ts = _statement_ts(row[columns['time']]) if 'time' in columns else None
+        yield receipt, phone, amount, ts
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _payment_row(payment):
+    stamp = payment.completed_at or payment.updated_at or payment.created_at
+    phone = re.sub(r'\D', '', payment.phone_number or '')
+    return (
+        payment.id,
+        (payment.mpesa_receipt_number or '').upper() or None,
+        phone[-9:] or None,
+        int((Decimal(payment.amount) * 100).to_integral_value()),
+        _epoch(stamp) if stamp else None,
+        payment.status
+    )
+
+
+PAYMENT_COLUMNS = (Payment.id, Payment.mpesa_receipt_number, Payment.phone_number, Payment.amount,
+                   Payment.status, Payment.created_at, Payment.updated_at, Payment.completed_at)
+
+
+def _load_statement(scratch, path, filename):
+    loaded = skipped = 0
+    for chunk in _chunks(iter_statement_rows(path, filename), STATEMENT_CHUNK_SIZE):
+        rows = [row for row in chunk if row]
+        skipped += len(chunk) - len(rows)
+        scratch.executemany('INSERT INTO statement (receipt, phone, amount, ts) VALUES (?, ?, ?, ?)', rows)
+        loaded += len(rows)
+    return loaded, skipped
+
+
+def _load_payments(scratch, start_ts, end_ts, window):
+    """Payments created in the statement period, then any others the statement has receipts for"""
+    if start_ts is not None:
+        since = datetime.utcfromtimestamp(start_ts - window) - timedelta(days=1)
+        until = datetime.utcfromtimestamp(end_ts + window)
+        period = db.session.query(*PAYMENT_COLUMNS).filter(
+            Payment.created_at >= since,
+            Payment.created_at <= until
+        ).yield_per(STATEMENT_CHUNK_SIZE)
+        for chunk in _chunks(period, STATEMENT_CHUNK_SIZE):
+            scratch.executemany('INSERT OR IGNORE INTO payments VALUES (?, ?, ?, ?, ?, ?)',
+                                [_payment_row(p) for p in chunk])
+
+    # Receipts not in the period (late or back-dated payments), fetched in IN batches
+    scratch.execute("""
+        CREATE TABLE unseen_receipts AS
+        SELECT DISTINCT s.receipt FROM statement s
+        WHERE s.receipt IS NOT NULL AND NOT EXISTS (SELECT 1 FROM payments p WHERE p.receipt = s.receipt)
+    """)
+    unseen = scratch.execute('SELECT receipt FROM unseen_receipts')
+    for chunk in _chunks((receipt for (receipt,) in unseen), 900):
+        found = db.session.query(*PAYMENT_COLUMNS).filter(Payment.mpesa_receipt_number.in_(chunk)).all()
+        scratch.executemany('INSERT OR IGNORE INTO payments VALUES (?, ?, ?, ?, ?, ?)',
+                            [_payment_row(p) for p in found])
+
+
+def _match(scratch, window):
+    scratch.executescript("""
+        CREATE INDEX ix_payments_amount_ts ON payments (amount, ts);
+        CREATE INDEX ix_matches_payment ON matches (payment_id);
+
+        UPDATE statement SET dup = 1 WHERE line IN (
+            SELECT line FROM (
+                SELECT line, ROW_NUMBER() OVER (PARTITION BY receipt ORDER BY line) AS rn
+                FROM statement WHERE receipt IS NOT NULL
+            ) WHERE rn > 1
+        );
+
+        INSERT INTO matches (line, payment_id, method)
+        SELECT s.line, p.id, 'receipt'
+        FROM statement s JOIN payments p ON p.receipt = s.receipt
+        WHERE s.dup = 0;
+    """)
+
+    # Rows without a receipt match fall back to phone + amount + nearest time.
+    # Assignment is one-to-one: each round takes the pairs that are each
+    # other's nearest candidate, until a round adds nothing, so two identical
+    # rows take two identical payments instead of both claiming the first.
+    scratch.execute("""
+        CREATE TABLE candidates AS
+        SELECT s.line, p.id AS payment_id, ABS(p.ts - s.ts) AS distance
+        FROM statement s
+        JOIN payments p ON p.amount = s.amount AND p.ts BETWEEN s.ts - :window AND s.ts + :window
+        WHERE s.dup = 0 AND s.ts IS NOT NULL
+          AND p.receipt IS NULL
+          AND (s.phone IS NULL OR p.phone LIKE s.phone)
+          AND NOT EXISTS (SELECT 1 FROM matches m WHERE m.line = s.line)
+          AND NOT EXISTS (SELECT 1 FROM matches m WHERE m.payment_id = p.id)
+    """, {'window': window})
+    scratch.executescript("""
+        CREATE INDEX ix_candidates_line ON candidates (line);
+        CREATE INDEX ix_candidates_payment ON candidates (payment_id);
+    """)
+    while True:
+        added = scratch.execute("""
+            INSERT INTO matches (line, payment_id, method)
+            SELECT line, payment_id, 'phone_amount_time' FROM (
+                SELECT c.line, c.payment_id,
+                       ROW_NUMBER() OVER (PARTITION BY c.line ORDER BY c.distance, c.payment_id) AS line_rank,
+                       ROW_NUMBER() OVER (PARTITION BY c.payment_id ORDER BY c.distance, c.line) AS payment_rank
+                FROM candidates c
+                WHERE NOT EXISTS (SELECT 1 FROM matches m WHERE m.line = c.line)
+                  AND NOT EXISTS (SELECT 1 FROM matches m WHERE m.payment_id = c.payment_id)
+            ) WHERE line_rank = 1 AND payment_rank = 1
+        """).rowcount
+        if not added:
+            break
+
+    # Rows left over whose only candidates were taken by other rows are duplicates
+    scratch.execute("""
+        UPDATE statement SET dup = 2 WHERE line IN (SELECT line FROM candidates)
+          AND NOT EXISTS (SELECT 1 FROM matches m WHERE m.line = statement.line)
+    """)
+
+
+def _collect_discrepancies(scratch, start_ts, end_ts):
+    scratch.executescript("""
+        INSERT INTO discrepancies
+        SELECT 'duplicate', s.line, s.receipt, NULL, s.amount, NULL,
+               CASE s.dup WHEN 1 THEN 'receipt appears more than once in the statement'
+                          ELSE 'matches the same payment as another row' END
+        FROM statement s WHERE s.dup > 0;
+
+        INSERT INTO discrepancies
+        SELECT 'amount_mismatch', s.line, s.receipt, p.id, s.amount, p.amount, 'statement and payment amounts differ'
+        FROM matches m JOIN statement s ON s.line = m.line JOIN payments p ON p.id = m.payment_id
+        WHERE s.amount != p.amount;
+
+        INSERT INTO discrepancies
+        SELECT 'status_mismatch', s.line, s.receipt, p.id, s.amount, p.amount,
+               'money received but payment is ' || p.status
+        FROM matches m JOIN statement s ON s.line = m.line JOIN payments p ON p.id = m.payment_id
+        WHERE p.status != 'completed';
+
+        INSERT INTO discrepancies
+        SELECT 'missing_in_payments', s.line, s.receipt, NULL, s.amount, NULL, 'no matching payment'
+        FROM statement s
+        WHERE s.dup = 0 AND NOT EXISTS (SELECT 1 FROM matches m WHERE m.line = s.line);
+    """)
+    if start_ts is not None:
+        scratch.execute("""
+            INSERT INTO discrepancies
+            SELECT 'missing_in_statement', NULL, p.receipt, p.id, NULL, p.amount, 'completed payment not on the statement'
+            FROM payments p
+            WHERE p.status = 'completed' AND p.ts BETWEEN :start AND :end
+              AND NOT EXISTS (SELECT 1 FROM matches m WHERE m.payment_id = p.id)
+        """, {'start': start_ts, 'end': end_ts})
+
+
+def _discrepancy_dict(row):
+    kind, line, receipt, payment_id, statement_amount, payment_amount, detail = row
+    return {
+        'kind': kind,
+        'line': line,
+        'receipt': receipt,
+        'payment_id': payment_id,
+        'statement_amount': statement_amount / 100 if statement_amount is not None else None,
+        'payment_amount': payment_amount / 100 if payment_amount is not None else None,
+        'detail': detail,
+    }
+
+
+def _write_report(scratch, report_path):
+    with open(report_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['kind', 'statement_row', 'receipt', 'payment_id', 'statement_amount', 'payment_amount', 'detail'])
+        for row in scratch.execute('SELECT * FROM discrepancies ORDER BY kind, line, payment_id'):
+            item = _discrepancy_dict(row)
+            writer.writerow([item['kind'], item['line'], item['receipt'], item['payment_id'],
+                             item['statement_amount'], item['payment_amount'], item['detail']])
+
+
+def reconcile_statement(path, filename=None, window_minutes=STATEMENT_MATCH_WINDOW_MINUTES,
+                        report_path=None, sample_size=STATEMENT_SAMPLE_SIZE):
+    """Match a statement file against payments and return the discrepancy report.
+
+    The report holds counts and up to `sample_size` discrepancies per kind;
+    pass `report_path` to also write every discrepancy to a CSV file.
+    """
+    window = int(window_minutes * 60)
+    with tempfile.TemporaryDirectory(prefix='vs_statement_') as workdir:
+        scratch = sqlite3.connect(os.path.join(workdir, 'statement.db'))
+        try:
+            # Throwaway database: no journal, no fsync, a bounded page cache
+            scratch.executescript('PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF; PRAGMA cache_size = -20000;')
+            scratch.executescript(SCHEMA)
+
+            rows, skipped = _load_statement(scratch, path, filename)
+            scratch.execute('CREATE INDEX ix_statement_receipt ON statement (receipt)')
+            start_ts, end_ts = scratch.execute('SELECT MIN(ts), MAX(ts) FROM statement').fetchone()
+            _load_payments(scratch, start_ts, end_ts, window)
+            _match(scratch, window)
+            _collect_discrepancies(scratch, start_ts, end_ts)
+            scratch.commit()
+
+            matched = dict(scratch.execute('SELECT method, COUNT(*) FROM matches GROUP BY method').fetchall())
+            counts = dict(scratch.execute('SELECT kind, COUNT(*) FROM discrepancies GROUP BY kind').fetchall())
+            samples = {
+                kind: [_discrepancy_dict(row) for row in scratch.execute(
+                    'SELECT * FROM discrepancies WHERE kind = ? ORDER BY line, payment_id LIMIT ?', (kind, sample_size)
+                )]
+                for kind in DISCREPANCY_KINDS if counts.get(kind)
+            }
+            if report_path:
+                _write_report(scratch, report_path)
+        finally:
+            scratch.close()
+
+    as_iso = lambda ts: datetime.utcfromtimestamp(ts).isoformat() if ts is not None else None
+    return {
+        'rows': rows,
+        'skipped': skipped,
+        'period': {'start': as_iso(start_ts), 'end': as_iso(end_ts)},
+        'matched': {
+            'receipt': matched.get('receipt', 0),
+            'phone_amount_time': matched.get('phone_amount_time', 0),
+        },
+        'discrepancies': {kind: counts.get(kind, 0) for kind in DISCREPANCY_KINDS},
+        'samples': samples,
+    }
@@ -0,0 +1,239 @@
+import os
+import re
+import shutil
+import time
+import uuid
+from abc import ABC, abstractmethod
+from urllib.parse import urlparse
+from flask import current_app, url_for
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+
+LOCAL_FILES_ROUTE = '/api/files/'
+
+# https://res.cloudinary.com/<cloud>/<resource_type>/upload/[<transformations>/][v<version>/]<public_id>
+CLOUDINARY_URL_RE = re.compile(
+    r'^https?://res\.cloudinary\.com/[^/]+/(?P<resource_type>image|video|raw)/upload/'
+    r'(?:(?:[a-z]{1,3}_[^/]*)/)*(?:v\d+/)?(?P<public_id>.+)$'
+)
+
+
+class StorageBackend(ABC):
+    """Common interface for file storage providers.
+
+    Every upload method returns the public URL of the stored file, or None
+    if the provider rejected it (errors are logged, not raised — matching
+    CloudinaryService). Backends must implement upload_image and
+    upload_document; the rest have working defaults.
+    """
+    name = None
+
+    @abstractmethod
+    def upload_image(self, file, folder='victorsprings_images'):
+        """Upload an image and return its URL"""
+
+    @abstractmethod
+    def upload_document(self, file, folder='victorsprings_documents', filename=None):
+        """Upload a document (PDF, scan...) and return its URL"""
+
+    def upload_file(self, file, folder, resource_type='auto', public_id=None):
+        """Upload an arbitrary file (KYC scans, generated consent logs)"""
+        return self.upload_document(file, folder=folder, filename=public_id)
+
+    def signed_url(self, url, ttl, filename=None):
+        """Return a provider-signed URL for `url` valid for `ttl` seconds, or None
+        if this provider cannot sign URLs."""
+        return None
+
+    def upload_document_dual(self, file, folder='victorsprings_documents', filename=None):
+        """Upload a document to this backend (primary) and the configured backup backend.
+
+        Returns a dict with:
+            'primary_url': URL stored in DB for downloads
+            'backup_url': backup copy URL (for redundancy), or None
+        """
+        primary_url = self.upload_document(file, folder=folder, filename=filename)
+
+        backup_url = None
+        backup = get_backup_storage()
+        if backup:
+            try:
+                _rewind(file)
+                backup_url = backup.upload_document(file, folder=folder, filename=filename)
+            except Exception as e:
+                print(f"{backup.name} backup upload failed: {str(e)}")
+
+        return {
+            'primary_url': primary_url,
+            'backup_url': backup_url
+        }
+
+
+class CloudinaryStorage(StorageBackend):
+    name = 'cloudinary'
+
+    def __init__(self):
+        from app.services.cloudinary_service import CloudinaryService
+        self.service = CloudinaryService()
+
+    def upload_image(self, file, folder='victorsprings_images'):
+        return self.service.upload_image(file, folder=folder)
+
+    def upload_document(self, file, folder='victorsprings_documents', filename=None):
+        return self.service.upload_document(file, folder=folder)
+
+    def upload_file(self, file, folder, resource_type='auto', public_id=None):
+        import cloudinary.uploader
+        try:
+            options = {'folder': folder, 'resource_type': resource_type}
+            if public_id:
+                options['public_id'] = public_id
+            result = cloudinary.uploader.upload(file, **options)
+            return result.get('secure_url')
+        except Exception as e:
+            print(f"Cloudinary upload error: {str(e)}")
+            return None
+
+    def signed_url(self, url, ttl, filename=None):
+        """Signed, expiring attachment URL from the Cloudinary download API"""
+        import cloudinary
+        import cloudinary.utils
+        match = CLOUDINARY_URL_RE.match(url)
+        if not match or not cloudinary.config().api_secret:
+            return None
+
+        resource_type = match.group('resource_type')
+        public_id = match.group('public_id').split('?')[0]
+        file_format = ''
+        if resource_type != 'raw':
+            # Image/video public IDs exclude the extension; raw ones keep it
+            public_id, _, file_format = public_id.rpartition('.') if '.' in public_id else (public_id, '', '')
+
+        return cloudinary.utils.private_download_url(
+            public_id,
+            file_format,
+            resource_type=resource_type,
+            type='upload',
+            attachment=True,
+            expires_at=int(time.time()) + ttl
+        )
+
+
+class UploadcareStorage(StorageBackend):
+    name = 'uploadcare'
+
+    def __init__(self):
+        from app.services.uploadcare_service import UploadcareService
+        self.service = UploadcareService()
+
+    def upload_image(self, file, folder='victorsprings_images'):
+        return self.service.upload_file(file)
+
+    def upload_document(self, file, folder='victorsprings_documents', filename=None):
+        return self.service.upload_file(file, filename=filename)
+
+
+class LocalStorage(StorageBackend):
+    """Stores files on local disk and serves them from /api/files/ with send_file.
+
+    Intended for offline development, load tests and benchmarks: no network
+    access is needed and downloads go out through the WSGI file wrapper
+    (sendfile) instead of being copied through Python.
+    """
+    name = 'local'
+
+    def __init__(self):
+        self.root = current_app.config['LOCAL_STORAGE_DIR']
+
+    def upload_image(self, file, folder='victorsprings_images'):
+        return self._save(file, folder)
+
+    def upload_document(self, file, folder='victorsprings_documents', filename=None):
+        return self._save(file, folder, filename)
+
+    def upload_file(self, file, folder, resource_type='auto', public_id=None):
+        return self._save(file, folder, public_id)
+
+    def _save(self, file, folder, filename=None):
+        try:
+            name = filename or getattr(file, 'filename', None) or (file if isinstance(file, str) else '')
+            ext = os.path.splitext(secure_filename(os.path.basename(name or '')))[1].lower()
+            key = f"{secure_filename(folder.replace('/', '_')) or 'files'}/{uuid.uuid4().hex}{ext}"
+
+            path = safe_join(self.root, key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            if isinstance(file, str):
+                shutil.copyfile(file, path)
+            elif hasattr(file, 'save'):
+                file.save(path)
+            else:
+                with open(path, 'wb') as out:
+                    shutil.copyfileobj(file, out)
+
+            return self.url_for_key(key)
+        except Exception as e:
+            print(f"Local storage upload error: {str(e)}")
+            return None
+
+    @staticmethod
+    def url_for_key(key):
+        base_url = current_app.config.get('LOCAL_STORAGE_BASE_URL')
+        if base_url:
+            return f"{base_url.rstrip('/')}{LOCAL_FILES_ROUTE}{key}"
+        return url_for('files.serve_file', key=key, _external=True)
+
+
+STORAGE_BACKENDS = {
+    'cloudinary': CloudinaryStorage,
+    'uploadcare': UploadcareStorage,
+    'local': LocalStorage,
+}
+
+
+def get_storage(name=None):
+    """Return the configured storage backend (STORAGE_BACKEND, default cloudinary)"""
+    name = name or current_app.config.get('STORAGE_BACKEND', 'cloudinary')
+    return STORAGE_BACKENDS[name]()
+
+
+def get_backup_storage():
+    """Return the backend used for redundant document copies, or None"""
+    name = current_app.config.get('STORAGE_BACKUP_BACKEND')
+    if not name or name == current_app.config.get('STORAGE_BACKEND', 'cloudinary'):
+        return None
+    return STORAGE_BACKENDS[name]()
+
+
+def storage_for_url(url):
+    """Return the backend that produced `url`, or None if it is not recognised"""
+    if local_path_for_url(url):
+        return LocalStorage()
+    hostname = urlparse(url).hostname or ''
+    if hostname.endswith('cloudinary.com'):
+        return CloudinaryStorage()
+    if hostname.endswith('ucarecdn.com'):
+        return UploadcareStorage()
+    return None
+
+
+def local_path_for_url(url):
+    """Map a URL produced by LocalStorage back to its file on disk.
+
+    Returns None for URLs that are not local storage files (or do not exist).
+    """
+    if not url:
+        return None
+    path = urlparse(url).path
+    if not path.startswith(LOCAL_FILES_ROUTE):
+        return None
+    full_path = safe_join(current_app.config['LOCAL_STORAGE_DIR'], path[len(LOCAL_FILES_ROUTE):])
+    if not full_path or not os.path.isfile(full_path):
+        return None
+    return full_path
+
+
+def _rewind(file):
+    """Reset a file object so a second backend can read it from the start"""
+    if hasattr(file, 'seek'):
+        file.seek(0)
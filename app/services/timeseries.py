@@ -0,0 +1,159 @@
+"""Report time series served from the daily rollups.
+
+Every metric reads at most one row per day from PaymentDailyTotal or
+MetricDailyRollup, never the source tables, so a chart over years of
+history reads a few thousand rows. Days are bucketed into weeks (ISO, from
+Monday) or months here, and buckets without data are filled with zeros.
+"""
+import os
+from datetime import date, datetime, timedelta
+from sqlalchemy import func
+from app import db
+from app.models.payment_daily_total import PaymentDailyTotal
+from app.models.metric_daily_rollup import MetricDailyRollup, TRACKED_MODELS
+from app.utils.cache import get_cache
+
+BUCKETS = ('day', 'week', 'month')
+
+# Longest series a single request may ask for
+TIMESERIES_MAX_BUCKETS = int(os.getenv('TIMESERIES_MAX_BUCKETS', 1000))
+
+# Series that include today change as data arrives; older ranges barely do
+TIMESERIES_CACHE_TTL = int(os.getenv('TIMESERIES_CACHE_TTL', 60))
+TIMESERIES_HISTORY_CACHE_TTL = int(os.getenv('TIMESERIES_HISTORY_CACHE_TTL', 3600))
+
+# Default range per bucket when `from` is omitted
+DEFAULT_SPANS = {'day': timedelta(days=29), 'week': timedelta(weeks=25), 'month': timedelta(days=365)}
+
+
+def _revenue(start, end):
+    return db.session.query(PaymentDailyTotal.day, func.sum(PaymentDailyTotal.total_amount)).filter(
+        PaymentDailyTotal.status == 'completed',
+        PaymentDailyTotal.day.between(start, end)
+    ).group_by(PaymentDailyTotal.day)
+
+
+def _payments(start, end):
+    return db.session.query(PaymentDailyTotal.day, func.sum(PaymentDailyTotal.payment_count)).filter(
+        PaymentDailyTotal.status == 'completed',
+        PaymentDailyTotal.day.between(start, end)
+    ).group_by(PaymentDailyTotal.day)
+
+
+def _rollup(metric):
+    def daily(start, end):
+        return db.session.query(MetricDailyRollup.day, MetricDailyRollup.value).filter(
+            MetricDailyRollup.metric == metric,
+            MetricDailyRollup.day.between(start, end)
+        )
+    return daily
+
+
+# metric -> (start, end) -> query of (day, value)
+METRICS = {
+    'revenue': _revenue,
+    'payments': _payments,
+    **{metric: _rollup(metric) for metric in TRACKED_MODELS.values()},
+}
+
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, bucket):
+    if bucket == 'week':
+        return start + timedelta(weeks=1)
+    if bucket == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def resolve_range(bucket, start=None, end=None):
+    """Clamp (start, end) to whole buckets; raises ValueError for bad input"""
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+    end = end or datetime.utcnow().date()
+    start = start or end - DEFAULT_SPANS[bucket]
+    if start > end:
+        raise ValueError('from must be on or before to')
+    start = bucket_start(start, bucket)
+    end = next_bucket(bucket_start(end, bucket), bucket) - timedelta(days=1)
+    return start, end
+
+
+def build_series(metric, bucket, start, end):
+    """[{'bucket': 'YYYY-MM-DD', 'value': n}, ...] for whole buckets from start to end"""
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {', '.join(sorted(METRICS))}")
+
+    values = {}
+    starts = []
+    current = start
+    while current <= end:
+        starts.append(current)
+        values[current] = 0
+        if len(starts) > TIMESERIES_MAX_BUCKETS:
+            raise ValueError(f'Range spans more than {TIMESERIES_MAX_BUCKETS} {bucket}s; use a wider bucket')
+        current = next_bucket(current, bucket)
+
+    for day, value in METRICS[metric](start, end):
+        values[bucket_start(day, bucket)] += value or 0
+
+    return [{'bucket': s.isoformat(), 'value': float(values[s]) if metric == 'revenue' else int(values[s])}
+            for s in starts]
+
+
+def get_series(metric, bucket, start=None, end=None, fresh=False):
+    """Cached series for (metric, bucket, range); returns the response payload"""
+    start, end = resolve_range(bucket, start, end)
+    key = f'timeseries:{metric}:{bucket}:{start.isoformat()}:{end.isoformat()}'
+    cache = get_cache()
+
+    payload = None if fresh else cache.get(key)
+    if payload is None:
+        series = build_series(metric, bucket, start, end)
+        payload = {
+            'metric': metric,
+            'bucket': bucket,
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'total': sum(point['value'] for point in series),
+            'series': series,
+        }
+        ttl = TIMESERIES_CACHE_TTL if end >= datetime.utcnow().date() else TIMESERIES_HISTORY_CACHE_TTL
+        cache.set(key, payload, ttl=ttl)
+    return payload
+
+
+def rebuild_metric_rollups(since=None):
+    """Recompute MetricDailyRollup from the source tables (all history if `since` is None).
+
+    Counts the rows that exist now, so deleted users / listings drop out of
+    past days. Returns the number of rows written.
+    """
+    deleted = MetricDailyRollup.query
+    if since:
+        deleted = deleted.filter(MetricDailyRollup.day >= since)
+    deleted.delete(synchronize_session=False)
+
+    written = 0
+    for model, metric in TRACKED_MODELS.items():
+        day = func.date(model.created_at)
+        query = db.session.query(day, func.count(model.id)).filter(model.created_at.isnot(None))
+        if since:
+            query = query.filter(model.created_at >= datetime.combine(since, datetime.min.time()))
+        rows = [
+            {'metric': metric, 'day': date.fromisoformat(d) if isinstance(d, str) else d, 'value': count}
+            for d, count in query.group_by(day)
+        ]
+        if rows:
+            db.session.execute(MetricDailyRollup.__table__.insert(), rows)
+        written += len(rows)
+
+    db.session.commit()
+    return written
@@ -0,0 +1,188 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models.upload_session import UploadSession
+from app.services.storage import get_storage
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines — single process, no locking needed
+    fcntl = None
+
+# purpose -> (kind, folder) for every file a client may upload in chunks
+UPLOAD_PURPOSES = {
+    'id_document': ('image', 'tenant_kyc'),
+    'signed_agreement': ('document', 'tenant_agreements'),
+}
+
+CHUNK_READ_SIZE = 64 * 1024
+
+
+class UploadOffsetMismatch(Exception):
+    """Raised when a PATCH does not start at the current upload offset"""
+    def __init__(self, expected):
+        super().__init__(f'Expected offset {expected}')
+        self.expected = expected
+
+
+class UploadTooLarge(Exception):
+    """Raised when a PATCH would write past the declared upload length"""
+
+
+def staging_dir():
+    """Return (and create) the local staging directory for partial uploads"""
+    path = current_app.config['UPLOAD_STAGING_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def staging_path(upload_id):
+    return os.path.join(staging_dir(), f'{upload_id}.part')
+
+
+def create_upload_session(user_id, filename, total_size, purpose, content_type=None):
+    """Register a new resumable upload and create its empty staging file"""
+    kind, folder = UPLOAD_PURPOSES[purpose]
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        filename=filename,
+        content_type=content_type,
+        kind=kind,
+        folder=folder,
+        total_size=total_size,
+        received_size=0,
+        status='uploading',
+    )
+    session.touch(current_app.config['UPLOAD_SESSION_TTL'])
+    open(staging_path(session.id), 'wb').close()
+    db.session.add(session)
+    return session
+
+
+def append_chunk(session, offset, stream):
+    """Append bytes from `stream` to the staging file starting at `offset`.
+
+    The on-disk file size is the source of truth for the offset, so a chunk
+    interrupted mid-transfer simply leaves a shorter file the client can
+    resume from. Returns the new offset.
+    """
+    path = staging_path(session.id)
+    with open(path, 'ab') as fh:
+        if fcntl:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            current = os.fstat(fh.fileno()).st_size
+            if offset != current:
+                raise UploadOffsetMismatch(current)
+
+            written = current
+            try:
+                while True:
+                    chunk = stream.read(CHUNK_READ_SIZE)
+                    if not chunk:
+                        break
+                    if written + len(chunk) > session.total_size:
+                        raise UploadTooLarge()
+                    fh.write(chunk)
+                    written += len(chunk)
+            finally:
+                fh.flush()
+                session.received_size = os.fstat(fh.fileno()).st_size
+        finally:
+            if fcntl:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+    session.touch(current_app.config['UPLOAD_SESSION_TTL'])
+    return session.received_size
+
+
+def finalize_upload(session):
+    """Hand a fully received upload to the storage backend and drop the staging file.
+
+    Returns True on success. On a storage failure the staging file is kept so
+    the client can retry the hand-off with an empty PATCH at the final offset.
+    """
+    storage = get_storage()
+    path = staging_path(session.id)
+
+    backup_url = None
+    with open(path, 'rb') as fh:
+        if session.kind == 'image':
+            url = storage.upload_image(fh, folder=session.folder)
+        else:
+            result = storage.upload_document_dual(fh, folder=session.folder, filename=session.filename)
+            url = result['primary_url']
+            backup_url = result.get('backup_url')
+
+    if not url:
+        return False
+
+    session.complete(url, backup_url)
+    _remove(path)
+    return True
+
+
+def resolve_completed_upload(user_id, upload_id, purpose):
+    """Claim the completed UploadSession owned by `user_id` for `purpose`, or return None.
+
+    A session can be attached to one record only: the claim flips it to
+    'consumed' with a conditional UPDATE, so a second attach (or a racing
+    one) finds nothing. The claim is part of the caller's transaction and
+    is released again if that transaction rolls back.
+    """
+    if not upload_id:
+        return None
+    kind, folder = UPLOAD_PURPOSES[purpose]
+    claimed = UploadSession.query.filter_by(
+        id=upload_id, user_id=user_id, folder=folder, status='completed'
+    ).update({'status': 'consumed'}, synchronize_session=False)
+    if not claimed:
+        return None
+    return db.session.get(UploadSession, upload_id, populate_existing=True)
+
+
+def discard_upload(session):
+    """Expire an unfinished upload and delete its staged bytes"""
+    session.status = 'expired'
+    _remove(staging_path(session.id))
+
+
+def purge_stale_uploads(now=None):
+    """Expire abandoned upload sessions and delete their staging files.
+
+    Also removes orphaned .part files with no session row that are older
+    than the session TTL. Returns the number of sessions expired.
+    """
+    now = now or datetime.utcnow()
+    stale = UploadSession.query.filter(
+        UploadSession.status == 'uploading',
+        UploadSession.expires_at < now
+    ).all()
+
+    for session in stale:
+        discard_upload(session)
+    db.session.commit()
+
+    cutoff = (now - timedelta(seconds=current_app.config['UPLOAD_SESSION_TTL'])).timestamp()
+    directory = staging_dir()
+    for name in os.listdir(directory):
+        if not name.endswith('.part'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff and not UploadSession.query.get(name[:-5]):
+                _remove(path)
+        except OSError:
+            pass
+
+    return len(stale)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -1,5 +1,5 @@
-import requests
 from flask import current_app
+from app.utils import http_client
 
 
 class UploadcareService:
@@ -37,7 +37,7 @@ class UploadcareService:
             # Reset file pointer so Cloudinary can also read it
             file_obj.seek(0)
             
-            resp = requests.post(
+            resp = http_client.post(
                 self.BASE_UPLOAD_URL,
                 files={'file': (fname, file_content)},
                 data={
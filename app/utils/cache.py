@@ -0,0 +1,129 @@
+"""Shared key/value cache: Redis when REDIS_URL is set, in-process otherwise.
+
+Values are JSON-serialised. The in-process fallback is per worker, so it
+only de-duplicates work within one gunicorn process; Redis shares it
+across all of them.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app
+
+
+class LocalCache:
+    """Thread-safe in-process cache with per-key TTLs and locks"""
+    backend = 'local'
+
+    def __init__(self):
+        self._data = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def get(self, key):
+        with self._guard:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return None
+            return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        with self._guard:
+            self._data[key] = (json.dumps(value), time.time() + ttl if ttl else None)
+
+    def delete(self, key):
+        with self._guard:
+            self._data.pop(key, None)
+
+    @contextmanager
+    def lock(self, key, timeout=10, blocking=True):
+        """Yield True if the lock for `key` was acquired, False otherwise"""
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        acquired = lock.acquire(blocking, timeout if blocking else -1)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+
+
+class RedisCache:
+    """Redis-backed cache; Redis errors degrade to cache misses and local locks"""
+    backend = 'redis'
+
+    def __init__(self, client, fallback):
+        self.client = client
+        self.fallback = fallback
+
+    def get(self, key):
+        try:
+            value = self.client.get(key)
+        except Exception as e:
+            current_app.logger.warning(f'Cache get failed for {key}: {str(e)}')
+            return None
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        try:
+            self.client.set(key, json.dumps(value), ex=int(ttl) if ttl else None)
+        except Exception as e:
+            current_app.logger.warning(f'Cache set failed for {key}: {str(e)}')
+
+    def delete(self, key):
+        try:
+            self.client.delete(key)
+        except Exception as e:
+            current_app.logger.warning(f'Cache delete failed for {key}: {str(e)}')
+
+    @contextmanager
+    def lock(self, key, timeout=10, blocking=True):
+        """Yield True if the cluster-wide lock for `key` was acquired.
+
+        The lock expires after `timeout` seconds so a crashed holder cannot
+        wedge other workers.
+        """
+        try:
+            lock = self.client.lock(f'lock:{key}', timeout=timeout, blocking_timeout=timeout)
+            acquired = lock.acquire(blocking=blocking)
+        except Exception as e:
+            current_app.logger.warning(f'Cache lock failed for {key}, using local lock: {str(e)}')
+            with self.fallback.lock(key, timeout, blocking) as acquired:
+                yield acquired
+            return
+
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    lock.release()
+                except Exception:
+                    pass  # expired while held; nothing to release
+
+
+def get_cache():
+    """Return the shared cache for the current app (created on first use)"""
+    cache = current_app.extensions.get('victorsprings_cache')
+    if cache is None:
+        local = LocalCache()
+        cache = local
+        redis_url = current_app.config.get('REDIS_URL')
+        if redis_url:
+            try:
+                import redis
+                client = redis.Redis.from_url(redis_url, socket_timeout=2, socket_connect_timeout=2)
+                client.ping()
+                cache = RedisCache(client, local)
+            except ImportError:
+                # Tokens would silently stop being shared across workers
+                current_app.logger.error('REDIS_URL is set but the redis package is not installed '
+                                         '(see requirements.txt); using in-process cache')
+            except Exception as e:
+                current_app.logger.warning(f'Redis unavailable, using in-process cache: {str(e)}')
+        current_app.extensions['victorsprings_cache'] = cache
+    return cache
@@ -89,6 +89,15 @@ def send_password_reset_email(to_email, token):
     except Exception as e:
         print(f"Failed to send password reset email: {e}")
         return False
+
+
+def payment_reference_row(receipt_number):
+    """Reference row of the payment email; omitted until M-Pesa has issued a receipt"""
+    if not receipt_number:
+        return ''
+    return f'                    <tr><td style="padding: 8px; border-bottom: 1px solid #ddd;"><b>Reference:</b></td><td style="padding: 8px; border-bottom: 1px solid #ddd;">{receipt_number}</td></tr>'
+
+
 def send_payment_notification_email(admin_email, payment_details):
     """Notify admin of a successful tenant payment."""
     try:
@@ -109,7 +118,7 @@ def send_payment_notification_email(admin_email, payment_details):
                     <tr><td style="padding: 8px; border-bottom: 1px solid #ddd;"><b>Tenant:</b></td><td style="padding: 8px; border-bottom: 1px solid #ddd;">{payment_details.get('tenant_name', 'N/A')}</td></tr>
                     <tr><td style="padding: 8px; border-bottom: 1px solid #ddd;"><b>Phone:</b></td><td style="padding: 8px; border-bottom: 1px solid #ddd;">{payment_details.get('phone', 'N/A')}</td></tr>
                     <tr><td style="padding: 8px; border-bottom: 1px solid #ddd;"><b>House:</b></td><td style="padding: 8px; border-bottom: 1px solid #ddd;">{payment_details.get('property_title', 'N/A')}</td></tr>
-                    <tr><td style="padding: 8px; border-bottom: 1px solid #ddd;"><b>Reference:</b></td><td style="padding: 8px; border-bottom: 1px solid #ddd;">{payment_details.get('receipt_number', 'N/A')}</td></tr>
+{payment_reference_row(payment_details.get('receipt_number'))}
                 </table>
                 <div style="text-align: center; margin-top: 30px; color: #666; font-size: 12px;">
                     <p>&copy; 2026 Victor Springs Limited. All rights reserved.</p>
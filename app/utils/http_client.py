@@ -0,0 +1,68 @@
+"""Shared outbound HTTP client for third-party integrations.
+
+One requests.Session per worker process keeps TLS connections alive in
+per-host pools, so M-Pesa, Uploadcare, Firma and CDN calls skip the TCP +
+TLS handshake after the first request. Every request gets a (connect, read)
+timeout unless the caller passes its own.
+"""
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) seconds applied when a caller does not pass timeout=
+DEFAULT_TIMEOUT = (
+    float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05)),
+    float(os.getenv('HTTP_READ_TIMEOUT', 30)),
+)
+
+# Distinct hosts to keep pools for, and keep-alive connections per host
+# (sized for the hedged CDN fetch pool)
+POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 16))
+POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 32))
+
+_lock = threading.Lock()
+_session = None
+_session_pid = None
+
+
+class TimeoutSession(requests.Session):
+    """requests.Session that applies DEFAULT_TIMEOUT to every request"""
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = DEFAULT_TIMEOUT
+        return super().request(method, url, **kwargs)
+
+
+def create_session():
+    """Build a pooled session. Only connection failures are retried, since
+    nothing has reached the server yet and a retried POST (e.g. an STK push)
+    cannot be duplicated."""
+    session = TimeoutSession()
+    retries = Retry(total=None, connect=2, read=0, status=0, other=0, redirect=5, backoff_factor=0.1)
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """Return the process-wide pooled session (re-created after a fork)"""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _lock:
+            if _session is None or _session_pid != pid:
+                _session = create_session()
+                _session_pid = pid
+    return _session
+
+
+def get(url, **kwargs):
+    return get_session().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return get_session().post(url, **kwargs)
@@ -0,0 +1,130 @@
+"""Idempotency-Key support for endpoints that upload files and create rows.
+
+A client that times out and retries with the same Idempotency-Key header
+gets the first attempt's response back instead of a second round of
+uploads and a duplicate record. The key is claimed (committed) before
+the view runs, so a retry that arrives while the first attempt is still
+running sees it and gets a 409 rather than racing it.
+
+Only successful (2xx) responses are stored. On a 4xx/5xx nothing was
+committed by the view, so the key is released and the client may retry
+with it. Requests without the header behave exactly as before.
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.idempotency_record import IdempotencyRecord
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+# How long a completed response is replayed for
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 24 * 3600))
+# An in-progress claim older than this is treated as abandoned (worker died mid-request)
+IDEMPOTENCY_IN_FLIGHT_TIMEOUT = int(os.getenv('IDEMPOTENCY_IN_FLIGHT_TIMEOUT', 300))
+
+
+def request_fingerprint():
+    """SHA-256 over method, path, form fields and uploaded file contents"""
+    digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode())
+    if request.form or request.files:
+        for name, value in sorted(request.form.items(multi=True)):
+            digest.update(f'{name}={value}\n'.encode())
+        for name, storage in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+            digest.update(f'{name}:{storage.filename}\n'.encode())
+            for chunk in iter(lambda: storage.stream.read(64 * 1024), b''):
+                digest.update(chunk)
+            storage.stream.seek(0)
+    else:
+        digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _claim(user_id, key, fingerprint):
+    """Insert an in-progress row for (user, key); returns (record, None) or (None, existing)"""
+    for _ in range(2):
+        record = IdempotencyRecord(
+            user_id=user_id,
+            key=key,
+            endpoint=request.endpoint,
+            request_hash=fingerprint,
+            status='in_progress',
+            expires_at=datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_IN_FLIGHT_TIMEOUT)
+        )
+        db.session.add(record)
+        try:
+            db.session.commit()
+            return record, None
+        except IntegrityError:
+            db.session.rollback()
+
+        existing = IdempotencyRecord.query.filter_by(user_id=user_id, key=key).first()
+        if existing is None or not existing.is_expired():
+            return None, existing
+        # Expired: free the key (only if nobody else just did) and claim it again
+        IdempotencyRecord.query.filter(
+            IdempotencyRecord.id == existing.id,
+            IdempotencyRecord.expires_at < datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    return None, IdempotencyRecord.query.filter_by(user_id=user_id, key=key).first()
+
+
+def idempotent(fn):
+    """Replay the stored response when a request repeats an Idempotency-Key.
+
+    Apply below @jwt_required(); keys are scoped to the current user.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+        if not key:
+            return fn(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({'message': f'{IDEMPOTENCY_HEADER} must be at most 255 characters'}), 400
+
+        user_id = int(get_jwt_identity())
+        fingerprint = request_fingerprint()
+        record, existing = _claim(user_id, key, fingerprint)
+
+        if record is None:
+            if existing is None or existing.request_hash != fingerprint or existing.endpoint != request.endpoint:
+                return jsonify({'message': f'{IDEMPOTENCY_HEADER} was already used for a different request'}), 422
+            if existing.status != 'completed':
+                response = jsonify({'message': 'A request with this Idempotency-Key is still being processed'})
+                response.headers['Retry-After'] = '1'
+                return response, 409
+            response = make_response(jsonify(existing.response_body), existing.response_code)
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        record_id = record.id
+        try:
+            response = make_response(fn(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            IdempotencyRecord.query.filter_by(id=record_id).delete(synchronize_session=False)
+            db.session.commit()
+            raise
+
+        stored = IdempotencyRecord.query.filter_by(id=record_id)
+        if 200 <= response.status_code < 300 and response.is_json:
+            now = datetime.utcnow()
+            stored.update({
+                'status': 'completed',
+                'response_code': response.status_code,
+                'response_body': response.get_json(),
+                'completed_at': now,
+                'expires_at': now + timedelta(seconds=IDEMPOTENCY_KEY_TTL)
+            }, synchronize_session=False)
+        else:
+            # Nothing was committed; let the client retry with the same key
+            db.session.rollback()
+            stored.delete(synchronize_session=False)
+        db.session.commit()
+        return response
+    return wrapper
@@ -0,0 +1,59 @@
+"""Lightweight in-process metrics (per worker) for latency and hit-rate tracking"""
+import threading
+from collections import defaultdict, deque
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_timings = {}
+
+# Recent samples kept per timing for percentile estimates
+SAMPLE_WINDOW = 512
+
+
+def incr(name, value=1):
+    """Increment a counter"""
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name, seconds):
+    """Record a latency sample in seconds"""
+    with _lock:
+        timing = _timings.get(name)
+        if timing is None:
+            timing = _timings[name] = {'count': 0, 'total': 0.0, 'max': 0.0, 'samples': deque(maxlen=SAMPLE_WINDOW)}
+        timing['count'] += 1
+        timing['total'] += seconds
+        timing['max'] = max(timing['max'], seconds)
+        timing['samples'].append(seconds)
+
+
+def _percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, int(round(pct / 100.0 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def snapshot():
+    """Return all counters and timing summaries (milliseconds) as a dict"""
+    with _lock:
+        counters = dict(_counters)
+        timings = {}
+        for name, timing in _timings.items():
+            samples = sorted(timing['samples'])
+            timings[name] = {
+                'count': timing['count'],
+                'avg_ms': round(timing['total'] / timing['count'] * 1000, 2),
+                'p50_ms': round(_percentile(samples, 50) * 1000, 2),
+                'p95_ms': round(_percentile(samples, 95) * 1000, 2),
+                'max_ms': round(timing['max'] * 1000, 2),
+            }
+    return {'counters': counters, 'timings': timings}
+
+
+def reset():
+    """Clear all metrics (used by tests and benchmarks)"""
+    with _lock:
+        _counters.clear()
+        _timings.clear()
@@ -0,0 +1,63 @@
+"""Keyset (cursor) pagination.
+
+OFFSET pagination makes the database walk and discard every earlier row,
+so deep pages get slower as tables grow. Keyset pagination remembers the
+sort key of the last row served and asks for rows strictly after it,
+which an index on the sort columns answers directly.
+
+Cursors are opaque, URL-safe strings encoding the last row's sort key.
+"""
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+
+def encode_cursor(values):
+    """Opaque cursor for a tuple of sort-key values (datetimes allowed)"""
+    payload = [{'dt': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return tuple(datetime.fromisoformat(v['dt']) if isinstance(v, dict) else v for v in payload)
+    except (TypeError, ValueError, KeyError, AttributeError):
+        raise ValueError('Invalid cursor')
+
+
+def keyset_page(query, columns, cursor=None, limit=20, descending=True):
+    """Fetch one page of `query` ordered by `columns` (which must be unique together).
+
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    A limit below 1 is treated as 1.
+    """
+    limit = max(1, limit)
+    if cursor:
+        after = decode_cursor(cursor)
+        if len(after) != len(columns):
+            raise ValueError('Invalid cursor')
+        key = tuple_(*columns)
+        query = query.filter(key < tuple_(*after) if descending else key > tuple_(*after))
+
+    order = [c.desc() for c in columns] if descending else [c.asc() for c in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+    return items, next_cursor
+
+
+def page_payload(per_page, next_cursor):
+    """The `pagination` block of a keyset-paged response"""
+    return {
+        'per_page': per_page,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+    }
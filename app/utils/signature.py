@@ -1,6 +1,7 @@
 import os
 import requests
 import logging
+from app.utils import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -49,7 +50,7 @@ def generate_signature_request(user, document_name="Landlord Consent & Represent
     }
 
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = http_client.post(url, json=payload, headers=headers)
         response.raise_for_status()
         data = response.json()
         
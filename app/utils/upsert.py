@@ -0,0 +1,32 @@
+"""Atomic counter upserts for the daily rollup tables.
+
+Rollup rows are incremented by whichever transaction settles a payment or
+inserts a row first that day, so "update, else insert" races on a missing
+row. INSERT ... ON CONFLICT DO UPDATE does both in one statement.
+"""
+from sqlalchemy import and_
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def upsert_increment(connection, table, key, amounts, values=None):
+    """Add `amounts` to the row of `table` matching `key`, creating it if missing.
+
+    `key` ({column: value}) must match a unique constraint of the table.
+    `values` are plain columns set on both insert and update, e.g. updated_at.
+    """
+    values = values or {}
+    increments = {column: table.c[column] + amount for column, amount in amounts.items()}
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        connection.execute(
+            insert(table).values(**key, **amounts, **values).on_conflict_do_update(
+                index_elements=list(key),
+                set_={**increments, **values}
+            )
+        )
+        return
+    # Other dialects: no portable upsert, fall back to update-then-insert
+    where = and_(*(table.c[column] == value for column, value in key.items()))
+    if not connection.execute(table.update().where(where).values(**increments, **values)).rowcount:
+        connection.execute(table.insert().values(**key, **amounts, **values))
@@ -0,0 +1,116 @@
+"""Benchmark: fresh connection per request vs the shared pooled session.
+
+Starts a local HTTPS stand-in (self-signed certificate generated with
+openssl) that answers like a small Daraja / Uploadcare JSON endpoint, then
+times N sequential requests made with module-level requests.post (new TCP +
+TLS handshake every time, like the old integration code) and with
+app.utils.http_client (keep-alive pool).
+
+Run with: python bench_http_pool.py [requests] [added_latency_ms]
+
+added_latency_ms delays every accepted connection to approximate the
+round trip to Safaricom / Uploadcare; the handshake pays it on each new
+connection.
+"""
+import json
+import os
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from app.utils import http_client
+
+
+class StandInAPI(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = json.dumps({'ResponseCode': '0', 'CheckoutRequestID': 'ws_CO_bench'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class SlowAcceptServer(ThreadingHTTPServer):
+    daemon_threads = True
+    connect_delay = 0.0
+    connections = 0
+
+    def get_request(self):
+        sock, addr = super().get_request()
+        SlowAcceptServer.connections += 1
+        if self.connect_delay:
+            time.sleep(self.connect_delay)
+        return sock, addr
+
+
+def make_certificate(directory):
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+        '-keyout', key, '-out', cert, '-subj', '/CN=localhost',
+        '-addext', 'subjectAltName=DNS:localhost,IP:127.0.0.1'
+    ], check=True, capture_output=True)
+    return cert, key
+
+
+def start_server(cert, key, connect_delay):
+    SlowAcceptServer.connect_delay = connect_delay
+    server = SlowAcceptServer(('127.0.0.1', 0), StandInAPI)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(label, send, n):
+    SlowAcceptServer.connections = 0
+    timings = []
+    for _ in range(n):
+        started = time.perf_counter()
+        resp = send()
+        resp.raise_for_status()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    print(f'{label:<22} mean {statistics.mean(timings):7.2f} ms   '
+          f'p50 {timings[len(timings) // 2]:7.2f} ms   '
+          f'p95 {timings[int(len(timings) * 0.95) - 1]:7.2f} ms   '
+          f'connections {SlowAcceptServer.connections}')
+    return statistics.mean(timings)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    connect_delay = (float(sys.argv[2]) if len(sys.argv) > 2 else 0.0) / 1000
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert, key = make_certificate(directory)
+        server = start_server(cert, key, connect_delay)
+        url = f'https://localhost:{server.server_address[1]}/mpesa/stkpush/v1/processrequest'
+        payload = {'BusinessShortCode': '174379', 'Amount': 1}
+
+        print(f'{n} sequential POSTs to {url} (added connect latency {connect_delay * 1000:.0f} ms)')
+        fresh = run('fresh connection', lambda: requests.post(url, json=payload, verify=cert, timeout=30), n)
+        pooled = run('pooled session', lambda: http_client.post(url, json=payload, verify=cert), n)
+        print(f'saved {fresh - pooled:.2f} ms per request ({(1 - pooled / fresh) * 100:.0f}%)')
+
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
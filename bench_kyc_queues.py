@@ -0,0 +1,136 @@
+"""Benchmark: KYC review queues, per-landlord document queries vs one page query.
+
+Seeds a throwaway SQLite database with N landlords (each with front/back ID
+documents, about a third of them pending review), then loads the pending
+and all-KYC queues two ways and reports SQL statements and wall time:
+
+  legacy   every matching landlord, then one Document query per landlord
+           (what /api/users/kyc/pending and /kyc/all used to do)
+  paged    GET /api/users/kyc/... as it is now: a page of landlords that
+           have matching documents (EXISTS) and one IN query for their
+           documents; walks every page with the cursor
+
+Run with: python bench_kyc_queues.py [landlords] [per_page]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+directory = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(directory, "bench.db")}'
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import create_app, db, limiter
+from app.models.document import Document
+from app.models.user import User
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def seed(n):
+    admin = User(email='admin@bench.test', name='Admin', phone='+254700000000', role='admin', is_verified=True)
+    db.session.add(admin)
+    db.session.flush()
+    users = [
+        {'email': f'landlord{i}@bench.test', 'name': f'Landlord {i}', 'phone': '+254700000001',
+         'role': 'landlord', 'id_number': str(10000000 + i),
+         'verification_status': 'pending' if i % 3 == 0 else 'verified'}
+        for i in range(n)
+    ]
+    db.session.execute(User.__table__.insert(), users)
+    ids = [uid for (uid,) in db.session.query(User.id).filter(User.role == 'landlord').order_by(User.id)]
+    documents = [
+        {'user_id': uid, 'name': f'National ID ({side})', 'document_type': 'id_document',
+         'file_url': f'https://example.test/{uid}-{side}.jpg', 'is_accessible': True,
+         'status': 'pending' if i % 3 == 0 else 'verified'}
+        for i, uid in enumerate(ids) for side in ('front', 'back')
+    ]
+    db.session.execute(Document.__table__.insert(), documents)
+    db.session.commit()
+    return admin
+
+
+def legacy_queue(user_filters, document_filters):
+    results = []
+    for user in User.query.filter(*user_filters).all():
+        docs = Document.query.filter_by(user_id=user.id).filter(*document_filters).all()
+        if docs:
+            results.append({'user': user.to_dict(include_sensitive=True),
+                            'documents': [d.to_dict(include_file_url=True) for d in docs]})
+    return results
+
+
+def paged_queue(client, path, headers, per_page):
+    rows, requests, cursor = 0, 0, ''
+    while True:
+        body = client.get(f'{path}?per_page={per_page}&cursor={cursor}', headers=headers).json
+        rows += len(body['requests'])
+        requests += 1
+        cursor = body['pagination']['next_cursor']
+        if not cursor:
+            return rows, requests
+
+
+def report(label, counter, started, rows, requests=1):
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f'  {label:<8} {rows:6d} landlords   {counter.count:6d} queries '
+          f'({counter.count / requests:.1f} per request, {requests} request(s))   {elapsed:8.1f} ms')
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    per_page = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    app = create_app()
+    limiter.enabled = False
+    with app.app_context():
+        db.create_all()
+        admin = seed(n)
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(admin.id))}'}
+        client = app.test_client()
+
+        queues = [
+            ('pending', '/api/users/kyc/pending',
+             (User.verification_status == 'pending', User.role == 'landlord'), (Document.status == 'pending',)),
+            ('all', '/api/users/kyc/all',
+             (User.role == 'landlord', User.id_number.isnot(None)),
+             (Document.document_type.in_(['id_document', 'legal_document']),)),
+        ]
+        print(f'{n} landlords, {2 * n} documents, per_page {per_page}')
+        for name, path, user_filters, document_filters in queues:
+            print(f'{name} queue')
+            with QueryCounter(db.engine) as counter:
+                started = time.perf_counter()
+                rows = len(legacy_queue(user_filters, document_filters))
+            report('legacy', counter, started, rows)
+            db.session.expire_all()
+
+            with QueryCounter(db.engine) as counter:
+                started = time.perf_counter()
+                rows, requests = paged_queue(client, path, headers, per_page)
+            report('paged', counter, started, rows, requests)
+
+        db.session.remove()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Shared fixtures and helpers for the root test modules.
+
+Tests run against an in-memory SQLite database with rate limiting off.
+Modules import the helpers directly: `from conftest import headers_for`.
+"""
+import os
+from contextlib import contextmanager
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import create_app, db, limiter
+
+
+@contextmanager
+def app_context(**config):
+    """A test app with its tables created, torn down on exit"""
+    app = create_app()
+    app.config.update(TESTING=True, **config)
+    limiter.enabled = False
+    with app.app_context():
+        db.create_all()
+        try:
+            yield app
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+@pytest.fixture
+def app():
+    with app_context() as app:
+        yield app
+
+
+def headers_for(user):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+
+@contextmanager
+def count_queries():
+    """Collect the SQL statements executed inside the block"""
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
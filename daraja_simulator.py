@@ -0,0 +1,382 @@
+"""Local stand-in for the Safaricom Daraja M-Pesa API.
+
+Implements the endpoints MpesaService uses:
+
+    GET  /oauth/v1/generate?grant_type=client_credentials
+    POST /mpesa/stkpush/v1/processrequest
+    POST /mpesa/stkpushquery/v1/query
+
+and, like Daraja, POSTs the STK result to the request's CallBackURL some
+time after the push was accepted. Latency, API failure rate, customer
+decline rate, callback delay and duplicate callback delivery are all
+configurable. Point the app at it with MPESA_BASE_URL=http://127.0.0.1:<port>.
+
+Usage from tests:
+
+    sim = DarajaSimulator().start()
+    os.environ['MPESA_BASE_URL'] = sim.base_url
+    sim.add_transaction('ws_CO_1', result_code=0)     # settled
+    sim.add_transaction('ws_CO_2')                    # still being processed
+    ...
+    sim.stop()
+
+Standalone (e.g. next to `python app.py`):
+
+    python daraja_simulator.py --port 8765 --latency-ms 80 --callback-delay-ms 2000 \\
+        --decline-rate 0.1 --duplicate-rate 0.05
+"""
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+RESULT_DESCRIPTIONS = {
+    0: 'The service request is processed successfully.',
+    1: 'The balance is insufficient for the transaction.',
+    1032: 'Request cancelled by user',
+    1037: 'DS timeout user cannot be reached',
+    2001: 'The initiator information is invalid.',
+}
+
+# Result codes picked for declined pushes
+DECLINE_CODES = (1032, 1, 1037, 2001)
+
+
+def _as_range(value):
+    """Accept a number or a (min, max) pair of seconds"""
+    if isinstance(value, (tuple, list)):
+        return float(value[0]), float(value[1])
+    return float(value), float(value)
+
+
+class Transaction:
+    def __init__(self, checkout_request_id, amount=None, phone=None, callback_url=None,
+                 account_reference=None, result_code=None):
+        self.checkout_request_id = checkout_request_id
+        self.merchant_request_id = f'{uuid.uuid4().int % 10 ** 5}-{uuid.uuid4().int % 10 ** 8}-1'
+        self.amount = amount
+        self.phone = phone
+        self.callback_url = callback_url
+        self.account_reference = account_reference
+        self.result_code = result_code  # None while the customer has not answered
+        self.receipt_number = None
+        self.transaction_date = None
+        self.accepted_at = time.monotonic()
+
+    def settle(self, result_code):
+        self.result_code = result_code
+        if result_code == 0 and not self.receipt_number:
+            self.receipt_number = uuid.uuid4().hex[:10].upper()
+            self.transaction_date = int(datetime.now().strftime('%Y%m%d%H%M%S'))
+
+    def callback_body(self):
+        callback = {
+            'MerchantRequestID': self.merchant_request_id,
+            'CheckoutRequestID': self.checkout_request_id,
+            'ResultCode': self.result_code,
+            'ResultDesc': RESULT_DESCRIPTIONS.get(self.result_code, 'Transaction failed'),
+        }
+        if self.result_code == 0:
+            callback['CallbackMetadata'] = {'Item': [
+                {'Name': 'Amount', 'Value': self.amount},
+                {'Name': 'MpesaReceiptNumber', 'Value': self.receipt_number},
+                {'Name': 'TransactionDate', 'Value': self.transaction_date},
+                {'Name': 'PhoneNumber', 'Value': int(self.phone) if str(self.phone or '').isdigit() else self.phone},
+            ]}
+        return {'Body': {'stkCallback': callback}}
+
+
+class DarajaSimulator:
+    """In-process Daraja stand-in served from a background thread.
+
+    latency            seconds (or (min, max)) added to every API response
+    failure_rate       probability an stkpush / query answers 503 "System is busy"
+    decline_rate       probability the customer declines (result code != 0)
+    callback_delay     seconds (or (min, max)) between an accepted push and its callback
+    duplicate_rate     probability a callback is delivered a second time
+    auto_callback      deliver callbacks for pushes that carry a CallBackURL
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, failure_rate=0.0, decline_rate=0.0,
+                 callback_delay=0.05, duplicate_rate=0.0, auto_callback=True, callback_workers=32, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = _as_range(latency)
+        self.failure_rate = failure_rate
+        self.decline_rate = decline_rate
+        self.callback_delay = _as_range(callback_delay)
+        self.duplicate_rate = duplicate_rate
+        self.auto_callback = auto_callback
+        self.random = random.Random(seed)
+
+        self.transactions = {}
+        self.stats = Counter()
+        self.callback_statuses = Counter()
+        self.callback_latencies = []  # push accepted -> callback acknowledged, seconds
+        self.lock = threading.Lock()
+        self.tokens = set()
+        self.server = None
+
+        # Callbacks are scheduled on a heap and posted by a small pool, so
+        # thousands of delayed callbacks don't need thousands of threads
+        self._schedule = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._callback_pool = ThreadPoolExecutor(max_workers=callback_workers, thread_name_prefix='daraja-callback')
+        self._http = requests.Session()
+        self._http.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=callback_workers))
+
+    @property
+    def base_url(self):
+        return f'http://{self.host}:{self.server.server_address[1]}'
+
+    def start(self):
+        handler = type('BoundDarajaHandler', (DarajaHandler,), {'simulator': self})
+        self.server = ThreadingHTTPServer((self.host, self.port), handler)
+        self.server.daemon_threads = True
+        self.server.request_queue_size = 1024
+        self._running = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._dispatch_callbacks, daemon=True).start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        self._callback_pool.shutdown(wait=False, cancel_futures=True)
+
+    # -- test controls -------------------------------------------------------
+
+    def add_transaction(self, checkout_request_id, result_code=None, **kwargs):
+        """Register a transaction (e.g. for payments created directly in the DB)"""
+        tx = Transaction(checkout_request_id, **kwargs)
+        if result_code is not None:
+            tx.settle(result_code)
+        with self.lock:
+            self.transactions[checkout_request_id] = tx
+        return tx
+
+    def settle(self, checkout_request_id, result_code=0):
+        """Record the customer's answer for a pending transaction"""
+        with self.lock:
+            tx = self.transactions[checkout_request_id]
+            tx.settle(result_code)
+        return tx
+
+    def wait_for_callbacks(self, timeout=60):
+        """Block until every scheduled callback has been delivered. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._schedule or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    # -- callbacks -----------------------------------------------------------
+
+    def _schedule_callback(self, tx, delay):
+        with self._cond:
+            heapq.heappush(self._schedule, (time.monotonic() + delay, next(self._sequence), tx))
+            self._cond.notify_all()
+
+    def _dispatch_callbacks(self):
+        while True:
+            with self._cond:
+                while self._running and (not self._schedule or self._schedule[0][0] > time.monotonic()):
+                    timeout = self._schedule[0][0] - time.monotonic() if self._schedule else None
+                    self._cond.wait(timeout)
+                if not self._running:
+                    return
+                _, _, tx = heapq.heappop(self._schedule)
+                self._in_flight += 1
+            self._callback_pool.submit(self._deliver, tx)
+
+    def _deliver(self, tx):
+        try:
+            resp = self._http.post(tx.callback_url, json=tx.callback_body(), timeout=(3.05, 30))
+            with self.lock:
+                self.stats['callbacks'] += 1
+                self.callback_statuses[resp.status_code] += 1
+                self.callback_latencies.append(time.monotonic() - tx.accepted_at)
+        except Exception:
+            with self.lock:
+                self.stats['callback_errors'] += 1
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    # -- API behaviour -------------------------------------------------------
+
+    def simulate_latency(self):
+        low, high = self.latency
+        if high > 0:
+            time.sleep(self.random.uniform(low, high))
+
+    def simulate_failure(self):
+        return self.failure_rate and self.random.random() < self.failure_rate
+
+    def issue_token(self):
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.tokens.add(token)
+        return {'access_token': token, 'expires_in': '3599'}
+
+    def is_authorized(self, header):
+        scheme, _, token = (header or '').partition(' ')
+        with self.lock:
+            return scheme == 'Bearer' and token in self.tokens
+
+    def stk_push(self, payload):
+        if self.simulate_failure():
+            with self.lock:
+                self.stats['stkpush_failed'] += 1
+            return 503, {'errorCode': '500.003.02', 'errorMessage': 'System is busy. Please try again in few minutes.'}
+
+        tx = Transaction(
+            f'ws_CO_{uuid.uuid4().hex[:20]}',
+            amount=payload.get('Amount'),
+            phone=payload.get('PhoneNumber'),
+            callback_url=payload.get('CallBackURL'),
+            account_reference=payload.get('AccountReference')
+        )
+        with self.lock:
+            self.transactions[tx.checkout_request_id] = tx
+
+        if self.auto_callback and tx.callback_url:
+            declined = self.decline_rate and self.random.random() < self.decline_rate
+            tx.settle(self.random.choice(DECLINE_CODES) if declined else 0)
+            low, high = self.callback_delay
+            delay = self.random.uniform(low, high)
+            self._schedule_callback(tx, delay)
+            if self.duplicate_rate and self.random.random() < self.duplicate_rate:
+                with self.lock:
+                    self.stats['callbacks_duplicated'] += 1
+                self._schedule_callback(tx, delay + self.random.uniform(0, max(high, 0.05)))
+
+        return 200, {
+            'MerchantRequestID': tx.merchant_request_id,
+            'CheckoutRequestID': tx.checkout_request_id,
+            'ResponseCode': '0',
+            'ResponseDescription': 'Success. Request accepted for processing',
+            'CustomerMessage': 'Success. Request accepted for processing'
+        }
+
+    def stk_query(self, payload):
+        if self.simulate_failure():
+            return 503, {'errorCode': '500.003.02', 'errorMessage': 'System is busy. Please try again in few minutes.'}
+        with self.lock:
+            tx = self.transactions.get(payload.get('CheckoutRequestID'))
+        if tx is None:
+            return 400, {'errorCode': '400.002.02', 'errorMessage': 'Bad Request - Invalid CheckoutRequestID'}
+        if tx.result_code is None:
+            return 500, {'errorCode': '500.001.1001', 'errorMessage': 'The transaction is being processed'}
+        return 200, {
+            'ResponseCode': '0',
+            'ResponseDescription': 'The service request has been accepted successsfully',
+            'MerchantRequestID': tx.merchant_request_id,
+            'CheckoutRequestID': tx.checkout_request_id,
+            'ResultCode': str(tx.result_code),
+            'ResultDesc': RESULT_DESCRIPTIONS.get(tx.result_code, 'Transaction failed')
+        }
+
+
+class DarajaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    simulator = None
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        sim = self.simulator
+        if self.path.startswith('/oauth/v1/generate'):
+            with sim.lock:
+                sim.stats['oauth'] += 1
+            sim.simulate_latency()
+            if not (self.headers.get('Authorization') or '').startswith('Basic '):
+                return self._send_json(400, {'errorCode': '400.008.01', 'errorMessage': 'Invalid Authentication passed'})
+            return self._send_json(200, sim.issue_token())
+        self._send_json(404, {'errorMessage': 'Not found'})
+
+    def do_POST(self):
+        sim = self.simulator
+        routes = {
+            '/mpesa/stkpush/v1/processrequest': ('stkpush', sim.stk_push),
+            '/mpesa/stkpushquery/v1/query': ('stkpushquery', sim.stk_query),
+        }
+        route = routes.get(self.path)
+        payload = self._read_json()
+        if route is None:
+            return self._send_json(404, {'errorMessage': 'Not found'})
+        name, handler = route
+        with sim.lock:
+            sim.stats[name] += 1
+        sim.simulate_latency()
+        if not sim.is_authorized(self.headers.get('Authorization')):
+            return self._send_json(401, {'errorCode': '404.001.03', 'errorMessage': 'Invalid Access Token'})
+        if payload is None:
+            return self._send_json(400, {'errorCode': '400.002.02', 'errorMessage': 'Bad Request - Invalid JSON'})
+        status, body = handler(payload)
+        self._send_json(status, body)
+
+    def log_message(self, *args):
+        pass
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run a local Daraja (M-Pesa) simulator.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--decline-rate', type=float, default=0.0)
+    parser.add_argument('--callback-delay-ms', type=float, default=1000)
+    parser.add_argument('--duplicate-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    sim = DarajaSimulator(
+        port=args.port,
+        latency=args.latency_ms / 1000,
+        failure_rate=args.failure_rate,
+        decline_rate=args.decline_rate,
+        callback_delay=args.callback_delay_ms / 1000,
+        duplicate_rate=args.duplicate_rate
+    ).start()
+    print(f'Daraja simulator listening on {sim.base_url} (set MPESA_BASE_URL to this)')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        sim.stop()
@@ -0,0 +1,186 @@
+"""End-to-end M-Pesa load scenario against the local Daraja simulator.
+
+Starts the simulator and the API (threaded WSGI server) in this process,
+fires N concurrent POST /api/payments/initiate requests from a pool of
+tenants, waits for every simulated callback (including duplicates) to hit
+POST /api/payments/callback, then checks the books:
+
+  * every accepted push ends completed or failed,
+  * completed payments match the simulator's successful transactions,
+  * each completed payment queued exactly two notification jobs
+    (duplicates never double-notify).
+
+Run with:
+    python load_mpesa_scenario.py --payments 2000 --concurrency 200 \\
+        --latency-ms 50 --callback-delay-ms 500 --decline-rate 0.1 --duplicate-rate 0.2
+
+Uses a throwaway SQLite file unless DATABASE_URL is set (use Postgres for
+realistic write concurrency).
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from daraja_simulator import DarajaSimulator
+
+
+def percentiles(samples):
+    if not samples:
+        return 'n/a'
+    ordered = sorted(samples)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))] * 1000
+    return (f'p50 {pick(50):7.1f} ms  p95 {pick(95):7.1f} ms  p99 {pick(99):7.1f} ms  '
+            f'max {ordered[-1] * 1000:7.1f} ms  mean {statistics.mean(ordered) * 1000:7.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--payments', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--tenants', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--decline-rate', type=float, default=0.1)
+    parser.add_argument('--callback-delay-ms', type=float, default=500)
+    parser.add_argument('--duplicate-rate', type=float, default=0.2)
+    parser.add_argument('--timeout', type=float, default=300, help='Seconds to wait for callbacks.')
+    args = parser.parse_args()
+
+    sim = DarajaSimulator(
+        latency=args.latency_ms / 1000,
+        failure_rate=args.failure_rate,
+        decline_rate=args.decline_rate,
+        callback_delay=(0, args.callback_delay_ms / 1000 * 2),
+        duplicate_rate=args.duplicate_rate,
+        callback_workers=64,
+        seed=42
+    ).start()
+
+    workdir = tempfile.mkdtemp(prefix='vs_load_')
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{os.path.join(workdir, "load.db")}')
+    os.environ['MPESA_BASE_URL'] = sim.base_url
+    os.environ.setdefault('MPESA_CONSUMER_KEY', 'load-test')
+    os.environ.setdefault('MPESA_CONSUMER_SECRET', 'load-test')
+
+    import requests
+    from werkzeug.serving import make_server
+    from flask_jwt_extended import create_access_token
+    from app import create_app, db, limiter
+    from app.models.payment import Payment
+    from app.models.background_job import BackgroundJob
+    from app.models.mpesa_callback import MpesaCallback
+    from app.models.user import User
+
+    app = create_app()
+    app.config['JOBS_KICK'] = False  # keep Resend / Twilio out of the measurement
+    limiter.enabled = False
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        # Let concurrent writers queue instead of failing with "database is locked"
+        from sqlalchemy import event, text
+
+        with app.app_context():
+            @event.listens_for(db.engine, 'connect')
+            def _sqlite_busy_timeout(dbapi_connection, _):
+                dbapi_connection.execute('PRAGMA busy_timeout = 30000')
+
+            db.engine.dispose()
+            with db.engine.connect() as connection:
+                connection.execute(text('PRAGMA journal_mode=WAL'))
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # no per-request access log
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    server.daemon_threads = True
+    server.request_queue_size = 2048
+    api_url = f'http://127.0.0.1:{server.server_port}'
+    os.environ['MPESA_CALLBACK_URL'] = f'{api_url}/api/payments/callback'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with app.app_context():
+        tokens = []
+        for i in range(args.tenants):
+            user = User(email=f'load{i}@test.com', name=f'Load Tenant {i}', phone='+254700000000', role='tenant', is_verified=True)
+            db.session.add(user)
+            db.session.flush()
+            tokens.append(create_access_token(identity=str(user.id)))
+        db.session.commit()
+
+    session = requests.Session()
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def initiate(i):
+        started = time.perf_counter()
+        try:
+            resp = session.post(f'{api_url}/api/payments/initiate', json={
+                'amount': 100 + i % 50,
+                'phone_number': f'07{i % 100000000:08d}',
+                'payment_type': 'rent',
+                'description': 'Load test'
+            }, headers={'Authorization': f'Bearer {tokens[i % len(tokens)]}'}, timeout=(3.05, 60))
+            status = resp.status_code
+        except Exception as e:
+            status = type(e).__name__
+        with lock:
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+
+    print(f'Initiating {args.payments} STK pushes with {args.concurrency} concurrent clients...')
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(initiate, range(args.payments)))
+    push_elapsed = time.perf_counter() - started
+
+    print('Waiting for simulated callbacks...')
+    delivered = sim.wait_for_callbacks(timeout=args.timeout)
+    total_elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        payment_statuses = dict(db.session.query(Payment.status, db.func.count(Payment.id)).group_by(Payment.status).all())
+        completed = payment_statuses.get('completed', 0)
+        jobs = BackgroundJob.query.count()
+        ledger = MpesaCallback.query.count()
+        replays = db.session.query(db.func.coalesce(db.func.sum(MpesaCallback.duplicate_count), 0)).scalar()
+
+    with sim.lock:
+        accepted = [tx for tx in sim.transactions.values()]
+        successes = sum(1 for tx in accepted if tx.result_code == 0)
+
+    print()
+    print(f'initiate   {statuses}  in {push_elapsed:.1f}s ({args.payments / push_elapsed:.0f} req/s)')
+    print(f'initiate   {percentiles(latencies)}')
+    print(f'callbacks  {dict(sim.callback_statuses)}  errors {sim.stats["callback_errors"]}  '
+          f'duplicated {sim.stats["callbacks_duplicated"]}  all delivered: {delivered}')
+    print(f'push->ack  {percentiles(sim.callback_latencies)}')
+    print(f'daraja     {dict(sim.stats)}')
+    print(f'payments   {payment_statuses}')
+    print(f'ledger     {ledger} distinct callbacks, {replays} replays short-circuited')
+    print(f'total      {total_elapsed:.1f}s')
+
+    problems = []
+    if payment_statuses.get('processing'):
+        problems.append(f"{payment_statuses['processing']} payment(s) still processing")
+    if completed != successes:
+        problems.append(f'{completed} completed payments but {successes} successful transactions')
+    if jobs != completed * 2:
+        problems.append(f'{jobs} notification jobs for {completed} completed payments (expected {completed * 2})')
+
+    sim.stop()
+    server.shutdown()
+
+    if problems:
+        print('\nFAILED: ' + '; '.join(problems))
+        sys.exit(1)
+    print('\nOK: every payment settled exactly once')
+
+
+if __name__ == '__main__':
+    main()
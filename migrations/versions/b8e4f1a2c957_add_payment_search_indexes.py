@@ -0,0 +1,45 @@
+"""add payment search and keyset paging indexes
+
+Revision ID: b8e4f1a2c957
+Revises: f2c6a9d4e813
+Create Date: 2026-10-19 16:40:12.304118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4f1a2c957'
+down_revision = 'f2c6a9d4e813'
+branch_labels = None
+depends_on = None
+
+# (index, table, column) served by pg_trgm for ILIKE '%term%' searches
+TRIGRAM_INDEXES = [
+    ('ix_payments_receipt_trgm', 'payments', 'mpesa_receipt_number'),
+    ('ix_payments_phone_trgm', 'payments', 'phone_number'),
+    ('ix_users_name_trgm', 'users', 'name'),
+    ('ix_users_email_trgm', 'users', 'email'),
+]
+
+
+def upgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.create_index('ix_payments_created_at_id', ['created_at', 'id'], unique=False)
+
+    # Trigram indexes only exist in Postgres; SQLite searches fall back to scans
+    if op.get_context().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name, table, column in TRIGRAM_INDEXES:
+            op.create_index(name, table, [column], unique=False,
+                            postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        for name, table, _ in TRIGRAM_INDEXES:
+            op.drop_index(name, table_name=table)
+
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.drop_index('ix_payments_created_at_id')
@@ -0,0 +1,60 @@
+"""add signed agreement backup url and download lookup indexes
+
+Revision ID: d5f8b2e6a391
+Revises: c3e9a5f1d274
+Create Date: 2026-10-20 09:12:31.584102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f8b2e6a391'
+down_revision = 'c3e9a5f1d274'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tenant_applications', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('signed_agreement_backup_url', sa.String(length=500), nullable=True))
+        batch_op.create_index(batch_op.f('ix_tenant_applications_signed_agreement_url'), ['signed_agreement_url'], unique=False)
+
+    with op.batch_alter_table('upload_sessions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_upload_sessions_result_url'), ['result_url'], unique=False)
+
+    # Backfill from the submission audit logs, which held the backup URL until now
+    audit_logs = sa.table(
+        'audit_logs',
+        sa.column('action', sa.String),
+        sa.column('resource_id', sa.Integer),
+        sa.column('details', sa.JSON),
+    )
+    applications = sa.table(
+        'tenant_applications',
+        sa.column('id', sa.Integer),
+        sa.column('signed_agreement_backup_url', sa.String),
+    )
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(audit_logs.c.resource_id, audit_logs.c.details)
+        .where(audit_logs.c.action == 'application_submitted')
+    )
+    for application_id, details in rows.fetchall():
+        backup_url = (details or {}).get('signed_agreement_backup_url')
+        if application_id and backup_url:
+            bind.execute(
+                applications.update()
+                .where(applications.c.id == application_id)
+                .values(signed_agreement_backup_url=backup_url)
+            )
+
+
+def downgrade():
+    with op.batch_alter_table('upload_sessions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_upload_sessions_result_url'))
+
+    with op.batch_alter_table('tenant_applications', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tenant_applications_signed_agreement_url'))
+        batch_op.drop_column('signed_agreement_backup_url')
@@ -0,0 +1,181 @@
+"""Admin applications listing: eager loading and keyset paging.
+
+Run with: python -m pytest test_admin_applications.py
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from app import db
+from app.models.property import Property
+from app.models.tenant_application import TenantApplication
+from app.models.user import User
+from conftest import count_queries, headers_for
+
+BASE = datetime(2026, 10, 1, 9, 0, 0)
+
+
+@pytest.fixture
+def admin_headers(app):
+    admin = User(email='admin@test.com', name='Admin Reviewer', phone='+254700000000', role='admin', is_verified=True)
+    db.session.add(admin)
+    db.session.commit()
+    return headers_for(admin)
+
+
+def seed_applications(count, properties=3):
+    admin = User.query.filter_by(role='admin').first()
+    landlords = []
+    for i in range(properties):
+        landlord = User(email=f'landlord{i}@test.com', name=f'Landlord {i}', phone='+254700000001', role='landlord')
+        db.session.add(landlord)
+        landlords.append(landlord)
+    db.session.flush()
+    props = [
+        Property(title=f'Block {i}', description='d', property_type='apartment', city='Nairobi', address='a',
+                 available_from=BASE.date(), landlord_id=landlords[i].id, units=[{'type': '1BR', 'vacantCount': 5}])
+        for i in range(properties)
+    ]
+    db.session.add_all(props)
+    db.session.flush()
+    for i in range(count):
+        tenant = User(email=f'tenant{i}@test.com', name=f'Tenant {i}', phone='+254700000002', role='tenant')
+        db.session.add(tenant)
+        db.session.flush()
+        reviewed = i % 2 == 0
+        db.session.add(TenantApplication(
+            user_id=tenant.id, property_id=props[i % properties].id, first_name='T', last_name=str(i),
+            phone='0712345678', id_number=str(i), id_document_front='f', id_document_back='b',
+            signed_agreement_url='s', digital_consent=True,
+            status='approved' if reviewed else 'pending_approval',
+            reviewed_by=admin.id if reviewed else None,
+            # Pairs share a timestamp so paging must break ties on id
+            created_at=BASE + timedelta(hours=i // 2)
+        ))
+    db.session.commit()
+    db.session.expire_all()
+
+
+def test_query_count_does_not_grow_with_rows(app, admin_headers):
+    seed_applications(40)
+    client = app.test_client()
+
+    with count_queries() as small:
+        resp = client.get('/api/applications/admin?per_page=5', headers=admin_headers)
+    assert resp.status_code == 200
+    assert len(resp.json['applications']) == 5
+
+    db.session.expire_all()
+    with count_queries() as large:
+        resp = client.get('/api/applications/admin?per_page=40', headers=admin_headers)
+    applications = resp.json['applications']
+    assert len(applications) == 40
+    assert all(a['property_units'] and a['property_title'] for a in applications)
+    assert applications[0]['reviewer'] in (None, 'Admin Reviewer')
+
+    # Admin lookup + one joined select, however many rows are returned
+    assert len(small) == len(large) <= 2
+
+
+def test_keyset_pages_cover_every_row_once(app, admin_headers):
+    seed_applications(25)
+    client = app.test_client()
+
+    seen, cursor = [], ''
+    while True:
+        body = client.get(f'/api/applications/admin?per_page=7&cursor={cursor}', headers=admin_headers).json
+        seen += [a['id'] for a in body['applications']]
+        if not body['pagination']['has_more']:
+            break
+        cursor = body['pagination']['next_cursor']
+
+    expected = [a.id for a in TenantApplication.query.order_by(
+        TenantApplication.created_at.desc(), TenantApplication.id.desc())]
+    assert seen == expected
+
+
+def test_status_and_date_filters(app, admin_headers):
+    seed_applications(20)
+    client = app.test_client()
+
+    approved = client.get('/api/applications/admin?status=approved&per_page=100', headers=admin_headers).json
+    assert len(approved['applications']) == 10
+    assert {a['status'] for a in approved['applications']} == {'approved'}
+
+    # Hours 0-4 of BASE hold applications 0-9
+    window = client.get('/api/applications/admin?date_from=2026-10-01T00:00:00&date_to=2026-10-01T13:00:00&per_page=100',
+                        headers=admin_headers).json
+    assert len(window['applications']) == 10
+
+    assert client.get('/api/applications/admin?date_from=soon', headers=admin_headers).status_code == 400
+    assert client.get('/api/applications/admin?cursor=garbage', headers=admin_headers).status_code == 400
+
+
+def test_batch_decisions_never_oversubscribe(app, admin_headers):
+    from app.models.audit_log import AuditLog
+    seed_applications(8, properties=1)
+    pending = [a.id for a in TenantApplication.query.filter_by(status='pending_approval').order_by(TenantApplication.id)]
+    decided = TenantApplication.query.filter_by(status='approved').first().id
+    client = app.test_client()
+
+    # 4 pending applications for 5 vacancies, asked for 6 times over
+    decisions = [{'id': app_id, 'status': 'approved', 'assigned_unit': '1BR'} for app_id in pending]
+    decisions += [
+        {'id': pending[0], 'status': 'rejected'},
+        {'id': decided, 'status': 'approved', 'assigned_unit': '1BR'},
+        {'id': 99999, 'status': 'approved', 'assigned_unit': '1BR'},
+        {'id': pending[1], 'status': 'maybe'},
+    ]
+    resp = client.post('/api/applications/batch-status', json={'decisions': decisions}, headers=admin_headers)
+    assert resp.status_code == 200
+    body = resp.json
+    assert [r['ok'] for r in body['results']] == [True] * 4 + [False] * 4
+    assert body['results'][4]['message'] == 'Duplicate decision for this application'
+    assert body['results'][5]['message'] == 'Application is already approved'
+    assert body['results'][6]['message'] == 'Application not found'
+
+    prop = Property.query.one()
+    assert prop.units[0]['vacantCount'] == 1
+    assert prop.status != 'rented'
+    assert AuditLog.query.filter_by(action='application_approved').count() == 4
+
+    # The last vacancy goes to the first approval in the batch; the rest are refused
+    for i in range(3):
+        db.session.add(TenantApplication(
+            user_id=1, property_id=prop.id, first_name='Late', last_name=str(i), phone='0712345678',
+            id_number='x', id_document_front='f', id_document_back='b', signed_agreement_url='s',
+            digital_consent=True, status='pending_approval'))
+    db.session.commit()
+    late = [a.id for a in TenantApplication.query.filter_by(first_name='Late').order_by(TenantApplication.id)]
+    body = client.post('/api/applications/batch-status', headers=admin_headers, json={
+        'decisions': [{'id': app_id, 'status': 'approved', 'assigned_unit': '1BR'} for app_id in late]
+    }).json
+    assert [r['ok'] for r in body['results']] == [True, False, False]
+    assert body['results'][1]['message'] == 'No vacant units of type "1BR" remaining'
+    assert body['properties'][str(prop.id)] == {'updated_units': [{'type': '1BR', 'vacantCount': 0}],
+                                                'property_status': 'rented'}
+
+
+def test_batch_rejects_bad_payloads(app, admin_headers):
+    client = app.test_client()
+    assert client.post('/api/applications/batch-status', json={}, headers=admin_headers).status_code == 400
+    too_many = [{'id': i, 'status': 'rejected'} for i in range(1000)]
+    assert client.post('/api/applications/batch-status', json={'decisions': too_many},
+                       headers=admin_headers).status_code == 400
+
+
+def test_single_decision_is_refused_once_decided(app, admin_headers):
+    seed_applications(8, properties=1)
+    app_id = TenantApplication.query.filter_by(status='pending_approval').first().id
+    client = app.test_client()
+    url = f'/api/applications/{app_id}/status'
+
+    resp = client.put(url, json={'status': 'approved', 'assigned_unit': '1BR'}, headers=admin_headers)
+    assert resp.status_code == 200
+    assert resp.json['updated_units'] == [{'type': '1BR', 'vacantCount': 4}]
+
+    # A repeated approval must not take a second vacancy, nor may a rejection release it
+    again = client.put(url, json={'status': 'approved', 'assigned_unit': '1BR'}, headers=admin_headers)
+    assert again.status_code == 409
+    assert again.json['message'] == 'Application is already approved'
+    assert client.put(url, json={'status': 'rejected'}, headers=admin_headers).status_code == 409
+    assert Property.query.one().units[0]['vacantCount'] == 4
@@ -0,0 +1,94 @@
+"""Admin dashboard snapshot: single query, growth figures and caching.
+
+Run with: python -m pytest test_admin_reports.py
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from app import db
+from app.api.admin_reports import build_dashboard_snapshot
+from app.models.payment import Payment
+from app.models.payment_daily_total import PaymentDailyTotal
+from app.models.property import Property
+from app.models.user import User
+from conftest import count_queries, headers_for
+
+TODAY = date(2026, 10, 15)
+
+
+@pytest.fixture
+def admin(app):
+    admin = User(email='admin@test.com', name='Admin', phone='+254700000000', role='admin')
+    landlord = User(email='owner@test.com', name='Owner', phone='+254700000001', role='landlord',
+                    verification_status='verified')
+    tenant = User(email='tenant@test.com', name='Jane Tenant', phone='+254700000003', role='tenant')
+    db.session.add_all([admin, landlord, tenant])
+    db.session.flush()
+    db.session.add(Property(title='Block A', description='d', property_type='house', city='Nairobi', address='a',
+                            available_from=TODAY, landlord_id=landlord.id))
+    for i in range(12):
+        db.session.add(Payment(user_id=tenant.id, amount=100 + i, payment_type='rent', phone_number=tenant.phone,
+                               status='completed', created_at=datetime(2026, 10, 1) + timedelta(hours=i)))
+    db.session.commit()
+    return admin
+
+
+def add_total(day, amount, payment_type='rent', count=1, status='completed'):
+    db.session.add(PaymentDailyTotal(day=day, payment_type=payment_type, status=status,
+                                     payment_count=count, total_amount=amount))
+    db.session.commit()
+
+
+def test_snapshot_is_one_query(app, admin):
+    add_total(date(2026, 10, 3), 1500, count=3)
+    add_total(date(2026, 10, 4), 400, payment_type='agreement_fee', count=2)
+    add_total(date(2026, 10, 4), 999, status='failed')
+
+    with count_queries() as statements:
+        snapshot = build_dashboard_snapshot(TODAY)
+    assert len(statements) == 1
+
+    assert snapshot['totalPayments'] == 1900
+    assert snapshot['activeLandlords'] == 1 and snapshot['totalProperties'] == 1
+    assert snapshot['distribution'] == {'rent': 3, 'agreement_fee': 2}
+    recent = snapshot['recentTransactions']
+    assert [t['amount'] for t in recent] == [111 - i for i in range(10)]
+    assert recent[0]['tenant_name'] == 'Jane Tenant'
+
+
+def test_snapshot_of_an_empty_database(app):
+    snapshot = build_dashboard_snapshot(TODAY)
+    assert snapshot['totalPayments'] == 0 and snapshot['distribution'] == {}
+    assert snapshot['recentTransactions'] == []
+    assert snapshot['monthlyGrowth'] == 0 and snapshot['growth']['revenue'] is None
+
+
+def test_growth_compares_the_same_days_of_last_month(app, admin):
+    add_total(date(2026, 10, 3), 1500)
+    add_total(date(2026, 9, 10), 1000)
+    add_total(date(2026, 9, 20), 5000)  # after the 15th: outside the compared span
+
+    snapshot = build_dashboard_snapshot(TODAY)
+    assert snapshot['monthlyGrowth'] == 50.0
+    assert snapshot['growth']['revenue'] == 50.0
+
+
+def test_snapshot_is_cached_until_fresh(app, admin):
+    client = app.test_client()
+    headers = headers_for(admin)
+    add_total(date.today(), 1000)
+
+    first = client.get('/api/admin/reports', headers=headers).json
+    add_total(date.today(), 500, payment_type='deposit')
+    with count_queries() as statements:
+        cached = client.get('/api/admin/reports', headers=headers).json
+    assert len(statements) == 1  # only the admin lookup
+    assert cached == first and cached['totalPayments'] == 1000
+
+    fresh = client.get('/api/admin/reports?fresh=1', headers=headers).json
+    assert fresh['totalPayments'] == 1500
+    # The rebuilt snapshot replaces the cached one
+    assert client.get('/api/admin/reports', headers=headers).json['totalPayments'] == 1500
+
+    tenant = User.query.filter_by(role='tenant').one()
+    assert client.get('/api/admin/reports', headers=headers_for(tenant)).status_code == 403
@@ -0,0 +1,103 @@
+"""On-disk download cache: expiry, LRU eviction order and the size cap.
+
+Run with: python -m pytest test_download_cache.py
+"""
+import os
+import time
+
+import pytest
+from app.services.download_cache import DownloadCache
+
+
+class Upstream:
+    """The parts of a `requests` response the cache reads"""
+
+    def __init__(self, body, content_length=True):
+        self.body = body
+        self.headers = {'Content-Type': 'application/pdf', 'ETag': '"v1"'}
+        if content_length:
+            self.headers['Content-Length'] = str(len(body))
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DownloadCache(str(tmp_path), max_bytes=250, ttl=60)
+
+
+def fill(cache, url, body=b'x' * 100, **kwargs):
+    assert b''.join(cache.fill(url, Upstream(body, **kwargs), chunk_size=32)) == body
+
+
+def age(cache, url, body_seconds=None, stored_seconds=None):
+    """Backdate an entry's last hit and / or its store time"""
+    body_path, meta_path = cache._paths(url)
+    now = time.time()
+    if body_seconds is not None:
+        os.utime(body_path, (now - body_seconds, now - body_seconds))
+    if stored_seconds is not None:
+        os.utime(meta_path, (now - stored_seconds, now - stored_seconds))
+
+
+def cached_urls(cache, *urls):
+    return [url for url in urls if os.path.exists(cache._paths(url)[0])]
+
+
+def test_hit_returns_the_stored_body(cache):
+    fill(cache, 'https://ucarecdn.com/a/')
+    entry = cache.get('HTTPS://ucarecdn.com:443/a/')
+    assert entry.size == 100 and entry.content_type == 'application/pdf'
+    with open(entry.path, 'rb') as fh:
+        assert fh.read() == b'x' * 100
+    assert cache.get('https://ucarecdn.com/b/') is None
+
+
+def test_least_recently_used_entries_are_evicted_first(cache):
+    a, b, c = (f'https://ucarecdn.com/{name}/' for name in 'abc')
+    fill(cache, a)
+    fill(cache, b)
+    age(cache, a, body_seconds=30)
+    age(cache, b, body_seconds=20)
+    assert cache.get(a)  # a is now the most recently used
+
+    fill(cache, c)  # 300 bytes > 250: one entry has to go
+    assert cached_urls(cache, a, b, c) == [a, c]
+
+
+def test_size_cap(cache):
+    urls = [f'https://ucarecdn.com/{i}/' for i in range(5)]
+    for i, url in enumerate(urls):
+        fill(cache, url, body=b'y' * 60)
+        age(cache, url, body_seconds=50 - i)
+    total = sum(os.path.getsize(os.path.join(cache.directory, name))
+                for name in os.listdir(cache.directory) if name.endswith('.bin'))
+    assert total <= 250
+    assert cached_urls(cache, *urls) == urls[1:]
+
+    # A body larger than the whole cache is streamed through but never stored,
+    # whether or not upstream announced its length
+    fill(cache, 'https://ucarecdn.com/big/', body=b'z' * 300)
+    fill(cache, 'https://ucarecdn.com/big-chunked/', body=b'z' * 300, content_length=False)
+    assert cached_urls(cache, 'https://ucarecdn.com/big/', 'https://ucarecdn.com/big-chunked/') == []
+    assert not [name for name in os.listdir(cache.directory) if name.endswith('.tmp')]
+
+
+def test_entries_expire_from_when_they_were_stored(cache):
+    url = 'https://ucarecdn.com/a/'
+    fill(cache, url)
+    age(cache, url, stored_seconds=50)
+    assert cache.get(url)  # a hit does not extend the entry's life
+
+    age(cache, url, stored_seconds=61)
+    assert cache.get(url) is None
+    assert cached_urls(cache, url) == []
+
+    # Eviction applies the same rule, even to an entry that was just hit
+    fill(cache, url)
+    assert cache.get(url)
+    age(cache, url, stored_seconds=61)
+    cache.evict()
+    assert cached_urls(cache, url) == []
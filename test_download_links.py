@@ -0,0 +1,126 @@
+"""Signed download links: who may mint them, expiry, tampering and web-server offload.
+
+Run with: python -m pytest test_download_links.py
+"""
+import time
+from datetime import date
+
+import pytest
+from app import db
+from app.models.document import Document
+from app.models.property import Property
+from app.models.tenant_application import TenantApplication
+from app.models.user import User
+from conftest import app_context, headers_for
+
+SCAN = b'\xff\xd8 id scan'
+LOCAL_URL = 'http://localhost/api/files/tenant_kyc/a1b2.jpg'
+
+
+@pytest.fixture
+def app(tmp_path):
+    (tmp_path / 'tenant_kyc').mkdir()
+    (tmp_path / 'tenant_kyc' / 'a1b2.jpg').write_bytes(SCAN)
+    with app_context(STORAGE_BACKEND='local', LOCAL_STORAGE_DIR=str(tmp_path),
+                     DOWNLOAD_CACHE_DIR=str(tmp_path / 'cache')) as app:
+        yield app
+
+
+@pytest.fixture
+def records(app):
+    people = {role: User(email=f'{role}@test.com', name=role.title(), phone=f'+25470000000{i}', role=role)
+              for i, role in enumerate(('admin', 'landlord', 'tenant'))}
+    people['stranger'] = User(email='stranger@test.com', name='Stranger', phone='+254700000009', role='tenant')
+    db.session.add_all(people.values())
+    db.session.flush()
+    listing = Property(title='Block A', description='d', property_type='house', city='Nairobi', address='a',
+                       available_from=date.today(), landlord_id=people['landlord'].id)
+    db.session.add(listing)
+    db.session.flush()
+    document = Document(user_id=people['tenant'].id, name='National ID', document_type='id_document',
+                        file_url=LOCAL_URL)
+    application = TenantApplication(user_id=people['tenant'].id, property_id=listing.id, first_name='Jane',
+                                    last_name='Doe', phone='0712345678', id_number='12345678',
+                                    id_document_front=LOCAL_URL, id_document_back='https://ucarecdn.com/back/',
+                                    signed_agreement_url='https://ucarecdn.com/agreement/')
+    db.session.add_all([document, application])
+    db.session.commit()
+    return {**people, 'document': document, 'application': application}
+
+
+def mint(app, user, **body):
+    return app.test_client().post('/api/download/links', json=body, headers=headers_for(user))
+
+
+def token_of(resp):
+    assert resp.status_code == 201
+    return resp.json['url'].rsplit('/', 1)[1]
+
+
+def redeem(app, token):
+    return app.test_client().get(f'/api/download/signed/{token}')
+
+
+def test_document_links_need_owner_access_or_admin(app, records):
+    document_id = records['document'].id
+    # The owner only once access has been granted
+    assert mint(app, records['tenant'], document_id=document_id).status_code == 403
+    records['document'].is_accessible = True
+    db.session.commit()
+    assert mint(app, records['tenant'], document_id=document_id).status_code == 201
+
+    assert mint(app, records['stranger'], document_id=document_id).status_code == 403
+    assert mint(app, records['landlord'], document_id=document_id).status_code == 403
+    assert mint(app, records['admin'], document_id=document_id).status_code == 201
+    assert mint(app, records['admin'], document_id=9999).status_code == 404
+
+
+def test_application_links_for_applicant_landlord_and_admin(app, records):
+    body = {'application_id': records['application'].id, 'field': 'id_document_front'}
+    assert [mint(app, records[role], **body).status_code for role in ('tenant', 'landlord', 'admin', 'stranger')] \
+        == [201, 201, 201, 403]
+
+    resp = mint(app, records['tenant'], application_id=records['application'].id)
+    assert resp.status_code == 201 and 'expires_at' in resp.json  # signed_agreement by default
+    assert mint(app, records['tenant'], application_id=records['application'].id, field='password').status_code == 400
+    assert mint(app, records['tenant']).status_code == 400
+
+
+def test_redeeming_needs_no_login(app, records):
+    token = token_of(mint(app, records['tenant'], application_id=records['application'].id,
+                          field='id_document_front'))
+    resp = redeem(app, token)
+    assert resp.status_code == 200 and resp.data == SCAN
+    assert resp.headers['Content-Disposition'] == 'attachment; filename=id_document_front_1.jpg'
+
+    # Remote files are redirected to the CDN, never streamed through the worker
+    token = token_of(mint(app, records['tenant'], application_id=records['application'].id))
+    resp = redeem(app, token)
+    assert resp.status_code == 302 and resp.headers['Location'] == 'https://ucarecdn.com/agreement/'
+    assert resp.headers['Cache-Control'] == 'private, no-store'
+
+
+def test_tampered_links_are_refused(app, records):
+    token = token_of(mint(app, records['admin'], document_id=records['document'].id))
+    payload, timestamp, signature = token.split('.')
+    flipped = signature[:-1] + ('A' if signature[-1] != 'A' else 'B')
+    assert redeem(app, f'{payload}.{timestamp}.{flipped}').status_code == 403
+    assert redeem(app, 'not-a-token').status_code == 403
+
+
+def test_expired_links_are_gone(app, records):
+    token = token_of(mint(app, records['admin'], document_id=records['document'].id))
+    app.config['DOWNLOAD_LINK_TTL'] = 0
+    time.sleep(1.05)  # tokens carry whole-second timestamps
+    resp = redeem(app, token)
+    assert resp.status_code == 410 and resp.json['message'] == 'Download link has expired'
+
+
+def test_local_files_are_offloaded_to_nginx(app, records):
+    app.config['DOWNLOAD_OFFLOAD'] = 'x-accel'
+    token = token_of(mint(app, records['admin'], document_id=records['document'].id))
+    resp = redeem(app, token)
+    assert resp.status_code == 200 and resp.data == b''
+    assert resp.headers['X-Accel-Redirect'] == '/internal/storage/tenant_kyc/a1b2.jpg'
+    assert resp.headers['Content-Disposition'] == 'attachment; filename="National ID.jpg"'
+    assert resp.headers['Cache-Control'] == 'private, no-store'
@@ -0,0 +1,173 @@
+"""Range / If-Range handling in the download proxy, against a local stand-in CDN.
+
+Run with: python -m pytest test_download_range.py
+"""
+import re
+from datetime import date
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from app import db
+from app.models.user import User
+from app.api.download import _find_backup_url
+from app.models.property import Property
+from app.models.tenant_application import TenantApplication
+from conftest import app_context, count_queries, headers_for
+
+PAYLOAD = bytes(range(256)) * 40  # 10 KB
+ETAG = '"v1-payload"'
+
+
+class StandInCDN(BaseHTTPRequestHandler):
+    """Minimal CDN that honours Range and If-Range like ucarecdn / Cloudinary"""
+    requests_seen = []
+
+    def do_GET(self):
+        StandInCDN.requests_seen.append({'path': self.path, 'range': self.headers.get('Range')})
+        range_header = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+
+        match = re.match(r'bytes=(\d+)-(\d*)$', range_header or '')
+        if match and (not if_range or if_range == ETAG):
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(PAYLOAD) - 1
+            if start >= len(PAYLOAD):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(PAYLOAD)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            end = min(end, len(PAYLOAD) - 1)
+            body = PAYLOAD[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(PAYLOAD)}')
+        else:
+            body = PAYLOAD
+            self.send_response(200)
+
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', ETAG)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def cdn():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInCDN)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    cache_dir = tmp_path_factory.mktemp('download_cache')
+    with app_context(DOWNLOAD_ALLOWED_HOSTS=['127.0.0.1'], DOWNLOAD_CACHE_DIR=str(cache_dir)) as app:
+        user = User(email='range@test.com', name='Range Tester', phone='+254700000000', role='admin', is_verified=True)
+        db.session.add(user)
+        db.session.commit()
+        test_client = app.test_client()
+        test_client.environ_base['HTTP_AUTHORIZATION'] = headers_for(user)['Authorization']
+        yield test_client
+
+
+def download(client, url, **headers):
+    return client.get('/api/download', query_string={'url': url, 'filename': 'lease.pdf'}, headers=headers)
+
+
+def test_range_is_passed_through_to_cdn_on_miss(client, cdn):
+    resp = download(client, f'{cdn}/lease-a.pdf', Range='bytes=100-199')
+
+    assert resp.status_code == 206
+    assert resp.data == PAYLOAD[100:200]
+    assert resp.headers['Content-Range'] == f'bytes 100-199/{len(PAYLOAD)}'
+    assert resp.headers['Accept-Ranges'] == 'bytes'
+    assert StandInCDN.requests_seen[-1]['range'] == 'bytes=100-199'
+
+
+def test_full_download_advertises_ranges(client, cdn):
+    resp = download(client, f'{cdn}/lease-b.pdf')
+
+    assert resp.status_code == 200
+    assert resp.data == PAYLOAD
+    assert resp.headers['Accept-Ranges'] == 'bytes'
+    assert resp.headers['Content-Length'] == str(len(PAYLOAD))
+    assert 'no-cache' not in resp.headers['Cache-Control']
+
+
+def test_range_is_answered_from_cache_after_full_download(client, cdn):
+    url = f'{cdn}/lease-c.pdf'
+    assert download(client, url).data == PAYLOAD
+    seen = len(StandInCDN.requests_seen)
+
+    resp = download(client, url, Range='bytes=5000-')
+
+    assert resp.status_code == 206
+    assert resp.data == PAYLOAD[5000:]
+    assert resp.headers['Content-Range'] == f'bytes 5000-{len(PAYLOAD) - 1}/{len(PAYLOAD)}'
+    assert len(StandInCDN.requests_seen) == seen  # served locally
+
+
+def test_if_range_with_stale_validator_returns_full_body(client, cdn):
+    url = f'{cdn}/lease-d.pdf'
+    download(client, url)
+
+    resp = download(client, url, **{'Range': 'bytes=0-9', 'If-Range': '"old-version"'})
+
+    assert resp.status_code == 200
+    assert resp.data == PAYLOAD
+
+
+def test_if_range_with_current_validator_returns_partial(client, cdn):
+    url = f'{cdn}/lease-e.pdf'
+    download(client, url)
+
+    resp = download(client, url, **{'Range': 'bytes=0-9', 'If-Range': ETAG})
+
+    assert resp.status_code == 206
+    assert resp.data == PAYLOAD[:10]
+
+
+def test_unsatisfiable_range(client, cdn):
+    resp = download(client, f'{cdn}/lease-f.pdf', Range=f'bytes={len(PAYLOAD) + 10}-')
+
+    assert resp.status_code == 416
+
+
+def test_cache_hit_does_not_look_up_the_backup(client, cdn):
+    url = f'{cdn}/lease-g.pdf'
+    assert download(client, url).data == PAYLOAD
+
+    with count_queries() as statements:
+        resp = download(client, url)
+
+    assert resp.status_code == 200
+    assert statements == []
+
+
+def test_backup_url_is_read_from_the_application(client, cdn):
+    user = User.query.first()
+    prop = Property(title='Block A', description='d', property_type='house', city='Nairobi', address='a',
+                    available_from=date.today(), landlord_id=user.id)
+    db.session.add(prop)
+    db.session.flush()
+    db.session.add(TenantApplication(
+        user_id=user.id, property_id=prop.id, first_name='T', last_name='U', phone='0712345678',
+        id_number='1', id_document_front='f', id_document_back='b', signed_agreement_url=f'{cdn}/lease-h.pdf',
+        signed_agreement_backup_url=f'{cdn}/backup/lease-h.pdf', digital_consent=True))
+    db.session.commit()
+
+    assert _find_backup_url(f'{cdn}/lease-h.pdf') == f'{cdn}/backup/lease-h.pdf'
+    assert _find_backup_url(f'{cdn}/lease-i.pdf') is None
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
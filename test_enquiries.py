@@ -0,0 +1,105 @@
+"""Enquiry inboxes: eager loading, keyset paging and landlord scoping.
+
+Run with: python -m pytest test_enquiries.py
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from app import db
+from app.models.enquiry import Enquiry
+from app.models.property import Property
+from app.models.user import User
+from conftest import count_queries, headers_for
+
+BASE = datetime(2026, 10, 1, 9, 0, 0)
+
+
+@pytest.fixture
+def users(app):
+    admin = User(email='admin@test.com', name='Admin', phone='+254700000000', role='admin')
+    owner = User(email='owner@test.com', name='Owner', phone='+254700000001', role='landlord')
+    other = User(email='other@test.com', name='Other', phone='+254700000002', role='landlord')
+    tenant = User(email='tenant@test.com', name='Tenant', phone='+254700000003', role='tenant')
+    db.session.add_all([admin, owner, other, tenant])
+    db.session.commit()
+    return {'admin': admin, 'owner': owner, 'other': other, 'tenant': tenant}
+
+
+def seed_enquiries(users, count):
+    props = [
+        Property(title=f'Block {i}', description='d', property_type='apartment', city='Nairobi', address='a',
+                 available_from=date.today(), landlord_id=landlord.id)
+        for i, landlord in enumerate([users['owner'], users['owner'], users['other']])
+    ]
+    db.session.add_all(props)
+    db.session.flush()
+    for i in range(count):
+        guest = i % 2 == 1
+        db.session.add(Enquiry(
+            property_id=props[i % 3].id, user_id=None if guest else users['tenant'].id,
+            name='Guest' if guest else None, email='guest@test.com' if guest else None,
+            message=f'Is it available? #{i}', status='resolved' if i % 4 == 0 else 'new',
+            created_at=BASE + timedelta(minutes=i // 2)  # two per minute: the cursor needs the id
+        ))
+    db.session.commit()
+    db.session.expire_all()
+    return props
+
+
+def get_counted(client, url, headers):
+    with count_queries() as statements:
+        resp = client.get(url, headers=headers)
+    db.session.expire_all()
+    return resp, len(statements)
+
+
+def test_admin_inbox_query_count_is_constant(app, users):
+    seed_enquiries(users, 30)
+    client = app.test_client()
+
+    small, small_count = get_counted(client, '/api/enquiries/admin?per_page=3', headers_for(users['admin']))
+    large, large_count = get_counted(client, '/api/enquiries/admin?per_page=30', headers_for(users['admin']))
+    assert len(small.json['enquiries']) == 3
+    assert len(large.json['enquiries']) == 30
+    assert small_count == large_count
+
+    first = large.json['enquiries'][0]
+    assert first['property']['location'] == 'Nairobi'
+    assert first['property']['landlord']['name'] in ('Owner', 'Other')
+
+
+def test_admin_inbox_pages_and_filters(app, users):
+    props = seed_enquiries(users, 21)
+    client = app.test_client()
+    headers = headers_for(users['admin'])
+
+    seen, cursor = [], ''
+    while True:
+        body = client.get(f'/api/enquiries/admin?per_page=4&cursor={cursor}', headers=headers).json
+        seen += [e['id'] for e in body['enquiries']]
+        cursor = body['pagination']['next_cursor']
+        if not cursor:
+            break
+    assert seen == [e.id for e in Enquiry.query.order_by(Enquiry.created_at.desc(), Enquiry.id.desc())]
+
+    resolved = client.get('/api/enquiries/admin?status=resolved', headers=headers).json['enquiries']
+    assert len(resolved) == 6 and {e['status'] for e in resolved} == {'resolved'}
+    by_property = client.get(f'/api/enquiries/admin?property_id={props[2].id}', headers=headers).json['enquiries']
+    assert len(by_property) == 7
+    assert client.get('/api/enquiries/admin?cursor=nope', headers=headers).status_code == 400
+
+
+def test_landlord_inbox_only_shows_own_properties(app, users):
+    props = seed_enquiries(users, 12)
+    client = app.test_client()
+
+    owner = client.get('/api/enquiries/landlord?per_page=100', headers=headers_for(users['owner'])).json
+    assert len(owner['enquiries']) == 8
+    assert {e['property_id'] for e in owner['enquiries']} == {props[0].id, props[1].id}
+
+    # Filtering by someone else's property yields nothing rather than their enquiries
+    other_property = client.get(f'/api/enquiries/landlord?property_id={props[2].id}',
+                                headers=headers_for(users['owner'])).json
+    assert other_property['enquiries'] == []
+
+    assert client.get('/api/enquiries/landlord', headers=headers_for(users['tenant'])).status_code == 403
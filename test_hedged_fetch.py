@@ -0,0 +1,94 @@
+"""Hedged CDN fetch: hedging a slow primary and failing over from a broken one.
+
+Run with: python -m pytest test_hedged_fetch.py
+"""
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from app.services.hedged_fetch import hedged_get
+
+
+class StandInCDN(BaseHTTPRequestHandler):
+    """/slow/... answers after a second, /error/... with 500, /gone/... with 404, anything else at once"""
+    requests_seen = []
+
+    def do_GET(self):
+        StandInCDN.requests_seen.append(self.path)
+        status = 200
+        if self.path.startswith('/slow/'):
+            time.sleep(1)
+        elif self.path.startswith('/error/'):
+            status = 500
+        elif self.path.startswith('/gone/'):
+            status = 404
+        body = self.path.encode()
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def cdn():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInCDN)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def refused():
+    """A URL nothing listens on"""
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return f'http://127.0.0.1:{port}/file.pdf'
+
+
+def fetch(primary, backup, hedge_after):
+    started = time.monotonic()
+    resp, url = hedged_get(primary, backup_url=backup, hedge_after=hedge_after, timeout=5)
+    return resp, url, time.monotonic() - started
+
+
+def test_fast_primary_is_not_hedged(cdn):
+    seen = len(StandInCDN.requests_seen)
+    resp, url, _ = fetch(f'{cdn}/a.pdf', f'{cdn}/backup/a.pdf', hedge_after=0.5)
+    assert resp.status_code == 200 and url == f'{cdn}/a.pdf'
+    assert StandInCDN.requests_seen[seen:] == ['/a.pdf']
+
+
+def test_slow_primary_is_hedged_with_the_backup(cdn):
+    resp, url, elapsed = fetch(f'{cdn}/slow/b.pdf', f'{cdn}/backup/b.pdf', hedge_after=0.1)
+    assert url == f'{cdn}/backup/b.pdf'
+    assert resp.content == b'/backup/b.pdf'
+    assert elapsed < 0.9  # did not wait for the slow primary
+
+
+def test_erroring_primary_fails_over_at_once(cdn, refused):
+    resp, url, elapsed = fetch(f'{cdn}/error/c.pdf', f'{cdn}/backup/c.pdf', hedge_after=5)
+    assert url == f'{cdn}/backup/c.pdf' and resp.status_code == 200
+    assert elapsed < 2  # did not wait out the hedge delay
+
+    resp, url, _ = fetch(refused, f'{cdn}/backup/d.pdf', hedge_after=5)
+    assert url == f'{cdn}/backup/d.pdf' and resp.status_code == 200
+
+
+def test_when_everything_fails_the_last_response_names_its_url(cdn, refused):
+    resp, url, _ = fetch(f'{cdn}/error/e.pdf', f'{cdn}/gone/e.pdf', hedge_after=5)
+    assert resp.status_code == 404 and url == f'{cdn}/gone/e.pdf'
+
+    resp, url, _ = fetch(f'{cdn}/gone/f.pdf', refused, hedge_after=5)
+    assert resp.status_code == 404 and url == f'{cdn}/gone/f.pdf'
+
+    with pytest.raises(Exception):
+        fetch(refused, refused, hedge_after=5)
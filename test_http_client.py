@@ -0,0 +1,85 @@
+"""Pooled outbound HTTP session: only connection failures are retried.
+
+Run with: python -m pytest test_http_client.py
+"""
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from app.utils.http_client import create_session
+
+
+class StandInProvider(BaseHTTPRequestHandler):
+    """/error answers 500, /drop hangs up without answering, anything else 200"""
+    hits = []
+
+    def handle_one_request(self):
+        super().handle_one_request()
+        self.close_connection = True
+
+    def _answer(self):
+        StandInProvider.hits.append((self.command, self.path))
+        if self.path == '/drop':
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        status = 500 if self.path == '/error' else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_GET = do_POST = _answer
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def provider():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInProvider)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def hits_for(call):
+    seen = len(StandInProvider.hits)
+    call()
+    return StandInProvider.hits[seen:]
+
+
+def test_only_connect_errors_are_retried():
+    retries = create_session().get_adapter('https://sandbox.safaricom.co.ke').max_retries
+    assert (retries.connect, retries.read, retries.status, retries.other) == (2, 0, 0, 0)
+
+
+def test_server_errors_are_not_retried(provider):
+    session = create_session()
+    responses = []
+    assert hits_for(lambda: responses.append(session.get(f'{provider}/error'))) == [('GET', '/error')]
+    assert responses[0].status_code == 500
+    assert hits_for(lambda: session.post(f'{provider}/error', json={})) == [('POST', '/error')]
+
+
+def test_dropped_requests_are_not_retried(provider):
+    # The request reached the server: retrying a POST could send a second STK push
+    session = create_session()
+
+    def post():
+        with pytest.raises(requests.ConnectionError):
+            session.post(f'{provider}/drop', json={'Amount': 1})
+    assert hits_for(post) == [('POST', '/drop')]
+
+
+def test_refused_connections_are_retried_then_raised():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    with pytest.raises(requests.ConnectionError) as error:
+        create_session().post(f'http://127.0.0.1:{port}/stkpush', json={}, timeout=2)
+    assert 'Max retries exceeded' in str(error.value)
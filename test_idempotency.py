@@ -0,0 +1,106 @@
+"""Idempotency-Key replays on multipart submission endpoints.
+
+Run with: python -m pytest test_idempotency.py
+"""
+import io
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+from app import db
+from app.models.idempotency_record import IdempotencyRecord
+from app.models.property import Property
+from app.models.tenant_application import TenantApplication
+from app.models.user import User
+from conftest import app_context, headers_for
+
+
+@pytest.fixture
+def app(tmp_path):
+    with app_context(STORAGE_BACKEND='local', STORAGE_BACKUP_BACKEND='', LOCAL_STORAGE_DIR=str(tmp_path)) as app:
+        yield app
+
+
+@pytest.fixture
+def tenant(app):
+    landlord = User(email='landlord@test.com', name='Landlord', phone='+254700000001', role='landlord')
+    tenant = User(email='tenant@test.com', name='Tenant', phone='+254700000002', role='tenant')
+    db.session.add_all([landlord, tenant])
+    db.session.flush()
+    db.session.add(Property(title='Block A', description='d', property_type='apartment', city='Nairobi',
+                            address='a', available_from=date.today(), landlord_id=landlord.id))
+    db.session.commit()
+    return tenant
+
+
+def submit(client, user, key=None, id_number='12345678'):
+    headers = headers_for(user)
+    if key:
+        headers['Idempotency-Key'] = key
+    data = {
+        'property_id': str(Property.query.one().id), 'digital_consent': 'true', 'first_name': 'Jane',
+        'last_name': 'Doe', 'phone': '0712345678', 'id_number': id_number,
+        'id_document_front': (io.BytesIO(b'front'), 'front.jpg'),
+        'id_document_back': (io.BytesIO(b'back'), 'back.jpg'),
+        'signed_agreement': (io.BytesIO(b'%PDF-1.4 signed'), 'agreement.pdf'),
+    }
+    return client.post('/api/applications', data=data, headers=headers, content_type='multipart/form-data')
+
+
+def stored_files(app):
+    return sum(len(files) for _, _, files in os.walk(app.config['LOCAL_STORAGE_DIR']))
+
+
+def test_retry_replays_first_response(app, tenant):
+    client = app.test_client()
+    first = submit(client, tenant, key='retry-1')
+    assert first.status_code == 201
+    uploads = stored_files(app)
+
+    retry = submit(client, tenant, key='retry-1')
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.json == first.json
+    assert TenantApplication.query.count() == 1
+    assert stored_files(app) == uploads
+
+    # A new key is a new submission
+    assert submit(client, tenant, key='retry-2').status_code == 201
+    assert TenantApplication.query.count() == 2
+
+
+def test_reused_key_with_different_request_is_rejected(app, tenant):
+    client = app.test_client()
+    assert submit(client, tenant, key='k').status_code == 201
+    assert submit(client, tenant, key='k', id_number='87654321').status_code == 422
+
+
+def test_in_flight_key_conflicts_and_abandoned_key_is_reclaimed(app, tenant):
+    client = app.test_client()
+    assert submit(client, tenant, key='k').status_code == 201
+
+    # Pretend the first attempt is still running on another worker
+    record = IdempotencyRecord.query.one()
+    record.status, record.expires_at = 'in_progress', datetime.utcnow() + timedelta(minutes=5)
+    db.session.commit()
+    busy = submit(client, tenant, key='k')
+    assert busy.status_code == 409
+    assert busy.headers['Retry-After'] == '1'
+
+    # That worker died: once the claim expires the key can be used again
+    record.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert submit(client, tenant, key='k').status_code == 201
+    assert IdempotencyRecord.query.one().status == 'completed'
+
+
+def test_failed_request_releases_key(app, tenant):
+    client = app.test_client()
+    headers = {**headers_for(tenant), 'Idempotency-Key': 'k'}
+    resp = client.post('/api/applications', data={'digital_consent': 'false'}, headers=headers)
+    assert resp.status_code == 400
+    assert IdempotencyRecord.query.count() == 0
+
+    assert submit(client, tenant, key='k').status_code == 201
+    assert IdempotencyRecord.query.one().status == 'completed'
+    assert IdempotencyRecord.purge_expired(now=datetime.utcnow() + timedelta(days=2)) == 1
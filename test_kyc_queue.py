@@ -0,0 +1,72 @@
+"""Admin KYC review queues: paging and a constant number of queries per page.
+
+Run with: python -m pytest test_kyc_queue.py
+"""
+import pytest
+from app import db
+from app.models.document import Document
+from app.models.user import User
+from conftest import count_queries, headers_for
+
+
+@pytest.fixture
+def admin(app):
+    admin = User(email='admin@test.com', name='Admin', phone='+254700000000', role='admin')
+    db.session.add(admin)
+    db.session.commit()
+    return admin
+
+
+def add_landlords(count, start=0):
+    for i in range(start, start + count):
+        landlord = User(email=f'landlord{i}@test.com', name=f'Landlord {i}', phone=f'+2547100{i:05d}',
+                        role='landlord', verification_status='pending', id_number=f'ID{i}')
+        db.session.add(landlord)
+        db.session.flush()
+        for side in ('front', 'back'):
+            db.session.add(Document(user_id=landlord.id, name=f'ID {side}', document_type='id_document',
+                                    file_url=f'https://ucarecdn.com/{i}-{side}/', status='pending'))
+    db.session.commit()
+
+
+def queries_for_page(client, admin, path, per_page=20):
+    headers = headers_for(admin)  # minted outside the counted block
+    with count_queries() as statements:
+        resp = client.get(path, query_string={'per_page': per_page}, headers=headers)
+    assert resp.status_code == 200
+    return len(statements), resp.json
+
+
+@pytest.mark.parametrize('path', ['/api/users/kyc/pending', '/api/users/kyc/all'])
+def test_query_count_does_not_grow_with_the_page(app, admin, path):
+    client = app.test_client()
+    add_landlords(2)
+    small, body = queries_for_page(client, admin, path)
+    assert len(body['requests']) == 2
+
+    add_landlords(18, start=2)
+    full, body = queries_for_page(client, admin, path)
+    assert len(body['requests']) == 20
+    assert all(len(entry['documents']) == 2 for entry in body['requests'])
+    assert full == small == 3  # the admin lookup, the page of users, their documents
+
+
+def test_pages_cover_every_landlord_once(app, admin):
+    add_landlords(7)
+    # Not in the pending queue: verified, or nothing pending to review
+    done = User(email='done@test.com', name='Done', phone='+254711999999', role='landlord',
+                verification_status='verified', id_number='IDX')
+    db.session.add(done)
+    db.session.commit()
+
+    client = app.test_client()
+    headers = headers_for(admin)
+    seen, cursor = [], ''
+    while True:
+        body = client.get(f'/api/users/kyc/pending?per_page=3&cursor={cursor}', headers=headers).json
+        assert len(body['requests']) <= 3
+        seen += [entry['user']['id'] for entry in body['requests']]
+        cursor = body['pagination']['next_cursor']
+        if not cursor:
+            break
+    assert seen == sorted(u.id for u in User.query.filter_by(role='landlord', verification_status='pending'))
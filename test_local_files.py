@@ -0,0 +1,134 @@
+"""Local storage backend and its file route: public listing images, private everything else.
+
+Run with: python -m pytest test_local_files.py
+"""
+import io
+import os
+from datetime import date
+
+import pytest
+from app import db
+from app.models.document import Document
+from app.models.property import Property
+from app.models.tenant_application import TenantApplication
+from app.models.user import User
+from app.services.storage import LocalStorage, StorageBackend, local_path_for_url, storage_for_url
+from conftest import app_context, headers_for
+from werkzeug.datastructures import FileStorage
+
+
+@pytest.fixture
+def app(tmp_path):
+    for folder in ('property_images', 'tenant_kyc'):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / 'a1b2.jpg').write_bytes(b'\xff\xd8 image bytes')
+    with app_context(STORAGE_BACKEND='local', STORAGE_BACKUP_BACKEND='', LOCAL_STORAGE_DIR=str(tmp_path)) as app:
+        yield app
+
+
+@pytest.fixture
+def people(app):
+    people = {role: User(email=f'{role}@test.com', name=role.title(), phone=f'+25470000000{i}', role=role)
+              for i, role in enumerate(('admin', 'landlord', 'tenant'))}
+    people['stranger'] = User(email='stranger@test.com', name='Stranger', phone='+254700000009', role='tenant')
+    db.session.add_all(people.values())
+    db.session.commit()
+    return people
+
+
+def read(path):
+    with open(path, 'rb') as fh:
+        return fh.read()
+
+
+def test_local_backend_saves_and_maps_urls_back(app):
+    # Uploads happen inside a request, which is where the file URL's host comes from
+    with app.test_request_context():
+        storage = LocalStorage()
+
+        url = storage.upload_image(FileStorage(io.BytesIO(b'png bytes'), filename='Photo.PNG'), folder='property_images')
+        assert url.startswith('http://localhost/api/files/property_images/') and url.endswith('.png')
+        assert read(local_path_for_url(url)) == b'png bytes'
+        assert isinstance(storage_for_url(url), LocalStorage)
+
+        # Plain file objects and paths on disk work too; nested folders are flattened
+        url = storage.upload_document(io.BytesIO(b'%PDF'), folder='victorsprings/kyc', filename='id.pdf')
+        assert '/api/files/victorsprings_kyc/' in url and read(local_path_for_url(url)) == b'%PDF'
+        copied = storage.upload_file(local_path_for_url(url), folder='copies')
+        assert read(local_path_for_url(copied)) == b'%PDF'
+
+        # Path tricks in the folder or filename never escape the storage root
+        url = storage.upload_document(io.BytesIO(b'x'), folder='../../etc', filename='../../passwd')
+        assert local_path_for_url(url).startswith(app.config['LOCAL_STORAGE_DIR'] + os.sep)
+
+        result = storage.upload_document_dual(io.BytesIO(b'%PDF dual'), folder='tenant_agreements', filename='a.pdf')
+        assert result['backup_url'] is None and read(local_path_for_url(result['primary_url'])) == b'%PDF dual'
+
+        assert local_path_for_url('http://localhost/api/files/tenant_kyc/missing.jpg') is None
+        assert local_path_for_url('https://ucarecdn.com/abc/') is None
+
+
+def test_backends_must_implement_uploads():
+    class Incomplete(StorageBackend):
+        def upload_image(self, file, folder='victorsprings_images'):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_listing_images_are_public(app):
+    resp = app.test_client().get('/api/files/property_images/a1b2.jpg')
+    assert resp.status_code == 200
+    assert 'max-age=3600' in resp.headers['Cache-Control']
+
+
+def test_private_files_need_a_login_and_are_not_cached(app, people):
+    client = app.test_client()
+    assert client.get('/api/files/tenant_kyc/a1b2.jpg').status_code == 401
+
+    resp = client.get('/api/files/tenant_kyc/a1b2.jpg', headers=headers_for(people['admin']))
+    assert resp.status_code == 200
+    assert resp.data == b'\xff\xd8 image bytes'
+    assert resp.headers['Cache-Control'] == 'private, no-store'
+
+    assert client.get('/api/files/tenant_kyc/missing.jpg', headers=headers_for(people['admin'])).status_code == 404
+
+
+def test_private_files_are_served_to_the_people_who_may_read_their_record(app, people):
+    client = app.test_client()
+    url = '/api/files/tenant_kyc/a1b2.jpg'
+
+    def status(role):
+        return client.get(url, headers=headers_for(people[role])).status_code
+
+    # Not referenced by any record yet: admins only
+    assert [status(role) for role in ('admin', 'tenant', 'landlord')] == [200, 403, 403]
+
+    # A document is readable by its owner once access is granted
+    document = Document(user_id=people['tenant'].id, name='ID', document_type='id_document',
+                        file_url=f'https://files.example.com{url}')
+    db.session.add(document)
+    db.session.commit()
+    assert status('tenant') == 403
+    document.is_accessible = True
+    db.session.commit()
+    assert [status(role) for role in ('tenant', 'landlord', 'stranger')] == [200, 403, 403]
+
+    # An application's files are readable by the applicant and the property's landlord
+    db.session.delete(document)
+    listing = Property(title='Block A', description='d', property_type='house', city='Nairobi', address='a',
+                       available_from=date.today(), landlord_id=people['landlord'].id)
+    db.session.add(listing)
+    db.session.flush()
+    db.session.add(TenantApplication(user_id=people['tenant'].id, property_id=listing.id, first_name='Jane',
+                                     last_name='Doe', phone='0712345678', id_number='12345678',
+                                     id_document_front=f'http://localhost{url}', id_document_back='b',
+                                     signed_agreement_url='c'))
+    db.session.commit()
+    assert [status(role) for role in ('tenant', 'landlord', 'stranger', 'admin')] == [200, 200, 403, 200]
+
+    # A listing's blank agreement template is for any logged-in user
+    listing.tenant_agreement_url = 'http://localhost/api/files/tenant_kyc/a1b2.jpg'
+    db.session.commit()
+    assert status('stranger') == 200
@@ -0,0 +1,151 @@
+"""M-Pesa callbacks: ledger dedup, guarded status updates and the notification outbox.
+
+Run with: python -m pytest test_mpesa_callbacks.py
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from app import db
+from app.models.background_job import BackgroundJob
+from app.models.mpesa_callback import MpesaCallback
+from app.models.payment import Payment
+from app.models.payment_daily_total import PaymentDailyTotal
+from app.models.setting import Setting
+from app.models.user import User
+from app.services import jobs
+from app.services.jobs import JobFailed, enqueue, job_handler, run_pending
+from conftest import app_context
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # Email and SMS are not configured here: both are skipped / simulated
+    for name in ('RESEND_API_KEY', 'TWILIO_ACCOUNT_SID'):
+        monkeypatch.delenv(name, raising=False)
+    with app_context(JOBS_KICK=False) as app:
+        yield app
+
+
+@pytest.fixture
+def payment(app):
+    tenant = User(email='tenant@test.com', name='Tenant', phone='+254700000003', role='tenant')
+    db.session.add_all([tenant, Setting(key='primary_admin_email', value='admin@test.com')])
+    db.session.flush()
+    payment = Payment(user_id=tenant.id, amount=1000, payment_type='rent', phone_number=tenant.phone,
+                      status='processing', mpesa_checkout_request_id='ws_CO_1')
+    db.session.add(payment)
+    db.session.commit()
+    return payment
+
+
+def callback(client, result_code=0, checkout_request_id='ws_CO_1', receipt='RJ12XK2L9PQ'):
+    body = {'MerchantRequestID': 'm-1', 'CheckoutRequestID': checkout_request_id, 'ResultCode': result_code,
+            'ResultDesc': 'Processed' if result_code == 0 else 'Request cancelled by user'}
+    if result_code == 0:
+        body['CallbackMetadata'] = {'Item': [{'Name': 'Amount', 'Value': 1000},
+                                             {'Name': 'MpesaReceiptNumber', 'Value': receipt}]}
+    return client.post('/api/payments/callback', json={'Body': {'stkCallback': body}})
+
+
+def test_replayed_callback_is_applied_once(app, payment):
+    client = app.test_client()
+    assert callback(client).status_code == 200
+    replay = callback(client)
+    assert replay.status_code == 200 and replay.json['message'] == 'Callback already processed'
+
+    ledger = MpesaCallback.query.one()
+    assert ledger.outcome == 'applied' and ledger.duplicate_count == 1 and ledger.payment_id == payment.id
+    db.session.refresh(payment)
+    assert payment.status == 'completed' and payment.mpesa_receipt_number == 'RJ12XK2L9PQ'
+    assert sorted(job.job_type for job in BackgroundJob.query) == ['payment_admin_email', 'payment_sms']
+    assert PaymentDailyTotal.query.one().payment_count == 1
+
+
+def test_a_late_conflicting_callback_does_not_change_a_final_payment(app, payment):
+    client = app.test_client()
+    assert callback(client).status_code == 200
+    # A different result for the same checkout is recorded, but the payment is already final
+    assert callback(client, result_code=1032).status_code == 400
+    assert {(c.result_code, c.outcome) for c in MpesaCallback.query} == {(0, 'applied'), (1032, 'ignored')}
+    db.session.refresh(payment)
+    assert payment.status == 'completed' and payment.failed_at is None
+    assert BackgroundJob.query.count() == 2
+
+
+def test_callback_for_an_unknown_checkout_is_kept_for_later(app, payment):
+    assert callback(app.test_client(), checkout_request_id='ws_CO_early').status_code == 202
+    assert MpesaCallback.query.one().outcome == 'unmatched'
+    assert BackgroundJob.query.count() == 0
+
+
+def test_status_updates_are_conditional(app, payment):
+    assert Payment.mark_completed_if_open(payment.id, 'R1')
+    assert not Payment.mark_completed_if_open(payment.id, 'R2')
+    assert not Payment.mark_failed_if_open(payment.id, 'Late failure')
+    db.session.commit()
+    db.session.refresh(payment)
+    assert payment.status == 'completed' and payment.mpesa_receipt_number == 'R1'
+
+
+def test_notification_jobs_run_without_email_configured(app, payment):
+    callback(app.test_client())
+    result = app.test_cli_runner().invoke(args=['run-jobs'])
+    assert result.exit_code == 0 and 'Ran 2 job(s): 2 succeeded, 0 failed.' in result.output
+    assert {job.status for job in BackgroundJob.query} == {'succeeded'}
+
+
+FLAKY = {'failures_left': 0}
+
+
+@job_handler('test_flaky')
+def flaky(payload):
+    if FLAKY['failures_left']:
+        FLAKY['failures_left'] -= 1
+        raise JobFailed('provider said no')
+
+
+def make_due(job):
+    BackgroundJob.query.filter_by(id=job.id).update({'run_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+
+def test_failed_jobs_are_retried_with_backoff(app):
+    FLAKY['failures_left'] = 1
+    job = enqueue('test_flaky', {}, max_attempts=3)
+    db.session.commit()
+
+    assert run_pending() == (0, 1)
+    db.session.refresh(job)
+    assert job.status == 'pending' and job.attempts == 1 and job.last_error == 'provider said no'
+    assert job.run_at >= datetime.utcnow() + timedelta(seconds=jobs.JOB_BACKOFF_BASE - 1)
+    assert run_pending() == (0, 0)  # not due yet
+
+    make_due(job)
+    assert run_pending() == (1, 0)
+    db.session.refresh(job)
+    assert job.status == 'succeeded' and job.attempts == 2
+
+
+def test_jobs_give_up_after_max_attempts(app):
+    FLAKY['failures_left'] = 5
+    job = enqueue('test_flaky', {}, max_attempts=2)
+    unknown = enqueue('no_such_job', {}, max_attempts=1)
+    db.session.commit()
+
+    assert run_pending() == (0, 2)
+    make_due(job)
+    assert run_pending() == (0, 1)
+    db.session.refresh(job)
+    db.session.refresh(unknown)
+    assert job.status == 'failed' and job.attempts == 2
+    assert unknown.status == 'failed' and 'No handler registered' in unknown.last_error
+
+
+def test_stuck_running_jobs_are_requeued(app):
+    job = enqueue('test_flaky', {})
+    db.session.commit()
+    FLAKY['failures_left'] = 0
+    BackgroundJob.query.filter_by(id=job.id).update({
+        'status': 'running', 'locked_at': datetime.utcnow() - timedelta(seconds=jobs.JOB_LOCK_TIMEOUT + 1)})
+    db.session.commit()
+    assert run_pending() == (1, 0)
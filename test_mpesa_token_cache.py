@@ -0,0 +1,70 @@
+"""M-Pesa OAuth token cache against the local Daraja simulator.
+
+Run with: python -m pytest test_mpesa_token_cache.py
+"""
+import os
+import threading
+import time
+
+import pytest
+from app.services import mpesa
+from app.services.mpesa import MpesaService
+from app.utils.cache import get_cache
+from daraja_simulator import DarajaSimulator
+
+
+@pytest.fixture
+def simulator():
+    # Slow token endpoint, so concurrent callers overlap while one refresh is in flight
+    sim = DarajaSimulator(latency=0.2).start()
+    os.environ['MPESA_BASE_URL'] = sim.base_url
+    yield sim
+    os.environ.pop('MPESA_BASE_URL', None)
+    sim.stop()
+
+
+def test_token_is_cached(app, simulator):
+    service = MpesaService()
+    token = service.get_access_token()
+    assert token in simulator.tokens
+
+    assert MpesaService().get_access_token() == token
+    assert simulator.stats['oauth'] == 1
+
+
+def test_token_is_refreshed_before_it_expires(app, simulator):
+    service = MpesaService()
+    cache = get_cache()
+    key = service._token_cache_key()
+
+    # Still valid, but inside the refresh margin
+    cache.set(key, {'token': 'old-token', 'expires_at': time.time() + mpesa.TOKEN_REFRESH_MARGIN - 30})
+    token = service.get_access_token()
+    assert token != 'old-token' and token in simulator.tokens
+    assert cache.get(key)['token'] == token
+    assert cache.get(key)['expires_at'] - time.time() > mpesa.TOKEN_REFRESH_MARGIN
+
+    # While another caller holds the refresh, the current token is served without waiting
+    cache.set(key, {'token': 'old-token', 'expires_at': time.time() + mpesa.TOKEN_REFRESH_MARGIN - 30})
+    with cache.lock(key) as acquired:
+        assert acquired
+        assert service.get_access_token() == 'old-token'
+    assert simulator.stats['oauth'] == 1
+
+
+def test_concurrent_misses_fetch_one_token(app, simulator):
+    tokens = []
+
+    def fetch():
+        with app.app_context():
+            tokens.append(MpesaService().get_access_token())
+
+    threads = [threading.Thread(target=fetch) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(tokens) == 12
+    assert len(set(tokens)) == 1 and tokens[0] in simulator.tokens
+    assert simulator.stats['oauth'] == 1
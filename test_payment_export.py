@@ -0,0 +1,85 @@
+"""Admin payments export: streamed, well-formed CSV and NDJSON.
+
+Run with: python -m pytest test_payment_export.py
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from app import db
+from app.api import payments as payments_api
+from app.models.audit_log import AuditLog
+from app.models.payment import Payment
+from app.models.user import User
+from conftest import headers_for
+
+BASE = datetime(2026, 10, 1, 9, 0, 0)
+
+
+@pytest.fixture
+def admin(app, monkeypatch):
+    # Small batches, so twelve rows span several response chunks
+    monkeypatch.setattr(payments_api, 'PAYMENT_EXPORT_BATCH_SIZE', 5)
+    admin = User(email='admin@test.com', name='Admin', phone='+254700000000', role='admin')
+    tenant = User(email='jane@test.com', name='Wanjiku, Jane "JW"', phone='+254712345678', role='tenant')
+    db.session.add_all([admin, tenant])
+    db.session.flush()
+    for i in range(12):
+        db.session.add(Payment(
+            user_id=tenant.id, amount=1000 + i, payment_type='rent', phone_number=tenant.phone,
+            status='completed' if i % 3 else 'failed', mpesa_receipt_number=f'RJ{i:02d}XK2L9PQ',
+            description=f'Rent, unit {i}\nsecond line', created_at=BASE + timedelta(hours=i)
+        ))
+    db.session.commit()
+    return admin
+
+
+def export(app, admin, **params):
+    resp = app.test_client().get('/api/payments/export', query_string=params, headers=headers_for(admin),
+                                 buffered=False)
+    assert resp.status_code == 200 and resp.is_streamed
+    chunks = [chunk.decode() for chunk in resp.response]
+    resp.close()
+    return resp, chunks
+
+
+def test_csv_export_is_streamed_and_well_formed(app, admin):
+    resp, chunks = export(app, admin)
+    assert resp.mimetype == 'text/csv'
+    assert resp.headers['Content-Disposition'].startswith('attachment; filename="payments-')
+    assert resp.headers['X-Accel-Buffering'] == 'no'
+    # One chunk per batch of rows: 5 + 5 + 2, then the empty tail
+    assert len([chunk for chunk in chunks if chunk]) == 3
+
+    rows = list(csv.DictReader(io.StringIO(''.join(chunks))))
+    assert len(rows) == 12
+    assert list(rows[0]) == [column.key for column in payments_api.EXPORT_COLUMNS]
+    # Newest first; commas, quotes and newlines survive the round trip
+    assert [row['amount'] for row in rows] == [f'{1011 - i}.00' for i in range(12)]
+    assert rows[0]['user_name'] == 'Wanjiku, Jane "JW"'
+    assert rows[0]['description'] == 'Rent, unit 11\nsecond line'
+    assert rows[0]['created_at'] == '2026-10-01T20:00:00'
+
+    assert AuditLog.query.filter_by(action='payments_exported').count() == 1
+
+
+def test_ndjson_export_applies_filters(app, admin):
+    resp, chunks = export(app, admin, format='ndjson', status='failed')
+    assert resp.mimetype == 'application/x-ndjson'
+    lines = ''.join(chunks).splitlines()
+    records = [json.loads(line) for line in lines]
+    assert len(records) == 4 and {r['status'] for r in records} == {'failed'}
+    assert [r['mpesa_receipt_number'] for r in records] == ['RJ09XK2L9PQ', 'RJ06XK2L9PQ', 'RJ03XK2L9PQ', 'RJ00XK2L9PQ']
+    assert records[0]['amount'] == '1009.00' and records[0]['user_email'] == 'jane@test.com'
+
+
+def test_export_rejects_bad_requests(app, admin):
+    client = app.test_client()
+    headers = headers_for(admin)
+    assert client.get('/api/payments/export?format=xml', headers=headers).status_code == 400
+    assert client.get('/api/payments/export?date_to=tomorrow', headers=headers).status_code == 400
+
+    tenant = User.query.filter_by(role='tenant').one()
+    assert client.get('/api/payments/export', headers=headers_for(tenant)).status_code == 403
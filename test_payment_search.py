@@ -0,0 +1,111 @@
+"""Admin payments list: search, keyset paging and date filters.
+
+Run with: python -m pytest test_payment_search.py
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from app import db
+from app.models.payment import Payment
+from app.models.user import User
+from conftest import headers_for
+
+BASE = datetime(2026, 10, 1, 9, 0, 0)
+
+
+@pytest.fixture
+def seeded(app):
+    admin = User(email='admin@test.com', name='Admin', phone='+254700000000', role='admin')
+    jane = User(email='jane@test.com', name='Jane Wanjiku', phone='+254712345678', role='tenant')
+    company = User(email='accounts@vs123.co.ke', name='VS123 Holdings', phone='+254733000111', role='tenant')
+    db.session.add_all([admin, jane, company])
+    db.session.flush()
+
+    # Twelve payments, two per hour, so the cursor has to break created_at ties by id
+    for i in range(12):
+        owner = jane if i % 2 == 0 else company
+        db.session.add(Payment(
+            user_id=owner.id, amount=1000 + i, payment_type='rent', phone_number=owner.phone,
+            status='completed', mpesa_receipt_number=f'RJ{i:02d}XK2L9PQ',
+            created_at=BASE + timedelta(hours=i // 2)
+        ))
+    db.session.add(Payment(user_id=jane.id, amount=50, payment_type='rent', phone_number=jane.phone,
+                           status='pending', created_at=BASE + timedelta(days=1)))
+    db.session.commit()
+    return {'admin': admin, 'jane': jane, 'company': company}
+
+
+def search(app, seeded, **params):
+    resp = app.test_client().get('/api/payments/all', query_string={'per_page': 100, **params},
+                                 headers=headers_for(seeded['admin']))
+    assert resp.status_code == 200
+    return resp.json['payments']
+
+
+def test_receipt_prefix_search(app, seeded):
+    found = search(app, seeded, search='RJ03')
+    assert [p['mpesa_receipt_number'] for p in found] == ['RJ03XK2L9PQ']
+    assert len(search(app, seeded, search='RJ0')) == 10
+
+
+def test_receipt_shaped_term_still_matches_names(app, seeded):
+    # "VS123" looks like a receipt, but it is also the tenant's name
+    found = search(app, seeded, search='VS123')
+    assert len(found) == 6
+    assert {p['user']['name'] for p in found} == {'VS123 Holdings'}
+
+
+def test_name_email_and_phone_search(app, seeded):
+    assert len(search(app, seeded, search='wanjiku')) == 7
+    assert len(search(app, seeded, search='accounts@vs123')) == 6
+    # Local and international forms of the same number
+    assert len(search(app, seeded, search='0712345678')) == 7
+    assert len(search(app, seeded, search='+254712345678')) == 7
+    assert search(app, seeded, search='nobody') == []
+
+
+def test_cursor_pages_cover_every_payment_once(app, seeded):
+    client = app.test_client()
+    headers = headers_for(seeded['admin'])
+    seen, cursor = [], ''
+    while True:
+        body = client.get(f'/api/payments/all?per_page=5&cursor={cursor}', headers=headers).json
+        assert len(body['payments']) <= 5
+        seen += [p['id'] for p in body['payments']]
+        cursor = body['pagination']['next_cursor']
+        assert body['pagination']['has_more'] == (cursor is not None)
+        if not cursor:
+            break
+    assert seen == [p.id for p in Payment.query.order_by(Payment.created_at.desc(), Payment.id.desc())]
+
+    # Filters apply across pages too
+    first = client.get('/api/payments/all?per_page=4&cursor=&search=wanjiku', headers=headers).json
+    rest = client.get(f"/api/payments/all?per_page=4&cursor={first['pagination']['next_cursor']}&search=wanjiku",
+                      headers=headers).json
+    assert len(first['payments']) + len(rest['payments']) == 7
+    assert rest['pagination']['next_cursor'] is None
+    assert client.get('/api/payments/all?cursor=garbage', headers=headers).status_code == 400
+
+
+def test_date_to(app, seeded):
+    # A bare date includes the whole day
+    assert len(search(app, seeded, date_to='2026-10-01')) == 12
+    # A timestamp is an inclusive upper bound
+    assert len(search(app, seeded, date_to='2026-10-01T10:00:00')) == 4
+    assert len(search(app, seeded, date_from='2026-10-01T10:00:00', date_to='2026-10-01T11:00:00')) == 4
+
+    resp = app.test_client().get('/api/payments/all?date_to=tomorrow', headers=headers_for(seeded['admin']))
+    assert resp.status_code == 400
+
+
+def test_per_page_below_one_is_clamped(app, seeded):
+    client = app.test_client()
+    headers = headers_for(seeded['admin'])
+    for per_page in (0, -5):
+        resp = client.get(f'/api/payments/all?per_page={per_page}&cursor=', headers=headers)
+        assert resp.status_code == 200
+        assert len(resp.json['payments']) == 1
+        assert resp.json['pagination']['per_page'] == 1 and resp.json['pagination']['has_more']
+    assert client.get('/api/enquiries/admin?per_page=0', headers=headers).status_code == 200
+    assert client.get('/api/applications/admin?per_page=0', headers=headers).status_code == 200
+    assert client.get('/api/users/kyc/pending?per_page=0', headers=headers).status_code == 200
@@ -0,0 +1,117 @@
+"""Landlord portfolio: single-query build, per-landlord cache and invalidation.
+
+Run with: python -m pytest test_portfolio.py
+"""
+from datetime import date
+
+import pytest
+from app import db
+from app.models.enquiry import Enquiry
+from app.models.property import Property
+from app.models.tenant_application import TenantApplication
+from app.models.user import User
+from conftest import count_queries, headers_for
+
+
+@pytest.fixture
+def portfolio(app):
+    owner = User(email='owner@test.com', name='Owner', phone='+254700000001', role='landlord')
+    other = User(email='other@test.com', name='Other', phone='+254700000002', role='landlord')
+    tenant = User(email='tenant@test.com', name='Tenant', phone='+254700000003', role='tenant')
+    admin = User(email='admin@test.com', name='Admin', phone='+254700000000', role='admin')
+    db.session.add_all([owner, other, tenant, admin])
+    db.session.flush()
+
+    props = [
+        Property(title='Block A', description='d', property_type='apartment', city='Nairobi', address='a',
+                 available_from=date.today(), landlord_id=owner.id, view_count=40, like_count=3, call_clicks=2,
+                 units=[{'type': '1BR', 'vacantCount': 2}, {'type': '2BR', 'vacantCount': 0}]),
+        Property(title='Block B', description='d', property_type='house', city='Mombasa', address='b',
+                 available_from=date.today(), landlord_id=owner.id),
+        Property(title='Elsewhere', description='d', property_type='house', city='Kisumu', address='c',
+                 available_from=date.today(), landlord_id=other.id),
+    ]
+    db.session.add_all(props)
+    db.session.flush()
+
+    for i, status in enumerate(['new', 'new', 'resolved']):
+        db.session.add(Enquiry(property_id=props[0].id, user_id=tenant.id, message=f'q{i}', status=status))
+    db.session.add(Enquiry(property_id=props[2].id, user_id=tenant.id, message='not yours'))
+    for status in ['pending_approval', 'pending_approval', 'approved', 'rejected']:
+        db.session.add(TenantApplication(
+            user_id=tenant.id, property_id=props[0].id, first_name='T', last_name='U', phone='0712345678',
+            id_number='1', id_document_front='f', id_document_back='b', signed_agreement_url='s',
+            digital_consent=True, status=status))
+    db.session.commit()
+    return {'owner': owner, 'other': other, 'tenant': tenant, 'admin': admin, 'props': props}
+
+
+def fetch(client, user, fresh=False):
+    headers = headers_for(user)
+    with count_queries() as statements:
+        resp = client.get('/api/properties/my-portfolio' + ('?fresh=1' if fresh else ''), headers=headers)
+    assert resp.status_code == 200
+    return resp.json, len(statements)
+
+
+def test_portfolio_figures_in_one_query(app, portfolio):
+    client = app.test_client()
+    body, queries = fetch(client, portfolio['owner'])
+    # Landlord lookup in the decorator + the portfolio SELECT
+    assert queries == 2
+
+    block_a, block_b = sorted(body['properties'], key=lambda p: p['title'])
+    assert block_a['views'] == 40 and block_a['likes'] == 3 and block_a['clicks']['call'] == 2
+    assert block_a['enquiries'] == 3 and block_a['new_enquiries'] == 2
+    assert block_a['pending_applications'] == 2 and block_a['approved_applications'] == 1
+    assert block_a['vacancy'] == {'vacant_units': 2, 'by_type': {'1BR': 2, '2BR': 0}, 'fully_let': False}
+    assert block_b['enquiries'] == 0 and block_b['pending_applications'] == 0
+    assert body['totals']['properties'] == 2
+    assert body['totals']['enquiries'] == 3
+
+    other, _ = fetch(client, portfolio['other'])
+    assert [p['title'] for p in other['properties']] == ['Elsewhere']
+    assert other['properties'][0]['enquiries'] == 1
+
+
+def test_cached_until_a_relevant_write(app, portfolio):
+    client = app.test_client()
+    block_a = portfolio['props'][0]
+    fetch(client, portfolio['owner'])
+    _, queries = fetch(client, portfolio['owner'])
+    assert queries == 1  # only the landlord lookup
+
+    # Views and contact clicks do not invalidate
+    client.get(f'/api/properties/{block_a.id}')
+    client.post(f'/api/properties/{block_a.id}/interact', json={'type': 'call'})
+    cached, queries = fetch(client, portfolio['owner'])
+    assert queries == 1
+    assert cached['totals']['views'] == 40
+
+    # A new enquiry does
+    client.post('/api/enquiries', json={'property_id': block_a.id, 'message': 'hi', 'name': 'G', 'email': 'g@test.com'})
+    body, queries = fetch(client, portfolio['owner'])
+    assert queries == 2
+    assert body['totals']['enquiries'] == 4
+    assert body['totals']['views'] == 41
+
+    # So does an approval, through its vacancy and application counts
+    pending = TenantApplication.query.filter_by(status='pending_approval').first()
+    resp = client.put(f'/api/applications/{pending.id}/status', json={'status': 'approved', 'assigned_unit': '1BR'},
+                      headers=headers_for(portfolio['admin']))
+    assert resp.status_code == 200
+    body, _ = fetch(client, portfolio['owner'])
+    block = next(p for p in body['properties'] if p['id'] == block_a.id)
+    assert block['approved_applications'] == 2 and block['vacancy']['by_type']['1BR'] == 1
+
+    # And a like
+    client.post(f'/api/properties/{block_a.id}/like', headers=headers_for(portfolio['tenant']))
+    body, _ = fetch(client, portfolio['owner'])
+    assert body['totals']['likes'] == 4
+
+    # Another landlord's writes leave this entry alone
+    fetch(client, portfolio['owner'])
+    client.post('/api/enquiries', json={'property_id': portfolio['props'][2].id, 'message': 'x',
+                                        'name': 'G', 'email': 'g@test.com'})
+    _, queries = fetch(client, portfolio['owner'])
+    assert queries == 1
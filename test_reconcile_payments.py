@@ -0,0 +1,130 @@
+"""Payment reconciliation against the local Daraja simulator.
+
+Run with: python -m pytest test_reconcile_payments.py
+"""
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from app import db
+from app.models.payment import Payment
+from app.models.background_job import BackgroundJob
+from app.models.user import User
+from app.services.notifications import payment_sms_message
+from app.services.reconciler import reconcile_payments
+from app.utils.email import payment_reference_row
+from app.utils.rate_limit import TokenBucket
+from conftest import app_context
+from daraja_simulator import DarajaSimulator
+
+
+@pytest.fixture(scope='module')
+def simulator():
+    sim = DarajaSimulator().start()
+    os.environ['MPESA_BASE_URL'] = sim.base_url
+    yield sim
+    os.environ.pop('MPESA_BASE_URL', None)
+    sim.stop()
+
+
+# Module-scoped: the tests build on each other's payments and simulator state
+@pytest.fixture(scope='module')
+def app():
+    with app_context(JOBS_KICK=False) as app:
+        user = User(email='reconcile@test.com', name='Reconcile Tester', phone='+254700000000', role='tenant', is_verified=True)
+        db.session.add(user)
+        db.session.commit()
+        yield app
+
+
+def make_payment(simulator, checkout_request_id, result_code=None, age=600, status='processing'):
+    simulator.add_transaction(checkout_request_id, result_code=result_code)
+    stale = datetime.utcnow() - timedelta(seconds=age)
+    payment = Payment(
+        user_id=User.query.first().id,
+        amount=1000,
+        payment_type='rent',
+        phone_number='+254700000000',
+        status=status,
+        mpesa_checkout_request_id=checkout_request_id,
+        created_at=stale,
+        updated_at=stale
+    )
+    db.session.add(payment)
+    db.session.commit()
+    # onupdate does not fire on insert, but be explicit about the age under test
+    Payment.query.filter_by(id=payment.id).update({'updated_at': stale}, synchronize_session=False)
+    db.session.commit()
+    return payment.id
+
+
+def status_of(payment_id):
+    db.session.expire_all()
+    return db.session.get(Payment, payment_id).status
+
+
+def test_settles_completed_and_failed_payments(app, simulator):
+    paid = make_payment(simulator, 'ws_CO_paid', result_code=0)
+    cancelled = make_payment(simulator, 'ws_CO_cancelled', result_code=1032)
+    waiting = make_payment(simulator, 'ws_CO_waiting')
+
+    summary = reconcile_payments(min_age=300, concurrency=4, rate=50)
+
+    assert summary == {'checked': 3, 'completed': 1, 'failed': 1, 'pending': 1}
+    assert status_of(paid) == 'completed'
+    assert status_of(cancelled) == 'failed'
+    assert db.session.get(Payment, cancelled).failure_reason == 'Request cancelled by user'
+    assert status_of(waiting) == 'processing'
+    assert BackgroundJob.query.filter(BackgroundJob.payload['payment_id'].as_integer() == paid).count() == 2
+
+    # The status query carries no receipt number, so the notifications leave the reference out
+    payment = db.session.get(Payment, paid)
+    assert payment.mpesa_receipt_number is None
+    assert 'Ref' not in payment_sms_message(payment) and 'None' not in payment_sms_message(payment)
+    assert payment_reference_row(payment.mpesa_receipt_number) == ''
+
+
+def test_recent_and_settled_payments_are_not_queried(app, simulator):
+    make_payment(simulator, 'ws_CO_recent', result_code=0, age=10)
+    make_payment(simulator, 'ws_CO_done', result_code=0, status='completed')
+    simulator.settle('ws_CO_waiting', 0)
+    queries = simulator.stats['stkpushquery']
+
+    summary = reconcile_payments(min_age=300, concurrency=4, rate=50)
+
+    assert summary['checked'] == 1  # only ws_CO_waiting
+    assert summary['completed'] == 1
+    assert simulator.stats['stkpushquery'] == queries + 1
+
+
+def test_rerun_does_not_settle_twice(app, simulator):
+    jobs = BackgroundJob.query.count()
+
+    summary = reconcile_payments(min_age=300, concurrency=4, rate=50)
+
+    assert summary['checked'] == 0
+    assert BackgroundJob.query.count() == jobs
+
+
+def test_queries_respect_rate_limit(app, simulator):
+    for i in range(12):
+        make_payment(simulator, f'ws_CO_bulk_{i}', result_code=0)
+
+    started = time.monotonic()
+    summary = reconcile_payments(min_age=300, concurrency=8, rate=20, batch_size=5)
+    elapsed = time.monotonic() - started
+
+    assert summary['completed'] == 12
+    # burst of 8, then the remaining 4 at 20/s
+    assert elapsed >= (12 - 8) / 20 * 0.9
+
+
+def test_token_bucket_blocks_until_refilled():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    started = time.monotonic()
+    assert bucket.acquire()
+    assert time.monotonic() - started >= 0.08
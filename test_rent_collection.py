@@ -0,0 +1,184 @@
+"""Recurring rent collection against the local Daraja simulator.
+
+Run with: python -m pytest test_rent_collection.py
+"""
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+from app import db
+from app.models.payment import Payment
+from app.models.property import Property
+from app.models.rent_schedule import RentCharge, RentSchedule
+from app.models.tenant_application import TenantApplication
+from app.models.user import User
+from app.services import rent_engine
+from app.services.rent_engine import _apply_push_result, collect_rent, recover_interrupted_charges
+from conftest import app_context, headers_for
+from daraja_simulator import DarajaSimulator
+
+
+@pytest.fixture
+def simulator():
+    sim = DarajaSimulator().start()
+    os.environ['MPESA_BASE_URL'] = sim.base_url
+    yield sim
+    os.environ.pop('MPESA_BASE_URL', None)
+    sim.stop()
+
+
+@pytest.fixture
+def app():
+    with app_context(JOBS_KICK=False) as app:
+        yield app
+
+
+@pytest.fixture
+def schedule(app):
+    landlord = User(email='owner@test.com', name='Owner', phone='+254700000001', role='landlord')
+    tenant = User(email='tenant@test.com', name='Tenant', phone='+254700000003', role='tenant')
+    db.session.add_all([landlord, tenant])
+    db.session.flush()
+    prop = Property(title='Block A', description='d', property_type='apartment', city='Nairobi', address='a',
+                    available_from=date.today(), landlord_id=landlord.id)
+    db.session.add(prop)
+    db.session.flush()
+    application = TenantApplication(
+        user_id=tenant.id, property_id=prop.id, first_name='T', last_name='U', phone='0712345678',
+        id_number='1', id_document_front='f', id_document_back='b', signed_agreement_url='s',
+        digital_consent=True, status='approved')
+    db.session.add(application)
+    db.session.flush()
+    schedule = RentSchedule(application_id=application.id, user_id=tenant.id, property_id=prop.id,
+                            amount=15000, phone_number='254712345678', day_of_month=1,
+                            next_due_date=date.today() - timedelta(days=3))
+    db.session.add(schedule)
+    db.session.commit()
+    return schedule
+
+
+def make_charge(schedule, period, status='pushing', attempts=1, **payment):
+    charge = RentCharge(schedule_id=schedule.id, period=period, amount=schedule.amount,
+                        status=status, attempts=attempts)
+    db.session.add(charge)
+    db.session.flush()
+    charge.payment = Payment(user_id=schedule.user_id, amount=schedule.amount, payment_type='rent',
+                             phone_number=schedule.phone_number, status='pending', **payment)
+    db.session.commit()
+    return charge
+
+
+def new_summary():
+    return {'claimed': 0, 'sent': 0, 'retrying': 0, 'uncertain': 0, 'failed': 0, 'settled_early': 0}
+
+
+def test_rerun_does_not_charge_a_period_twice(app, simulator, schedule):
+    first = collect_rent(rate=100)
+    assert first['materialized'] == 1 and first['sent'] == 1
+
+    charge = RentCharge.query.one()
+    assert charge.status == 'sent'
+    assert charge.payment.status == 'processing' and charge.payment.mpesa_checkout_request_id
+
+    second = collect_rent(rate=100)
+    assert second['materialized'] == 0 and second['claimed'] == 0
+    assert RentCharge.query.count() == 1
+    assert Payment.query.count() == 1
+    assert len(simulator.transactions) == 1
+
+
+def test_crashed_pushing_claim_is_recovered(app, schedule):
+    stale = datetime.utcnow() - timedelta(seconds=rent_engine.RENT_LOCK_TIMEOUT + 60)
+    reached = make_charge(schedule, '2026-01', mpesa_checkout_request_id='ws_CO_reached')
+    unknown = make_charge(schedule, '2026-02')
+    running = make_charge(schedule, '2026-03')
+    RentCharge.query.update({'locked_at': stale}, synchronize_session=False)
+    RentCharge.query.filter_by(id=running.id).update({'locked_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+
+    assert recover_interrupted_charges() == 2
+    db.session.expire_all()
+    assert reached.status == 'sent' and reached.locked_at is None
+    assert unknown.status == 'uncertain' and unknown.last_error
+    # A claim younger than RENT_LOCK_TIMEOUT may still be in flight
+    assert running.status == 'pushing'
+
+
+def test_busy_daraja_requeues_with_backoff(app, simulator, schedule):
+    simulator.failure_rate = 1.0
+    before = datetime.utcnow()
+    summary = collect_rent(rate=100)
+    assert summary['retrying'] == 1
+
+    charge = RentCharge.query.one()
+    assert charge.status == 'queued' and charge.attempts == 1 and charge.locked_at is None
+    assert charge.next_attempt_at >= before + timedelta(seconds=rent_engine.RENT_BACKOFF_BASE)
+    assert charge.payment.status == 'pending'
+
+
+def test_push_results_map_to_charge_status(app, schedule):
+    now = datetime.utcnow()
+    summary = new_summary()
+
+    retryable = make_charge(schedule, '2026-01', attempts=2)
+    _apply_push_result(retryable, {'success': False, 'retryable': True, 'error': 'busy'}, now, summary)
+    assert retryable.status == 'queued'
+    assert retryable.next_attempt_at == now + timedelta(seconds=rent_engine.RENT_BACKOFF_BASE * 2)
+
+    exhausted = make_charge(schedule, '2026-02', attempts=rent_engine.RENT_MAX_ATTEMPTS)
+    _apply_push_result(exhausted, {'success': False, 'retryable': True, 'error': 'busy'}, now, summary)
+    assert exhausted.status == 'failed' and exhausted.payment.status == 'failed'
+
+    uncertain = make_charge(schedule, '2026-03')
+    _apply_push_result(uncertain, {'success': False, 'uncertain': True, 'error': 'read timeout'}, now, summary)
+    assert uncertain.status == 'uncertain' and uncertain.payment.status == 'pending'
+
+    failed = make_charge(schedule, '2026-04')
+    _apply_push_result(failed, {'success': False, 'error': 'Invalid phone number'}, now, summary)
+    assert failed.status == 'failed' and failed.payment.status == 'failed'
+    assert failed.last_error == 'Invalid phone number'
+
+    assert summary == {**new_summary(), 'retrying': 1, 'uncertain': 1, 'failed': 2}
+
+
+def test_retry_refuses_a_charge_whose_payment_went_through(app, schedule):
+    admin = User(email='admin@test.com', name='Admin', phone='+254700000000', role='admin')
+    db.session.add(admin)
+    db.session.commit()
+    client = app.test_client()
+
+    for period, payment_status in [('2026-01', 'completed'), ('2026-02', 'processing')]:
+        charge = make_charge(schedule, period, status='uncertain')
+        charge.payment.status = payment_status
+        db.session.commit()
+        resp = client.post(f'/api/rent/charges/{charge.id}/retry', headers=headers_for(admin))
+        assert resp.status_code == 409
+        assert resp.json['message'] == f'The payment for this charge is {payment_status}'
+        db.session.expire_all()
+        assert charge.status == 'uncertain'
+
+    # A sent charge is only retried once its payment has failed
+    sent = make_charge(schedule, '2026-03', status='sent')
+    assert client.post(f'/api/rent/charges/{sent.id}/retry', headers=headers_for(admin)).status_code == 409
+
+
+def test_retry_requeues_a_cancelled_push(app, simulator, schedule):
+    admin = User(email='admin@test.com', name='Admin', phone='+254700000000', role='admin')
+    db.session.add(admin)
+    db.session.commit()
+    collect_rent(rate=100)
+    charge = RentCharge.query.one()
+    first_payment = charge.payment_id
+    charge.payment.fail('Request cancelled by user')
+    db.session.commit()
+
+    resp = app.test_client().post(f'/api/rent/charges/{charge.id}/retry', headers=headers_for(admin))
+    assert resp.status_code == 200
+    assert resp.json['charge']['status'] == 'queued' and resp.json['charge']['attempts'] == 0
+
+    # The next run pushes a fresh payment for the same period
+    summary = collect_rent(rate=100)
+    assert summary['sent'] == 1
+    db.session.expire_all()
+    assert charge.status == 'sent' and charge.payment_id != first_payment
+    assert len(simulator.transactions) == 2
@@ -0,0 +1,160 @@
+"""Daily rollups behind the admin reports: incremental upkeep, backfill and time series.
+
+Run with: python -m pytest test_rollups.py
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from app import db
+from app.models.metric_daily_rollup import MetricDailyRollup
+from app.models.payment import Payment
+from app.models.payment_daily_total import PaymentDailyTotal
+from app.models.user import User
+from app.services.timeseries import get_series
+from conftest import headers_for
+
+DAY = datetime(2026, 10, 5, 9, 0)
+
+
+@pytest.fixture
+def tenant(app):
+    tenant = User(email='tenant@test.com', name='Tenant', phone='+254700000003', role='tenant',
+                  created_at=DAY - timedelta(days=3))
+    db.session.add(tenant)
+    db.session.commit()
+    return tenant
+
+
+def pay(tenant, amount, payment_type='rent', status='pending'):
+    payment = Payment(user_id=tenant.id, amount=amount, payment_type=payment_type, phone_number=tenant.phone,
+                      status=status)
+    db.session.add(payment)
+    db.session.flush()
+    return payment
+
+
+def totals():
+    return {(t.day, t.payment_type, t.status): (t.payment_count, float(t.total_amount))
+            for t in PaymentDailyTotal.query}
+
+
+def test_settling_payments_updates_the_daily_totals(app, tenant):
+    today = datetime.utcnow().date()
+    pay(tenant, 1000).complete('R1')
+    pay(tenant, 500).complete('R2')
+    pay(tenant, 300, payment_type='deposit').fail('Cancelled')
+    db.session.commit()
+    assert totals() == {
+        (today, 'rent', 'completed'): (2, 1500.0),
+        (today, 'deposit', 'failed'): (1, 300.0),
+    }
+
+    # The conditional callback path counts once, however many times it is replayed
+    payment = pay(tenant, 250)
+    db.session.commit()
+    assert Payment.mark_completed_if_open(payment.id, 'R3')
+    assert not Payment.mark_completed_if_open(payment.id, 'R3')
+    db.session.commit()
+    assert totals()[(today, 'rent', 'completed')] == (3, 1750.0)
+
+    # Completing an already-completed payment does not count it again
+    payment.complete('R3')
+    db.session.commit()
+    assert totals()[(today, 'rent', 'completed')] == (3, 1750.0)
+
+
+def test_inserts_update_the_metric_rollups(app, tenant):
+    db.session.add(User(email='second@test.com', name='Second', phone='+254700000004', role='tenant',
+                        created_at=DAY - timedelta(days=3)))
+    db.session.commit()
+    rollup = MetricDailyRollup.query.filter_by(metric='signups').one()
+    assert rollup.day == (DAY - timedelta(days=3)).date() and rollup.value == 2
+
+
+def test_backfill_commands_rebuild_from_the_source_tables(app, tenant):
+    early = pay(tenant, 1000, status='completed')
+    early.completed_at = DAY - timedelta(days=2)
+    late = pay(tenant, 400, status='completed')
+    late.completed_at = DAY
+    failed = pay(tenant, 50, status='failed')
+    failed.failed_at = DAY
+    db.session.commit()
+    # Rows written straight to the table never went through Payment, so the rollup is empty
+    assert totals() == {}
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['rollup-payments'])
+    assert result.exit_code == 0 and 'Rebuilt 3 daily total row(s)' in result.output
+    assert totals() == {
+        (early.completed_at.date(), 'rent', 'completed'): (1, 1000.0),
+        (DAY.date(), 'rent', 'completed'): (1, 400.0),
+        (DAY.date(), 'rent', 'failed'): (1, 50.0),
+    }
+
+    # --since only replaces the days it covers
+    late.amount = 450
+    early.amount = 1
+    db.session.commit()
+    result = runner.invoke(args=['rollup-payments', '--since', DAY.date().isoformat()])
+    assert 'Rebuilt 2 daily total row(s)' in result.output
+    assert totals()[(DAY.date(), 'rent', 'completed')] == (1, 450.0)
+    assert totals()[(early.completed_at.date(), 'rent', 'completed')] == (1, 1000.0)
+
+    MetricDailyRollup.query.delete()
+    db.session.commit()
+    result = runner.invoke(args=['rollup-metrics'])
+    assert result.exit_code == 0 and 'Rebuilt 1 daily metric row(s)' in result.output
+    assert MetricDailyRollup.query.filter_by(metric='signups').one().value == 1
+
+
+def add_total(day, amount, count=1):
+    db.session.add(PaymentDailyTotal(day=day, payment_type='rent', status='completed',
+                                     payment_count=count, total_amount=amount))
+    db.session.commit()
+
+
+def test_missing_buckets_are_zero_filled(app):
+    add_total(date(2026, 10, 1), 100)
+    add_total(date(2026, 10, 3), 250, count=2)
+
+    daily = get_series('revenue', 'day', date(2026, 9, 30), date(2026, 10, 4))
+    assert [p['value'] for p in daily['series']] == [0, 100.0, 0, 250.0, 0]
+    assert daily['series'][0]['bucket'] == '2026-09-30' and daily['total'] == 350.0
+
+    # Wednesday to Friday widens to whole ISO weeks, Monday to Sunday
+    weekly = get_series('payments', 'week', date(2026, 9, 30), date(2026, 10, 9))
+    assert weekly['from'] == '2026-09-28' and weekly['to'] == '2026-10-11'
+    assert weekly['series'] == [{'bucket': '2026-09-28', 'value': 3}, {'bucket': '2026-10-05', 'value': 0}]
+
+    empty = get_series('signups', 'month', date(2026, 1, 15), date(2026, 3, 2))
+    assert [p['value'] for p in empty['series']] == [0, 0, 0] and empty['to'] == '2026-03-31'
+
+    with pytest.raises(ValueError):
+        get_series('revenue', 'day', date(2020, 1, 1), date(2026, 1, 1))
+
+
+def test_series_are_cached_until_fresh(app):
+    start, end = date(2026, 10, 1), date(2026, 10, 3)
+    add_total(start, 100)
+    assert get_series('revenue', 'day', start, end)['total'] == 100.0
+
+    add_total(end, 50)
+    assert get_series('revenue', 'day', start, end)['total'] == 100.0
+    assert get_series('revenue', 'day', start, end, fresh=True)['total'] == 150.0
+    # The rebuilt series replaces the cached one
+    assert get_series('revenue', 'day', start, end)['total'] == 150.0
+
+
+def test_timeseries_endpoint(app, tenant):
+    admin = User(email='admin@test.com', name='Admin', phone='+254700000000', role='admin')
+    db.session.add(admin)
+    db.session.commit()
+    client = app.test_client()
+
+    resp = client.get('/api/admin/reports/timeseries?metric=payments&bucket=day&from=2026-10-01&to=2026-10-02',
+                      headers=headers_for(admin))
+    assert resp.status_code == 200 and resp.json['series'] == [
+        {'bucket': '2026-10-01', 'value': 0}, {'bucket': '2026-10-02', 'value': 0}]
+    assert client.get('/api/admin/reports/timeseries?metric=nope', headers=headers_for(admin)).status_code == 400
+    assert client.get('/api/admin/reports/timeseries?from=yesterday', headers=headers_for(admin)).status_code == 400
+    assert client.get('/api/admin/reports/timeseries', headers=headers_for(tenant)).status_code == 403
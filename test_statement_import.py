@@ -0,0 +1,153 @@
+"""M-Pesa statement import and matching.
+
+Run with: python -m pytest test_statement_import.py
+"""
+import csv
+from datetime import datetime, timedelta
+
+import pytest
+from app import db
+from app.models.payment import Payment
+from app.models.user import User
+from app.services.statement_import import reconcile_statement, StatementError
+
+HEADER = ['Receipt No.', 'Completion Time', 'Initiation Time', 'Details', 'Transaction Status',
+          'Paid In', 'Withdrawn', 'Balance', 'Balance Confirmed', 'Reason Type', 'Other Party Info',
+          'Linked Transaction ID', 'A/C No.']
+
+# Statement times are EAT (UTC+3)
+BASE = datetime(2026, 10, 1, 9, 0, 0)
+
+
+def statement_row(receipt, minutes, amount, phone='254712345678', status='Completed'):
+    local = (BASE + timedelta(minutes=minutes, hours=3)).strftime('%Y-%m-%d %H:%M:%S')
+    return [receipt, local, local, 'Pay Bill from ' + phone, status, f'{amount:,.2f}', '', '', 'true',
+            'Pay Bill Online', f'{phone} - JANE TENANT', '', 'VS1']
+
+
+def write_statement(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Organization Name', 'Victor Springs'])
+        writer.writerow(['Time Period', '01-10-2026 - 31-10-2026'])
+        writer.writerow([])
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+@pytest.fixture(autouse=True)
+def tenant(app):
+    user = User(email='statement@test.com', name='Statement Tester', phone='+254712345678', role='tenant', is_verified=True)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def make_payment(amount, minutes, status='completed', receipt=None, phone='+254712345678'):
+    stamp = BASE + timedelta(minutes=minutes)
+    payment = Payment(
+        user_id=User.query.first().id,
+        amount=amount,
+        payment_type='rent',
+        phone_number=phone,
+        status=status,
+        mpesa_receipt_number=receipt,
+        created_at=stamp - timedelta(minutes=1),
+        updated_at=stamp,
+        completed_at=stamp if status == 'completed' else None
+    )
+    db.session.add(payment)
+    db.session.commit()
+    return payment.id
+
+
+def test_matches_by_receipt_and_reports_discrepancies(app, tmp_path):
+    make_payment(1000, 0, receipt='RJ10000001')
+    make_payment(2500, 5, receipt='RJ10000002')
+    orphan = make_payment(700, 30, receipt='RJ10000003')
+    path = tmp_path / 'statement.csv'
+    write_statement(path, [
+        statement_row('RJ10000001', 0, 1000),
+        statement_row('RJ10000002', 5, 2000),
+        statement_row('RJ10000001', 0, 1000),
+        statement_row('RJ10000009', 40, 450),
+        statement_row('RJ10000010', 50, 300, status='Failed'),
+    ])
+
+    report = reconcile_statement(str(path))
+
+    assert report['rows'] == 4
+    assert report['skipped'] == 1
+    assert report['matched']['receipt'] == 2
+    assert report['discrepancies'] == {
+        'duplicate': 1,
+        'amount_mismatch': 1,
+        'status_mismatch': 0,
+        'missing_in_payments': 1,
+        'missing_in_statement': 1,
+    }
+    assert report['samples']['amount_mismatch'][0]['statement_amount'] == 2000
+    assert report['samples']['missing_in_statement'][0]['payment_id'] == orphan
+
+
+def test_matches_masked_phone_amount_and_time_window(app, tmp_path):
+    pending = make_payment(1500, 0, status='processing')
+    make_payment(1500, 3, status='processing', phone='+254799999999')
+    path = tmp_path / 'statement.csv'
+    write_statement(path, [
+        statement_row('RJ20000001', 2, 1500, phone='254712***678'),
+        statement_row('RJ20000002', 2, 1500, phone='254711***111'),
+        statement_row('RJ20000003', 120, 1500, phone='254712***678'),
+    ])
+
+    report = reconcile_statement(str(path), window_minutes=10)
+
+    assert report['matched']['phone_amount_time'] == 1
+    assert report['discrepancies']['status_mismatch'] == 1
+    assert report['samples']['status_mismatch'][0]['payment_id'] == pending
+    assert report['discrepancies']['missing_in_payments'] == 2
+
+
+def test_identical_rows_take_one_payment_each(app, tmp_path):
+    first = make_payment(1500, 0)
+    second = make_payment(1500, 0)
+    make_payment(800, 1)
+    path = tmp_path / 'statement.csv'
+    write_statement(path, [
+        statement_row('RJ40000001', 0, 1500, phone='254712***678'),
+        statement_row('RJ40000002', 0, 1500, phone='254712***678'),
+        statement_row('RJ40000003', 1, 800, phone='254712***678'),
+        statement_row('RJ40000004', 1, 800, phone='254712***678'),
+    ])
+
+    report = reconcile_statement(str(path), window_minutes=10, report_path=str(tmp_path / 'report.csv'))
+
+    assert report['matched']['phone_amount_time'] == 3
+    assert report['discrepancies']['missing_in_statement'] == 0
+    # Only the second 800 row is left without a payment of its own
+    assert report['discrepancies']['duplicate'] == 1
+    assert report['discrepancies']['missing_in_payments'] == 0
+    with open(tmp_path / 'report.csv') as f:
+        assert not any(line['payment_id'] in (str(first), str(second)) for line in csv.DictReader(f))
+
+
+def test_full_report_is_written_to_csv(app, tmp_path):
+    make_payment(1000, 5, receipt='RJ30000001')
+    path = tmp_path / 'statement.csv'
+    output = tmp_path / 'report.csv'
+    write_statement(path, [statement_row('RJ3000000%d' % i, i, 100) for i in range(2, 9)])
+
+    report = reconcile_statement(str(path), report_path=str(output), sample_size=2)
+
+    assert len(report['samples']['missing_in_payments']) == 2
+    with open(output) as f:
+        lines = list(csv.DictReader(f))
+    assert len(lines) == 8
+    assert sum(1 for line in lines if line['kind'] == 'missing_in_payments') == 7
+
+
+def test_rejects_files_without_a_statement_header(app, tmp_path):
+    path = tmp_path / 'notes.csv'
+    path.write_text('hello,world\n1,2\n')
+    with pytest.raises(StatementError):
+        reconcile_statement(str(path))
@@ -0,0 +1,180 @@
+"""Resumable chunked uploads: create, PATCH chunks, finalize, attach once, purge.
+
+Run with: python -m pytest test_uploads.py
+"""
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+from app import db
+from app.models.property import Property
+from app.models.tenant_application import TenantApplication
+from app.models.upload_session import UploadSession
+from app.models.user import User
+from app.services.upload_staging import purge_stale_uploads, staging_path
+from conftest import app_context, headers_for
+
+PDF = b'%PDF-1.4 signed agreement ' + b'x' * 100
+
+
+@pytest.fixture
+def app(tmp_path):
+    with app_context(STORAGE_BACKEND='local', STORAGE_BACKUP_BACKEND='', LOCAL_STORAGE_DIR=str(tmp_path / 'storage'),
+                     UPLOAD_STAGING_DIR=str(tmp_path / 'staging'), UPLOAD_MAX_SIZE=1024) as app:
+        yield app
+
+
+@pytest.fixture
+def tenant(app):
+    landlord = User(email='landlord@test.com', name='Landlord', phone='+254700000001', role='landlord')
+    tenant = User(email='tenant@test.com', name='Tenant', phone='+254700000002', role='tenant')
+    db.session.add_all([landlord, tenant])
+    db.session.flush()
+    db.session.add(Property(title='Block A', description='d', property_type='apartment', city='Nairobi',
+                            address='a', available_from=date.today(), landlord_id=landlord.id))
+    db.session.commit()
+    return tenant
+
+
+def start(client, user, size=len(PDF), purpose='signed_agreement', filename='agreement.pdf'):
+    return client.post('/api/uploads', json={'filename': filename, 'size': size, 'purpose': purpose},
+                       headers=headers_for(user))
+
+
+def patch(client, user, upload_id, offset, chunk):
+    headers = headers_for(user)
+    headers['Upload-Offset'] = str(offset)
+    return client.patch(f'/api/uploads/{upload_id}', data=chunk, headers=headers,
+                        content_type='application/offset+octet-stream')
+
+
+def upload(client, user, payload=PDF, **kwargs):
+    upload_id = start(client, user, size=len(payload), **kwargs).json['upload']['id']
+    resp = patch(client, user, upload_id, 0, payload)
+    assert resp.status_code == 200
+    return upload_id
+
+
+def test_create(app, tenant):
+    client = app.test_client()
+    resp = start(client, tenant)
+    assert resp.status_code == 201
+    upload_id = resp.json['upload']['id']
+    assert resp.headers['Location'].endswith(f'/api/uploads/{upload_id}')
+    assert resp.headers['Upload-Offset'] == '0'
+    assert os.path.getsize(staging_path(upload_id)) == 0
+
+    assert start(client, tenant, purpose='avatar').status_code == 400
+    assert start(client, tenant, size=0).status_code == 400
+    assert start(client, tenant, size=4096).status_code == 413
+
+
+def test_chunks_are_appended_and_finalized(app, tenant):
+    client = app.test_client()
+    upload_id = start(client, tenant).json['upload']['id']
+
+    resp = patch(client, tenant, upload_id, 0, PDF[:40])
+    assert resp.status_code == 204 and resp.headers['Upload-Offset'] == '40'
+    progress = client.get(f'/api/uploads/{upload_id}', headers=headers_for(tenant))
+    assert progress.json['upload']['received_size'] == 40
+
+    resp = patch(client, tenant, upload_id, 40, PDF[40:])
+    assert resp.status_code == 200
+    session = resp.json['upload']
+    assert session['status'] == 'completed' and session['received_size'] == len(PDF)
+    assert session['result_url']
+    assert not os.path.exists(staging_path(upload_id))
+
+    stored = [os.path.join(root, name) for root, _, files in os.walk(app.config['LOCAL_STORAGE_DIR'])
+              for name in files]
+    assert len(stored) == 1
+    with open(stored[0], 'rb') as f:
+        assert f.read() == PDF
+
+    # Re-sending the last chunk after completion is harmless
+    assert patch(client, tenant, upload_id, 40, PDF[40:]).status_code == 200
+
+
+def test_offset_mismatch_is_a_conflict(app, tenant):
+    client = app.test_client()
+    upload_id = start(client, tenant).json['upload']['id']
+    assert patch(client, tenant, upload_id, 0, PDF[:40]).status_code == 204
+
+    # A resent first chunk (the client missed the 204) must not be appended twice
+    resp = patch(client, tenant, upload_id, 0, PDF[:40])
+    assert resp.status_code == 409
+    assert resp.json['expected_offset'] == 40 and resp.headers['Upload-Offset'] == '40'
+    assert os.path.getsize(staging_path(upload_id)) == 40
+
+    assert patch(client, tenant, upload_id, 40, PDF[40:] + b'extra').status_code == 413
+
+
+def test_other_users_cannot_touch_an_upload(app, tenant):
+    client = app.test_client()
+    upload_id = start(client, tenant).json['upload']['id']
+    other = User(email='other@test.com', name='Other', phone='+254700000003', role='tenant')
+    db.session.add(other)
+    db.session.commit()
+    assert client.get(f'/api/uploads/{upload_id}', headers=headers_for(other)).status_code == 404
+    assert patch(client, other, upload_id, 0, PDF).status_code == 404
+
+
+def submit(client, user, front, back, agreement):
+    data = {
+        'property_id': str(Property.query.one().id), 'digital_consent': 'true', 'first_name': 'Jane',
+        'last_name': 'Doe', 'phone': '0712345678', 'id_number': '12345678',
+        'id_document_front_upload_id': front, 'id_document_back_upload_id': back,
+        'signed_agreement_upload_id': agreement,
+    }
+    return client.post('/api/applications', data=data, headers=headers_for(user),
+                       content_type='multipart/form-data')
+
+
+def test_a_completed_upload_is_attached_once(app, tenant):
+    client = app.test_client()
+    front = upload(client, tenant, b'front', purpose='id_document', filename='front.jpg')
+    back = upload(client, tenant, b'back', purpose='id_document', filename='back.jpg')
+    agreement = upload(client, tenant)
+
+    resp = submit(client, tenant, front, back, agreement)
+    assert resp.status_code == 201
+    application = TenantApplication.query.one()
+    assert application.signed_agreement_url == db.session.get(UploadSession, agreement).result_url
+    assert {s.status for s in UploadSession.query} == {'consumed'}
+
+    assert submit(client, tenant, front, back, agreement).status_code == 400
+    assert TenantApplication.query.count() == 1
+
+
+def test_a_rejected_submission_releases_its_uploads(app, tenant):
+    client = app.test_client()
+    front = upload(client, tenant, b'front', purpose='id_document', filename='front.jpg')
+    agreement = upload(client, tenant)
+
+    # No back of the ID: nothing is attached, so the uploads stay usable
+    assert submit(client, tenant, front, '', agreement).status_code == 400
+    assert {s.status for s in UploadSession.query} == {'completed'}
+
+    back = upload(client, tenant, b'back', purpose='id_document', filename='back.jpg')
+    assert submit(client, tenant, front, back, agreement).status_code == 201
+
+
+def test_purge_expires_abandoned_uploads(app, tenant):
+    client = app.test_client()
+    stale_id = start(client, tenant).json['upload']['id']
+    assert patch(client, tenant, stale_id, 0, PDF[:40]).status_code == 204
+    done_id = upload(client, tenant)
+    orphan = os.path.join(app.config['UPLOAD_STAGING_DIR'], 'deadbeef.part')
+    open(orphan, 'wb').close()
+
+    # Nothing is stale yet
+    assert purge_stale_uploads() == 0
+    assert os.path.exists(staging_path(stale_id)) and os.path.exists(orphan)
+
+    later = datetime.utcnow() + timedelta(seconds=app.config['UPLOAD_SESSION_TTL'] + 60)
+    assert purge_stale_uploads(now=later) == 1
+    assert db.session.get(UploadSession, stale_id).status == 'expired'
+    assert db.session.get(UploadSession, done_id).status == 'completed'
+    assert not os.path.exists(staging_path(stale_id))
+    assert not os.path.exists(orphan)
+    assert patch(client, tenant, stale_id, 40, PDF[40:]).status_code == 404